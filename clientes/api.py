@@ -0,0 +1,294 @@
+# clientes/api.py
+
+# API de leitura para integrações (ERP etc.), versão 1.
+#
+# Recursos em /clientes/api/v1/: clientes, produtos, pedidos e itens-pedido.
+# Parâmetros comuns:
+#
+#   fields         campos a retornar, separados por vírgula (padrão: todos)
+#   updated_since  só registros com data_atualizacao >= o instante (ISO 8601)
+#   limit          registros por página (padrão API_LIMITE_PADRAO, máx. API_LIMITE_MAXIMO)
+#   cursor         valor de next_cursor da página anterior
+#
+# As páginas seguem (data_atualizacao, id) em ordem crescente, cobertas por
+# índice, então cada página custa o mesmo em qualquer ponto da tabela. Um
+# registro alterado durante a sincronização volta a aparecer mais adiante.
+# Para a carga incremental, guarde o data_atualizacao mais recente recebido
+# e use-o como updated_since na próxima rodada. Exclusões não aparecem no
+# fluxo incremental: uma conferência periódica com fields=id detecta os
+# registros removidos.
+#
+# Os pedidos trazem os itens aninhados (campo "itens"), buscados em uma
+# consulta por bloco de pedidos. O JSON é gerado em streaming, sem montar a
+# página inteira em memória.
+#
+# Autenticação: sessão de administrador ou supervisor, ou o cabeçalho
+# "Authorization: Bearer <token>" com um dos tokens de API_TOKENS.
+
+import base64
+import binascii
+import hmac
+import json
+from datetime import datetime, time
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from usuarios.views import is_admin_or_supervisor
+
+from .models import Cliente, ItemPedido, Pedido, Produto
+
+VERSAO = 1
+
+# Pedidos por consulta de itens aninhados
+TAMANHO_BLOCO = 500
+
+CAMPOS_ITEM = ('id', 'produto_id', 'quantidade')
+
+
+class ErroParametro(ValueError):
+    pass
+
+
+class Recurso:
+    """Descrição de um recurso da API: campos expostos, ordem e filtros aceitos."""
+
+    def __init__(self, modelo, campos, ordem, filtros=(), campo_atualizacao='data_atualizacao'):
+        self.modelo = modelo
+        self.campos = campos
+        self.ordem = ordem
+        self.filtros = filtros
+        self.campo_atualizacao = campo_atualizacao
+
+
+RECURSOS = {
+    'clientes': Recurso(
+        Cliente,
+        ('id', 'nome', 'telefone', 'endereco', 'nome_marca', 'data_atualizacao'),
+        ('data_atualizacao', 'id'),
+    ),
+    'produtos': Recurso(
+        Produto,
+        ('id', 'cliente_id', 'nome_produto', 'codigo_barras', 'numero_processo', 'data_atualizacao'),
+        ('data_atualizacao', 'id'),
+        filtros=('cliente',),
+    ),
+    'pedidos': Recurso(
+        Pedido,
+        ('id', 'cliente_id', 'status', 'numero_rastreio', 'nome_transportadora', 'data_criacao',
+         'data_atualizacao', 'data_status', 'itens'),
+        ('data_atualizacao', 'id'),
+        filtros=('cliente', 'status'),
+    ),
+    # Os itens não têm data própria: salvar itens atualiza o data_atualizacao do pedido
+    'itens-pedido': Recurso(
+        ItemPedido,
+        ('id', 'pedido_id', 'produto_id', 'quantidade'),
+        ('id',),
+        filtros=('pedido',),
+        campo_atualizacao='pedido__data_atualizacao',
+    ),
+}
+
+
+def _autorizado(request):
+    cabecalho = request.headers.get('Authorization', '')
+    if cabecalho.startswith('Bearer '):
+        recebido = cabecalho.encode()
+        return any(
+            hmac.compare_digest(recebido, f'Bearer {token}'.encode())
+            for token in getattr(settings, 'API_TOKENS', ())
+        )
+    return request.user.is_authenticated and is_admin_or_supervisor(request.user)
+
+
+def api_autenticada(view):
+    """Como login_required, mas responde 401 em JSON em vez de redirecionar."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _autorizado(request):
+            response = JsonResponse({'message': 'Credenciais inválidas ou ausentes.'}, status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def codificar_cursor(valores):
+    # isoformat() direto: o DjangoJSONEncoder corta os microssegundos, e o
+    # cursor precisa da data exata para não repetir nem pular registros
+    valores = [valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores]
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, recurso):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        valores = json.loads(texto)
+        if not isinstance(valores, list) or len(valores) != len(recurso.ordem):
+            raise ValueError(texto)
+        if recurso.ordem[0] == 'data_atualizacao':
+            # Formato certo com data impossível (ex.: mês 13) também levanta ValueError
+            valores[0] = parse_datetime(valores[0])
+            if valores[0] is None:
+                raise ValueError(texto)
+        if type(valores[-1]) is not int:
+            raise ValueError(texto)
+    except (binascii.Error, TypeError, UnicodeDecodeError, ValueError):
+        raise ErroParametro('cursor inválido.')
+    return valores
+
+
+def _instante(valor):
+    """Lê updated_since: data e hora ISO 8601 ou só a data (meia-noite local)."""
+    try:
+        instante = parse_datetime(valor)
+        if instante is None:
+            data = parse_date(valor)
+            instante = datetime.combine(data, time()) if data else None
+    except ValueError:
+        instante = None
+    if instante is None:
+        raise ErroParametro('updated_since deve ser uma data ISO 8601.')
+    if timezone.is_naive(instante):
+        instante = timezone.make_aware(instante)
+    return instante
+
+
+def _campos(valor, recurso):
+    if not valor:
+        return list(recurso.campos)
+    campos = list(dict.fromkeys(campo.strip() for campo in valor.split(',') if campo.strip()))
+    desconhecidos = [campo for campo in campos if campo not in recurso.campos]
+    if desconhecidos or not campos:
+        raise ErroParametro(
+            f'Campos desconhecidos: {", ".join(desconhecidos)}. Disponíveis: {", ".join(recurso.campos)}.'
+        )
+    return campos
+
+
+def _limite(valor):
+    padrao = getattr(settings, 'API_LIMITE_PADRAO', 500)
+    maximo = getattr(settings, 'API_LIMITE_MAXIMO', 5000)
+    if not valor:
+        return padrao
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ErroParametro('limit deve ser um número inteiro.')
+    if not 1 <= limite <= maximo:
+        raise ErroParametro(f'limit deve estar entre 1 e {maximo}.')
+    return limite
+
+
+def _consulta(recurso, parametros):
+    """Monta o queryset da página a partir dos parâmetros da requisição."""
+    queryset = recurso.modelo.objects.all()
+    for filtro in recurso.filtros:
+        valor = parametros.get(filtro)
+        if valor:
+            # isdigit() sozinho aceita dígitos Unicode ('²') que int() recusa
+            if filtro != 'status' and not (valor.isascii() and valor.isdigit()):
+                raise ErroParametro(f'{filtro} deve ser um id.')
+            queryset = queryset.filter(**{filtro: valor})
+
+    if parametros.get('updated_since'):
+        instante = _instante(parametros['updated_since'])
+        if '__' in recurso.campo_atualizacao:
+            # Data do registro pai: filtra pelos ids dos pais alterados (lidos pelo
+            # índice de data deles) em vez de um JOIN percorrido na ordem de id
+            relacao, campo = recurso.campo_atualizacao.split('__')
+            pais = recurso.modelo._meta.get_field(relacao).related_model.objects.filter(**{f'{campo}__gte': instante})
+            queryset = queryset.filter(**{f'{relacao}__in': pais.values('id')})
+        else:
+            queryset = queryset.filter(**{f'{recurso.campo_atualizacao}__gte': instante})
+
+    if parametros.get('cursor'):
+        valores = _decodificar_cursor(parametros['cursor'], recurso)
+        if len(recurso.ordem) == 1:
+            queryset = queryset.filter(id__gt=valores[0])
+        else:
+            data, ultimo_id = valores
+            # data_atualizacao__gte fora do OR permite ao índice começar no cursor
+            queryset = queryset.filter(
+                Q(data_atualizacao__gte=data),
+                Q(data_atualizacao__gt=data) | Q(data_atualizacao=data, id__gt=ultimo_id),
+            )
+    return queryset.order_by(*recurso.ordem)
+
+
+def _itens_dos_pedidos(pedidos_ids):
+    itens = {}
+    for item in (
+        ItemPedido.objects.filter(pedido_id__in=pedidos_ids)
+        .order_by('id')
+        .values('pedido_id', *CAMPOS_ITEM)
+    ):
+        itens.setdefault(item.pop('pedido_id'), []).append(item)
+    return itens
+
+
+def _blocos(linhas, tamanho):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _gerar(recurso, queryset, campos, limite):
+    """Gera o JSON da página: os registros primeiro, o cursor da próxima no fim."""
+    colunas = [campo for campo in campos if campo != 'itens']
+    consulta = list(dict.fromkeys([*colunas, *recurso.ordem]))
+    com_itens = 'itens' in campos
+
+    yield f'{{"version": {VERSAO}, "results": ['
+    enviados = 0
+    ultimo = None
+    tem_mais = False
+    primeiro = True
+    for bloco in _blocos(queryset.values(*consulta)[:limite + 1].iterator(chunk_size=TAMANHO_BLOCO), TAMANHO_BLOCO):
+        if enviados + len(bloco) > limite:
+            bloco = bloco[:limite - enviados]
+            tem_mais = True
+        itens = _itens_dos_pedidos([linha['id'] for linha in bloco]) if com_itens else {}
+        partes = []
+        for linha in bloco:
+            registro = {campo: linha[campo] for campo in colunas}
+            if com_itens:
+                registro['itens'] = itens.get(linha['id'], [])
+            partes.append(json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False))
+        if partes:
+            yield ('' if primeiro else ',') + ','.join(partes)
+            primeiro = False
+        enviados += len(bloco)
+        if bloco:
+            ultimo = [bloco[-1][campo] for campo in recurso.ordem]
+
+    proximo = json.dumps(codificar_cursor(ultimo)) if tem_mais and ultimo else 'null'
+    yield f'], "next_cursor": {proximo}, "has_more": {"true" if tem_mais else "false"}}}'
+
+
+# Listagem paginada de um recurso (o nome vem da rota)
+@api_autenticada
+def listar(request, nome):
+    recurso = RECURSOS[nome]
+    try:
+        campos = _campos(request.GET.get('fields'), recurso)
+        limite = _limite(request.GET.get('limit'))
+        queryset = _consulta(recurso, request.GET)
+    except ErroParametro as erro:
+        return JsonResponse({'message': str(erro)}, status=400)
+
+    response = StreamingHttpResponse(_gerar(recurso, queryset, campos, limite), content_type='application/json')
+    response['API-Version'] = str(VERSAO)
+    return response
@@ -0,0 +1,233 @@
+# clientes/busca.py
+
+# Busca textual sobre clientes, produtos e pedidos.
+#
+# Os textos pesquisáveis ficam na tabela clientes_busca, criada pela
+# migração 0003: uma tabela virtual FTS5 no SQLite ou uma tabela com
+# coluna tsvector (índice GIN) no PostgreSQL. O rowid de cada documento
+# codifica o tipo e o id do objeto (id * 4 + tipo), o que permite
+# atualizar e remover entradas pela chave primária. Em outros bancos a
+# busca usa consultas icontains diretamente nos modelos.
+#
+# O índice é mantido pelos sinais em clientes/signals.py e pelas rotinas
+# de gravação em lote, que chamam as funções indexar_* explicitamente.
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Cliente, Pedido, Produto
+
+TIPO_CLIENTE = 1
+TIPO_PRODUTO = 2
+TIPO_PEDIDO = 3
+
+TABELA = 'clientes_busca'
+
+
+def _suportado():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def _rowid(tipo, objeto_id):
+    return objeto_id * 4 + tipo
+
+
+def _texto(*partes):
+    return ' '.join(str(parte) for parte in partes if parte)
+
+
+def _documento_cliente(cliente):
+    return _rowid(TIPO_CLIENTE, cliente.id), cliente.nome_marca, _texto(cliente.nome_marca, cliente.nome)
+
+
+def _documento_produto(produto):
+    return (
+        _rowid(TIPO_PRODUTO, produto.id),
+        produto.nome_produto,
+        _texto(produto.nome_produto, produto.codigo_barras, produto.numero_processo),
+    )
+
+
+def _documento_pedido(pedido, nome_marca):
+    return (
+        _rowid(TIPO_PEDIDO, pedido.id),
+        f'Pedido #{pedido.id}',
+        _texto(pedido.id, pedido.numero_rastreio, nome_marca),
+    )
+
+
+def _gravar(documentos):
+    if not documentos or not _suportado():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(
+                f'DELETE FROM {TABELA} WHERE rowid = %s', [(doc[0],) for doc in documentos]
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABELA} (rowid, titulo, texto) VALUES (%s, %s, %s)', documentos
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {TABELA} (id, titulo, texto) VALUES (%s, %s, %s) '
+                'ON CONFLICT (id) DO UPDATE SET titulo = EXCLUDED.titulo, texto = EXCLUDED.texto',
+                documentos,
+            )
+
+
+def remover(tipo, ids):
+    if not ids or not _suportado():
+        return
+    coluna = 'rowid' if connection.vendor == 'sqlite' else 'id'
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABELA} WHERE {coluna} = %s', [(_rowid(tipo, pk),) for pk in ids]
+        )
+
+
+def indexar_clientes(clientes):
+    _gravar([_documento_cliente(cliente) for cliente in clientes])
+
+
+def indexar_produtos(produtos):
+    _gravar([_documento_produto(produto) for produto in produtos])
+
+
+def indexar_pedidos(pedidos):
+    """Indexa pedidos; espera o cliente já carregado (select_related)."""
+    _gravar([_documento_pedido(pedido, pedido.cliente.nome_marca) for pedido in pedidos])
+
+
+def indexar_pedidos_do_cliente(cliente):
+    _gravar([
+        _documento_pedido(pedido, cliente.nome_marca)
+        for pedido in Pedido.objects.filter(cliente=cliente).only('id', 'numero_rastreio')
+    ])
+
+
+def reindexar_tudo(tamanho_lote=2000):
+    """Reconstrói o índice inteiro (usado pela migração e pelo comando reindexar_busca)."""
+    if not _suportado():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA}')
+    for queryset, documento in (
+        (Cliente.objects.all(), _documento_cliente),
+        (Produto.objects.all(), _documento_produto),
+    ):
+        lote = []
+        for objeto in queryset.iterator(chunk_size=tamanho_lote):
+            lote.append(documento(objeto))
+            if len(lote) >= tamanho_lote:
+                _gravar(lote)
+                lote = []
+        _gravar(lote)
+
+    lote = []
+    pedidos = Pedido.objects.select_related('cliente').only('id', 'numero_rastreio', 'cliente__nome_marca')
+    for pedido in pedidos.iterator(chunk_size=tamanho_lote):
+        lote.append(_documento_pedido(pedido, pedido.cliente.nome_marca))
+        if len(lote) >= tamanho_lote:
+            _gravar(lote)
+            lote = []
+    _gravar(lote)
+
+
+def _termos(consulta):
+    return re.findall(r'\w+', consulta)[:10]
+
+
+def _buscar_indice(termos, limite, tipo=None):
+    # O tipo fica nos dois bits baixos do rowid (ver _rowid)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Cada termo vira um prefixo ("termo"*) e todos precisam casar
+            expressao = ' '.join(f'"{termo}"*' for termo in termos)
+            filtro_tipo = f'AND rowid %% 4 = {int(tipo)} ' if tipo else ''
+            cursor.execute(
+                f'SELECT rowid, titulo FROM {TABELA} WHERE {TABELA} MATCH %s {filtro_tipo}'
+                f'ORDER BY bm25({TABELA}, 10.0, 1.0) LIMIT %s',
+                [expressao, limite],
+            )
+        else:
+            expressao = ' & '.join(f'{termo}:*' for termo in termos)
+            filtro_tipo = f'AND id %% 4 = {int(tipo)} ' if tipo else ''
+            cursor.execute(
+                f"SELECT id, titulo FROM {TABELA}, to_tsquery('simple', %s) consulta "
+                f'WHERE documento @@ consulta {filtro_tipo}'
+                'ORDER BY ts_rank(documento, consulta) DESC LIMIT %s',
+                [expressao, limite],
+            )
+        return [(rowid % 4, rowid // 4, titulo) for rowid, titulo in cursor.fetchall()]
+
+
+def _buscar_modelos(termos, limite):
+    # Alternativa sem índice para bancos sem FTS5/tsvector
+    filtro_cliente, filtro_produto, filtro_pedido = Q(), Q(), Q()
+    for termo in termos:
+        filtro_cliente &= Q(nome__icontains=termo) | Q(nome_marca__icontains=termo)
+        filtro_produto &= (
+            Q(nome_produto__icontains=termo)
+            | Q(codigo_barras__icontains=termo)
+            | Q(numero_processo__icontains=termo)
+        )
+        filtro_pedido &= Q(numero_rastreio__icontains=termo) | Q(cliente__nome_marca__icontains=termo)
+    resultados = [
+        (TIPO_CLIENTE, pk, titulo)
+        for pk, titulo in Cliente.objects.filter(filtro_cliente).values_list('id', 'nome_marca')[:limite]
+    ]
+    resultados += [
+        (TIPO_PRODUTO, pk, titulo)
+        for pk, titulo in Produto.objects.filter(filtro_produto).values_list('id', 'nome_produto')[:limite]
+    ]
+    resultados += [
+        (TIPO_PEDIDO, pk, f'Pedido #{pk}')
+        for pk in Pedido.objects.filter(filtro_pedido).values_list('id', flat=True)[:limite]
+    ]
+    return resultados[:limite]
+
+
+def buscar_clientes(consulta, limite=10):
+    """Clientes cuja marca ou contato casam com a consulta, para o seletor de clientes.
+
+    Retorna pares (id, nome_marca) ordenados por relevância.
+    """
+    termos = _termos(consulta)
+    if not termos:
+        return []
+    if _suportado():
+        return [(pk, titulo) for _, pk, titulo in _buscar_indice(termos, limite, TIPO_CLIENTE)]
+    filtro = Q()
+    for termo in termos:
+        filtro &= Q(nome__icontains=termo) | Q(nome_marca__icontains=termo)
+    return list(Cliente.objects.filter(filtro).order_by('nome_marca').values_list('id', 'nome_marca')[:limite])
+
+
+def buscar(consulta, limite=30):
+    """Retorna os resultados ordenados por relevância para a consulta."""
+    termos = _termos(consulta)
+    if not termos:
+        return []
+    encontrados = _buscar_indice(termos, limite) if _suportado() else _buscar_modelos(termos, limite)
+
+    # Produtos apontam para o cliente; busca os clientes de todos de uma vez
+    produtos_ids = [pk for tipo, pk, _ in encontrados if tipo == TIPO_PRODUTO]
+    clientes_dos_produtos = dict(
+        Produto.objects.filter(id__in=produtos_ids).values_list('id', 'cliente_id')
+    ) if produtos_ids else {}
+
+    resultados = []
+    for tipo, pk, titulo in encontrados:
+        if tipo == TIPO_CLIENTE:
+            resultados.append({'tipo': 'Cliente', 'titulo': titulo,
+                               'url': reverse('detalhe_cliente', args=[pk])})
+        elif tipo == TIPO_PRODUTO and pk in clientes_dos_produtos:
+            resultados.append({'tipo': 'Produto', 'titulo': titulo,
+                               'url': reverse('detalhe_cliente', args=[clientes_dos_produtos[pk]])})
+        elif tipo == TIPO_PEDIDO:
+            resultados.append({'tipo': 'Pedido', 'titulo': titulo,
+                               'url': reverse('detalhe_pedido', args=[pk])})
+    return resultados
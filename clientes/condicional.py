@@ -0,0 +1,173 @@
+# clientes/condicional.py
+
+# GET condicional (ETag e Last-Modified) para as páginas de leitura e a
+# API de produtos.
+#
+# A versão de cada página é obtida com consultas agregadas baratas
+# (Max(data_atualizacao) e Count, cobertas por índices) antes de
+# renderizar. O que depende só do relógio (ex.: há quanto tempo o pedido
+# está no status atual) é calculado no navegador e fica fora da versão.
+# Se o navegador já tem essa versão, a view responde 304 sem montar o
+# template. Além dos dados, o ETag das páginas inclui o usuário, os
+# grupos e o cookie CSRF, que também aparecem no HTML. As respostas são
+# marcadas como "private, no-cache": o navegador guarda a cópia e sempre
+# revalida, então uma alteração aparece na próxima visita.
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from usuarios.grupos import grupos_do_usuario
+
+from .historico import inicio_janela
+from .models import Cliente, Pedido, Produto
+
+
+def calcular_etag(*partes):
+    return '"%s"' % hashlib.sha256(repr(partes).encode()).hexdigest()[:32]
+
+
+def etag_pagina(request, *versao):
+    """ETag de uma página HTML: versão dos dados + o que o template mostra do usuário."""
+    usuario = request.user
+    return calcular_etag(
+        usuario.pk,
+        usuario.is_superuser,
+        sorted(grupos_do_usuario(usuario)),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *versao,
+    )
+
+
+def _aplicar_cabecalhos(response, etag, ultima_modificacao):
+    response['ETag'] = etag
+    if ultima_modificacao is not None:
+        response['Last-Modified'] = http_date(ultima_modificacao.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def resposta_nao_modificada(request, etag, ultima_modificacao=None):
+    """Retorna um 304 se o navegador já tem esta versão; senão None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(ultima_modificacao.timestamp()) if ultima_modificacao else None,
+    )
+    if response is not None:
+        _aplicar_cabecalhos(response, etag, ultima_modificacao)
+    return response
+
+
+def com_validadores(response, etag, ultima_modificacao=None):
+    """Adiciona ETag, Last-Modified e Cache-Control a uma resposta 200."""
+    if response.status_code == 200:
+        _aplicar_cabecalhos(response, etag, ultima_modificacao)
+    return response
+
+
+def pagina_condicional(versao):
+    """Decorator para views GET de páginas com GET condicional.
+
+    `versao(request, *args, **kwargs)` retorna (ultima_modificacao, partes)
+    ou None quando o objeto não existe (a view então trata o 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            dados = versao(request, *args, **kwargs)
+            if dados is None:
+                return view(request, *args, **kwargs)
+            ultima_modificacao, partes = dados
+            etag = etag_pagina(request, ultima_modificacao, *partes)
+            response = resposta_nao_modificada(request, etag, ultima_modificacao)
+            if response is None:
+                response = com_validadores(view(request, *args, **kwargs), etag, ultima_modificacao)
+            return response
+        return wrapper
+    return decorator
+
+
+def _mais_recente(*datas):
+    return max((data for data in datas if data is not None), default=None)
+
+
+def _produtos_do_cliente(cliente_id):
+    # O Count detecta exclusões, que não alteram o Max
+    return Produto.objects.filter(cliente_id=cliente_id).aggregate(
+        ultima=Max('data_atualizacao'), total=Count('id')
+    )
+
+
+def versao_lista_clientes(request):
+    clientes = Cliente.objects.aggregate(ultima=Max('data_atualizacao'), total=Count('id'))
+    return clientes['ultima'], [clientes['total']]
+
+
+def versao_cliente(request, pk):
+    cliente = Cliente.objects.filter(pk=pk).values_list('data_atualizacao', flat=True).first()
+    if cliente is None:
+        return None
+    produtos = _produtos_do_cliente(pk)
+    return _mais_recente(cliente, produtos['ultima']), [cliente, produtos['ultima'], produtos['total']]
+
+
+def _agregado(queryset, **agregado):
+    """Subquery escalar com um agregado do queryset (para anotar outra consulta)."""
+    (nome, expressao), = agregado.items()
+    return Subquery(queryset.order_by().values('cliente_id').annotate(**{nome: expressao}).values(nome))
+
+
+def versao_pedido(request, pk):
+    # Uma consulta só: o pedido com os agregados do cliente em subqueries. O
+    # tempo por etapa do cliente muda com qualquer pedido dele e com a
+    # janela de semanas considerada
+    pedido = Pedido.objects.filter(pk=pk).values('cliente__data_atualizacao').annotate(
+        ultima_pedidos=_agregado(
+            Pedido.objects.filter(cliente_id=OuterRef('cliente_id')), ultima=Max('data_atualizacao')
+        ),
+        ultima_produtos=_agregado(
+            Produto.objects.filter(cliente_id=OuterRef('cliente_id')), ultima=Max('data_atualizacao')
+        ),
+        total_produtos=_agregado(Produto.objects.filter(cliente_id=OuterRef('cliente_id')), total=Count('id')),
+    ).first()
+    if pedido is None:
+        return None
+    ultima = _mais_recente(pedido['ultima_pedidos'], pedido['cliente__data_atualizacao'], pedido['ultima_produtos'])
+    return ultima, [
+        pedido['ultima_pedidos'], pedido['cliente__data_atualizacao'], pedido['ultima_produtos'],
+        pedido['total_produtos'] or 0, inicio_janela(),
+    ]
+
+
+async def aversao_produtos(cliente_id):
+    """Versão da lista de produtos do cliente, para a API assíncrona."""
+    produtos = await Produto.objects.filter(cliente_id=cliente_id).aaggregate(
+        ultima=Max('data_atualizacao'), total=Count('id')
+    )
+    return produtos['ultima'], calcular_etag(cliente_id, produtos['ultima'], produtos['total'])
+
+
+async def aversoes_catalogo(clientes_ids):
+    """Versão dos produtos de cada cliente, em uma consulta agrupada.
+
+    Cada versão é igual ao ETag de produtos_por_cliente para o mesmo
+    cliente; clientes sem produtos (ou inexistentes) têm a versão de uma
+    lista vazia.
+    """
+    agregados = {
+        linha['cliente_id']: linha
+        async for linha in Produto.objects.filter(cliente_id__in=clientes_ids)
+        .values('cliente_id').annotate(ultima=Max('data_atualizacao'), total=Count('id')).order_by()
+    }
+    versoes = {}
+    for cliente_id in clientes_ids:
+        linha = agregados.get(cliente_id, {'ultima': None, 'total': 0})
+        versoes[cliente_id] = calcular_etag(cliente_id, linha['ultima'], linha['total'])
+    return versoes
@@ -0,0 +1,137 @@
+# clientes/contadores.py
+
+# Contadores do dashboard (total de pedidos, total de clientes e pedidos
+# por status) mantidos na tabela ContadorDashboard.
+#
+# Os valores são ajustados de forma incremental pelos sinais de
+# Pedido/Cliente (ver clientes/signals.py) com UPDATE valor = valor + n, na
+# mesma transação da alteração: todos os workers leem os mesmos números, e
+# uma transação desfeita desfaz também o ajuste. A cada
+# CONTADORES_RECONCILIACAO_SEGUNDOS os contadores são recontados por
+# completo, o que corrige qualquer desvio causado por alterações que não
+# disparam sinais (ex.: QuerySet.update). A recontagem trava as linhas
+# dos contadores antes de contar: um ajuste concorrente espera por ela e é
+# somado ao valor recontado, em vez de ser sobrescrito.
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, When
+
+from .models import Cliente, ContadorDashboard, Pedido
+
+CHAVE_RECONCILIACAO = 'reconciliado_em'
+CHAVE_TOTAL_PEDIDOS = 'total_pedidos'
+CHAVE_TOTAL_CLIENTES = 'total_clientes'
+PREFIXO_STATUS = 'status:'
+
+# Rótulos calculados uma única vez, na ordem de STATUS_CHOICES
+ROTULOS_STATUS = {
+    status: status.replace('_', ' ').title()
+    for status, _ in Pedido.STATUS_CHOICES
+}
+
+
+def _intervalo_reconciliacao():
+    return getattr(settings, 'CONTADORES_RECONCILIACAO_SEGUNDOS', 300)
+
+
+def _chaves():
+    return [CHAVE_RECONCILIACAO, CHAVE_TOTAL_PEDIDOS, CHAVE_TOTAL_CLIENTES] + [
+        PREFIXO_STATUS + status for status in ROTULOS_STATUS
+    ]
+
+
+def recontar():
+    """Recalcula todos os contadores a partir do banco e grava na tabela."""
+    # No PostgreSQL o SELECT ... FOR UPDATE segura os ajustes até o commit;
+    # no SQLite a transação IMMEDIATE já bloqueia as outras escritas.
+    with transaction.atomic():
+        list(
+            ContadorDashboard.objects.select_for_update()
+            .filter(chave__in=_chaves()).order_by('chave').values_list('pk', flat=True)
+        )
+        por_status = dict(
+            Pedido.objects.order_by().values_list('status').annotate(count=Count('id'))
+        )
+        valores = {
+            CHAVE_TOTAL_PEDIDOS: sum(por_status.values()),
+            CHAVE_TOTAL_CLIENTES: Cliente.objects.count(),
+            CHAVE_RECONCILIACAO: int(time.time()),
+        }
+        for status in ROTULOS_STATUS:
+            valores[PREFIXO_STATUS + status] = por_status.get(status, 0)
+
+        ContadorDashboard.objects.bulk_create(
+            [ContadorDashboard(chave=chave, valor=valor) for chave, valor in valores.items()],
+            update_conflicts=True, unique_fields=['chave'], update_fields=['valor'],
+        )
+    return valores
+
+
+def _ajustar(deltas):
+    """Soma os deltas {chave: n} aos contadores em um único UPDATE.
+
+    Uma chave ausente é ignorada: a próxima leitura faz a recontagem completa.
+    """
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    if deltas:
+        ContadorDashboard.objects.filter(chave__in=deltas).update(
+            valor=F('valor') + Case(*[When(chave=chave, then=delta) for chave, delta in deltas.items()])
+        )
+
+
+def ajustar_pedidos(delta, status=None):
+    deltas = {CHAVE_TOTAL_PEDIDOS: delta}
+    if status:
+        deltas[PREFIXO_STATUS + status] = delta
+    _ajustar(deltas)
+
+
+def ajustar_status(status_anterior, status_novo, quantidade=1):
+    ajustar_status_lote({status_anterior: quantidade}, status_novo)
+
+
+def ajustar_status_lote(quantidades_por_anterior, status_novo):
+    """Ajusta os contadores de pedidos que saíram de vários status para status_novo."""
+    deltas = {PREFIXO_STATUS + status_novo: 0}
+    for anterior, quantidade in quantidades_por_anterior.items():
+        if anterior != status_novo:
+            deltas[PREFIXO_STATUS + anterior] = deltas.get(PREFIXO_STATUS + anterior, 0) - quantidade
+            deltas[PREFIXO_STATUS + status_novo] += quantidade
+    _ajustar(deltas)
+
+
+def ajustar_clientes(delta):
+    _ajustar({CHAVE_TOTAL_CLIENTES: delta})
+
+
+def invalidar():
+    """Força a recontagem completa na próxima leitura."""
+    ContadorDashboard.objects.filter(chave=CHAVE_RECONCILIACAO).delete()
+
+
+def obter_contadores():
+    """Retorna os contadores da tabela, recontando se estiverem vencidos."""
+    valores = dict(ContadorDashboard.objects.filter(chave__in=_chaves()).values_list('chave', 'valor'))
+    if (
+        len(valores) < len(_chaves())
+        or time.time() - valores[CHAVE_RECONCILIACAO] >= _intervalo_reconciliacao()
+    ):
+        valores = recontar()
+
+    pedidos_por_status = [
+        {
+            'status': status,
+            'status_display': rotulo,
+            'count': valores[PREFIXO_STATUS + status],
+        }
+        for status, rotulo in ROTULOS_STATUS.items()
+        if valores[PREFIXO_STATUS + status] > 0
+    ]
+    return {
+        'total_pedidos': valores[CHAVE_TOTAL_PEDIDOS],
+        'total_clientes': valores[CHAVE_TOTAL_CLIENTES],
+        'pedidos_por_status': pedidos_por_status,
+    }
@@ -0,0 +1,234 @@
+# clientes/eventos.py
+
+# Fluxo de mudanças de status de pedidos (Server-Sent Events).
+#
+# O log de eventos é a própria tabela PedidoStatusEvento, que só recebe
+# inserções, lida pela chave primária. Os ids não chegam necessariamente em
+# ordem: no PostgreSQL uma transação pode reservar um id e fazer o commit
+# depois de outra que reservou um id maior. Por isso o cursor de cada
+# conexão é o último id enviado mais as lacunas abaixo dele (ids ainda não
+# vistos) dentro de EVENTOS_PEDIDOS_JANELA_IDS; as lacunas são consultadas
+# de novo a cada volta e cada evento é enviado uma única vez. Lacunas que
+# saem da janela são tratadas como transações desfeitas.
+#
+# O cursor vai no campo id de cada evento SSE ("ultimo" ou
+# "ultimo:lacuna,lacuna"), então um navegador que reconecta com
+# Last-Event-ID recebe exatamente o que perdeu, inclusive as mudanças feitas
+# por outros processos. Cada conexão busca os eventos novos a cada
+# EVENTOS_PEDIDOS_INTERVALO segundos; mudanças feitas no mesmo processo
+# acordam as conexões na hora, por notificar(), chamada após o commit por
+# historico.registrar_transicoes.
+#
+# A conexão é encerrada após EVENTOS_PEDIDOS_DURACAO segundos e o
+# EventSource reconecta sozinho a partir do último id recebido, de modo que
+# nenhuma conexão fica presa para sempre.
+#
+# O fluxo só é servido no modo ASGI (ver core/asgi.py). Sob WSGI o Django lê
+# um gerador assíncrono até o fim antes de enviar a resposta: cada aba
+# ocuparia uma thread por EVENTOS_PEDIDOS_DURACAO sem receber nada. Nesse
+# caso o endpoint responde 204 (o EventSource não reconecta) e a lista de
+# pedidos nem abre o fluxo.
+
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.utils import formats, timezone
+
+from .contadores import ROTULOS_STATUS
+from .models import PedidoStatusEvento
+
+# Eventos lidos por consulta; um cliente muito atrasado recebe vários lotes
+LIMITE_LOTE = 500
+
+# Intervalo que o navegador espera antes de reconectar (milissegundos)
+RECONEXAO_MS = 3000
+
+# Lacunas guardadas no cursor, no máximo
+MAX_LACUNAS = 500
+
+_ouvintes = set()
+_lock = threading.Lock()
+
+
+class _Ouvinte:
+    """Uma conexão SSE aberta neste processo, esperando por novos eventos."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.evento = asyncio.Event()
+
+    def acordar(self):
+        try:
+            self.loop.call_soon_threadsafe(self.evento.set)
+        except RuntimeError:
+            # Loop já encerrado; a conexão será descartada no finally do fluxo
+            pass
+
+
+def notificar():
+    """Acorda as conexões SSE deste processo para buscarem os eventos novos."""
+    with _lock:
+        ouvintes = list(_ouvintes)
+    for ouvinte in ouvintes:
+        ouvinte.acordar()
+
+
+def _intervalo():
+    return getattr(settings, 'EVENTOS_PEDIDOS_INTERVALO', 5)
+
+
+def _duracao():
+    return getattr(settings, 'EVENTOS_PEDIDOS_DURACAO', 300)
+
+
+def _janela():
+    return getattr(settings, 'EVENTOS_PEDIDOS_JANELA_IDS', 2000)
+
+
+def _intervalos(numeros):
+    """Agrupa números em intervalos contínuos: [1, 2, 3, 7] -> ['1-3', '7']."""
+    intervalos = []
+    for numero in sorted(numeros):
+        if intervalos and intervalos[-1][1] == numero - 1:
+            intervalos[-1][1] = numero
+        else:
+            intervalos.append([numero, numero])
+    return [str(inicio) if inicio == fim else f'{inicio}-{fim}' for inicio, fim in intervalos]
+
+
+class Cursor:
+    """Último id enviado e os ids abaixo dele, na janela, ainda não vistos.
+
+    Só as MAX_LACUNAS mais recentes são mantidas: eventos apagados junto com
+    o pedido também deixam lacunas, que nunca serão preenchidas.
+    """
+
+    def __init__(self, ultimo=0, lacunas=()):
+        self.ultimo = ultimo
+        self.lacunas = set(lacunas)
+        self._limitar()
+
+    def _limitar(self):
+        lacunas = [lacuna for lacuna in self.lacunas if self.ultimo - _janela() < lacuna < self.ultimo]
+        self.lacunas = set(sorted(lacunas)[-MAX_LACUNAS:])
+
+    @classmethod
+    def decodificar(cls, texto):
+        ultimo, _, intervalos = texto.partition(':')
+        ultimo = max(int(ultimo), 0)
+        lacunas = set()
+        for intervalo in filter(None, intervalos.split(',')):
+            inicio, _, fim = intervalo.partition('-')
+            inicio = int(inicio)
+            # Limitado à janela: o valor vem do navegador
+            lacunas.update(range(max(inicio, ultimo - _janela() + 1), min(int(fim or inicio), ultimo - 1) + 1))
+        return cls(ultimo, lacunas)
+
+    def codificar(self):
+        if not self.lacunas:
+            return str(self.ultimo)
+        return f'{self.ultimo}:{",".join(_intervalos(self.lacunas))}'
+
+    def filtro(self):
+        if not self.lacunas:
+            return Q(id__gt=self.ultimo)
+        return Q(id__gt=self.ultimo) | Q(id__in=sorted(self.lacunas))
+
+    def avancar(self, evento_id):
+        if evento_id > self.ultimo:
+            inicio = max(self.ultimo + 1, evento_id - _janela() + 1)
+            self.lacunas.update(range(inicio, evento_id))
+            self.ultimo = evento_id
+            self._limitar()
+        else:
+            self.lacunas.discard(evento_id)
+
+
+def fluxo_disponivel(request):
+    """Se a requisição pode receber o fluxo (só sob ASGI)."""
+    return isinstance(request, ASGIRequest)
+
+
+def _ultimo_id():
+    return PedidoStatusEvento.objects.order_by('-id').values_list('id', flat=True)
+
+
+def cursor_atual():
+    """Cursor no último evento gravado: o fluxo envia só o que vier depois."""
+    return Cursor(_ultimo_id().first() or 0)
+
+
+async def acursor_atual():
+    return Cursor(await _ultimo_id().afirst() or 0)
+
+
+async def cursor_inicial(request):
+    """Cursor a partir do qual o fluxo começa.
+
+    Usa o cabeçalho Last-Event-ID (reconexão) ou o parâmetro ?desde=
+    (cursor registrado quando a página foi gerada); sem nenhum dos dois, só
+    envia os eventos que ainda vão acontecer.
+    """
+    for valor in (request.headers.get('Last-Event-ID'), request.GET.get('desde')):
+        try:
+            return Cursor.decodificar(valor)
+        except (AttributeError, ValueError):
+            continue
+    return await acursor_atual()
+
+
+def formatar(evento, cursor):
+    dados = {
+        'pedido': evento.pedido_id,
+        'status': evento.status,
+        'anterior': evento.status_anterior,
+        'rotulo': ROTULOS_STATUS.get(evento.status, evento.status),
+        'data': formats.date_format(timezone.template_localtime(evento.data), 'DATETIME_FORMAT'),
+    }
+    return f'id: {cursor.codificar()}\nevent: status\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n'
+
+
+async def _eventos_apos(cursor):
+    eventos = (
+        PedidoStatusEvento.objects.filter(cursor.filtro())
+        .order_by('id')
+        .only('id', 'pedido', 'status', 'status_anterior', 'data')
+    )
+    return [evento async for evento in eventos[:LIMITE_LOTE]]
+
+
+async def fluxo(cursor):
+    """Gera o corpo text/event-stream com os eventos posteriores ao cursor."""
+    fim = time.monotonic() + _duracao()
+    ouvinte = _Ouvinte()
+    with _lock:
+        _ouvintes.add(ouvinte)
+    try:
+        yield f'retry: {RECONEXAO_MS}\n\n'
+        while True:
+            # Limpa antes de consultar: uma notificação durante a consulta
+            # não se perde, só provoca mais uma volta
+            ouvinte.evento.clear()
+            eventos = await _eventos_apos(cursor)
+            for evento in eventos:
+                cursor.avancar(evento.id)
+                yield formatar(evento, cursor)
+            if len(eventos) == LIMITE_LOTE:
+                continue
+
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            try:
+                await asyncio.wait_for(ouvinte.evento.wait(), min(_intervalo(), restante))
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém a conexão viva em proxies com timeout
+                yield ': ping\n\n'
+    finally:
+        with _lock:
+            _ouvintes.discard(ouvinte)
@@ -1,6 +1,9 @@
 # clientes/forms.py
 
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
 from .models import Cliente, Pedido, Produto
 
 class ClienteForm(forms.ModelForm):
@@ -34,4 +37,81 @@ class PedidoForm(forms.ModelForm):
 class PedidoUpdateForm(forms.ModelForm):
     class Meta:
         model = Pedido
-        fields = ['status', 'numero_rastreio', 'nome_transportadora']
\ No newline at end of file
+        fields = ['status', 'numero_rastreio', 'nome_transportadora']
+
+class PedidoStatusLoteForm(forms.Form):
+    status = forms.ChoiceField(choices=Pedido.STATUS_CHOICES)
+    numero_rastreio = forms.CharField(max_length=100, required=False)
+    nome_transportadora = forms.CharField(max_length=255, required=False)
+
+class PedidoFiltroForm(forms.Form):
+    status = forms.ChoiceField(
+        choices=(('', 'Todos os status'),) + Pedido.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={
+            'class': 'block w-full border-gray-300 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500 text-sm'
+        }),
+    )
+    # Escolhido pelo seletor com busca (static/js/seletor_clientes.js): o campo
+    # oculto leva só o id, validado com uma consulta, sem listar os clientes
+    cliente = forms.ModelChoiceField(
+        queryset=Cliente.objects.only('id', 'nome_marca'),
+        required=False,
+        widget=forms.HiddenInput,
+    )
+    data_inicio = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'block w-full border-gray-300 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500 text-sm'
+        }),
+    )
+    data_fim = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'block w-full border-gray-300 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500 text-sm'
+        }),
+    )
+
+    def clean(self):
+        dados = super().clean()
+        inicio, fim = dados.get('data_inicio'), dados.get('data_fim')
+        if inicio and fim and inicio > fim:
+            raise forms.ValidationError('A data inicial deve ser anterior à data final.')
+        return dados
+
+    @property
+    def cliente_selecionado(self):
+        """Cliente do filtro válido, para preencher o campo de busca."""
+        if not self.is_bound or 'cliente' in self.errors:
+            return None
+        return self.cleaned_data.get('cliente')
+
+    @property
+    def campo_ordem(self):
+        """Campo do intervalo filtrado, usado na paginação (ver paginar_por_id)."""
+        if self.is_valid() and (self.cleaned_data.get('data_inicio') or self.cleaned_data.get('data_fim')):
+            return 'data_atualizacao'
+        return None
+
+    def filtrar(self, queryset):
+        """Aplica os filtros ao queryset de pedidos; com filtros inválidos, nada é listado."""
+        if not self.is_bound:
+            return queryset
+        if not self.is_valid():
+            return queryset.none()
+        dados = self.cleaned_data
+        if dados.get('status'):
+            queryset = queryset.filter(status=dados['status'])
+        if dados.get('cliente'):
+            queryset = queryset.filter(cliente=dados['cliente'])
+        # Compara com limites em datetime (e não com __date) para que o
+        # filtro continue usando índices sobre data_atualizacao
+        if dados.get('data_inicio'):
+            inicio = timezone.make_aware(datetime.combine(dados['data_inicio'], time.min))
+            queryset = queryset.filter(data_atualizacao__gte=inicio)
+        if dados.get('data_fim'):
+            fim = timezone.make_aware(datetime.combine(dados['data_fim'] + timedelta(days=1), time.min))
+            queryset = queryset.filter(data_atualizacao__lt=fim)
+        return queryset
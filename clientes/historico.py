@@ -0,0 +1,195 @@
+# clientes/historico.py
+
+# Histórico de status dos pedidos e tempo por etapa.
+#
+# Cada mudança de status grava um PedidoStatusEvento. O tempo que o pedido
+# passou na etapa anterior (agora - Pedido.data_status) é somado na hora
+# ao histograma semanal de TempoEtapa, por cliente e no total. Assim as
+# medianas e percentis da dashboard são calculados a partir de poucas
+# linhas já agregadas, sem percorrer o histórico inteiro.
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from . import eventos
+from .models import Pedido, PedidoStatusEvento, TempoEtapa
+
+HORA = 3600
+DIA = 24 * HORA
+
+# Limites superiores (em segundos) das faixas do histograma; a última faixa é aberta
+FAIXAS = [
+    HORA, 2 * HORA, 4 * HORA, 8 * HORA, 12 * HORA,
+    DIA, 2 * DIA, 3 * DIA, 5 * DIA, 7 * DIA, 10 * DIA, 14 * DIA,
+    21 * DIA, 30 * DIA, 45 * DIA, 60 * DIA, 90 * DIA,
+]
+
+SEMANAS_PADRAO = 12
+
+ROTULOS_ETAPAS = dict(Pedido.STATUS_CHOICES)
+
+
+def _semana(data):
+    dia = timezone.localtime(data).date()
+    return dia - timedelta(days=dia.weekday())
+
+
+def _faixa(segundos):
+    return bisect_left(FAIXAS, segundos)
+
+
+def registrar_transicoes(transicoes, usuario=None, data=None):
+    """Grava os eventos e atualiza o tempo por etapa de um conjunto de mudanças.
+
+    `transicoes` é uma lista de tuplas (pedido_id, cliente_id, status_anterior,
+    status_novo, inicio_anterior), onde inicio_anterior é o Pedido.data_status
+    antes da mudança (None em pedidos novos). Deve ser chamada dentro da mesma
+    transação que alterou os pedidos.
+    """
+    if not transicoes:
+        return
+    data = data or timezone.now()
+    PedidoStatusEvento.objects.bulk_create([
+        PedidoStatusEvento(
+            pedido_id=pedido_id, status_anterior=anterior or '', status=novo, usuario=usuario, data=data
+        )
+        for pedido_id, _, anterior, novo, _ in transicoes
+    ])
+    # As listas de pedidos abertas neste processo recebem a mudança na hora
+    transaction.on_commit(eventos.notificar)
+
+    semana = _semana(data)
+    incrementos = defaultdict(lambda: [0, 0.0])
+    for _, cliente_id, anterior, _, inicio in transicoes:
+        if not anterior or inicio is None:
+            continue
+        segundos = max((data - inicio).total_seconds(), 0)
+        faixa = _faixa(segundos)
+        for cliente in (cliente_id, None):
+            incremento = incrementos[(anterior, cliente, faixa)]
+            incremento[0] += 1
+            incremento[1] += segundos
+
+    _incrementar(semana, incrementos)
+
+
+def _incrementar(semana, incrementos):
+    """Soma os incrementos às linhas existentes e cria as que faltam, em lote."""
+    if not incrementos:
+        return
+    clientes = {cliente_id for _, cliente_id, _ in incrementos if cliente_id is not None}
+    existentes = {
+        (linha.etapa, linha.cliente_id, linha.faixa): linha
+        for linha in TempoEtapa.objects.filter(
+            Q(cliente_id__in=clientes) | Q(cliente__isnull=True),
+            semana=semana,
+            etapa__in={etapa for etapa, _, _ in incrementos},
+        ).only('id', 'etapa', 'cliente_id', 'faixa')
+    }
+    atualizar, criar = [], []
+    for chave, (quantidade, segundos) in incrementos.items():
+        linha = existentes.get(chave)
+        if linha is None:
+            etapa, cliente_id, faixa = chave
+            criar.append(TempoEtapa(
+                etapa=etapa, cliente_id=cliente_id, semana=semana, faixa=faixa,
+                quantidade=quantidade, soma_segundos=segundos,
+            ))
+        else:
+            # F() mantém o incremento atômico mesmo com gravações concorrentes
+            linha.quantidade = F('quantidade') + quantidade
+            linha.soma_segundos = F('soma_segundos') + segundos
+            atualizar.append(linha)
+    TempoEtapa.objects.bulk_update(atualizar, ['quantidade', 'soma_segundos'], batch_size=500)
+    # Uma linha duplicada por concorrência não altera o resultado: as
+    # leituras sempre somam as linhas da mesma chave
+    TempoEtapa.objects.bulk_create(criar, batch_size=500)
+
+
+def _percentil(contagens, total, fracao):
+    """Estima o percentil interpolando dentro da faixa do histograma."""
+    alvo = total * fracao
+    acumulado = 0
+    for faixa in sorted(contagens):
+        quantidade = contagens[faixa]
+        if acumulado + quantidade >= alvo:
+            inicio = FAIXAS[faixa - 1] if faixa > 0 else 0
+            if faixa >= len(FAIXAS):
+                return inicio
+            return inicio + (FAIXAS[faixa] - inicio) * (alvo - acumulado) / quantidade
+        acumulado += quantidade
+    return FAIXAS[-1]
+
+
+def formatar_duracao(segundos):
+    if segundos is None:
+        return '-'
+    segundos = int(segundos)
+    if segundos >= DIA:
+        return f'{segundos // DIA}d {segundos % DIA // HORA}h'
+    if segundos >= HORA:
+        return f'{segundos // HORA}h {segundos % HORA // 60}min'
+    return f'{segundos // 60}min'
+
+
+def inicio_janela(semanas=SEMANAS_PADRAO):
+    """Primeira semana considerada por tempos_por_etapa."""
+    return _semana(timezone.now()) - timedelta(weeks=semanas - 1)
+
+
+def tempos_por_etapa(cliente=None, semanas=SEMANAS_PADRAO):
+    """Mediana, p90 e média do tempo em cada etapa nas últimas semanas.
+
+    Sem cliente usa as linhas totais (cliente nulo).
+    """
+    inicio = inicio_janela(semanas)
+    linhas = (
+        TempoEtapa.objects.filter(cliente=cliente, semana__gte=inicio)
+        .values('etapa', 'faixa')
+        .annotate(quantidade=Sum('quantidade'), soma=Sum('soma_segundos'))
+        .order_by()
+    )
+    histogramas = defaultdict(dict)
+    somas = defaultdict(float)
+    for linha in linhas:
+        histogramas[linha['etapa']][linha['faixa']] = linha['quantidade']
+        somas[linha['etapa']] += linha['soma']
+
+    resultado = []
+    for etapa, rotulo in Pedido.STATUS_CHOICES:
+        contagens = histogramas.get(etapa)
+        if not contagens:
+            continue
+        total = sum(contagens.values())
+        p50 = _percentil(contagens, total, 0.5)
+        p90 = _percentil(contagens, total, 0.9)
+        media = somas[etapa] / total
+        resultado.append({
+            'etapa': etapa,
+            'rotulo': rotulo,
+            'quantidade': total,
+            'p50': p50,
+            'p90': p90,
+            'media': media,
+            'p50_display': formatar_duracao(p50),
+            'p90_display': formatar_duracao(p90),
+            'media_display': formatar_duracao(media),
+        })
+    return resultado
+
+
+def linha_do_tempo(pedido):
+    """Eventos do pedido com o tempo passado em cada status."""
+    eventos = list(pedido.eventos.select_related('usuario').order_by('id'))
+    agora = timezone.now()
+    for atual, seguinte in zip(eventos, eventos[1:] + [None]):
+        fim = seguinte.data if seguinte else agora
+        atual.rotulo = ROTULOS_ETAPAS.get(atual.status, atual.status)
+        atual.duracao_display = formatar_duracao((fim - atual.data).total_seconds())
+        atual.atual = seguinte is None
+    return eventos
@@ -0,0 +1,184 @@
+# clientes/importacao.py
+
+# Importação de clientes e produtos a partir de CSV.
+#
+# Cada linha do arquivo descreve um produto e o cliente a que pertence
+# (o mesmo layout gerado pela exportação de clientes). O arquivo é lido
+# linha a linha; clientes são identificados por nome_marca e produtos por
+# (nome_marca, codigo_barras), usando índices em memória montados com uma
+# consulta cada. As gravações são feitas com bulk_create em lotes.
+#
+# Tudo roda numa única transação: se outra gravação criar, no meio da
+# importação, um produto que o arquivo também traz, a restrição única
+# (cliente, codigo_barras) desfaz a importação inteira e o conflito é
+# informado no relatório, para que o arquivo seja reenviado.
+
+import csv
+
+from django.db import IntegrityError, transaction
+
+from . import busca, contadores
+from .models import Cliente, Produto
+
+# Cabeçalhos aceitos para cada campo (layout da exportação e nomes dos campos)
+COLUNAS = {
+    'nome_marca': ('nome da marca', 'nome_marca'),
+    'nome': ('nome do contato', 'nome'),
+    'telefone': ('telefone',),
+    'endereco': ('endereço', 'endereco'),
+    'nome_produto': ('produto', 'nome_produto'),
+    'codigo_barras': ('código de barras', 'codigo de barras', 'codigo_barras'),
+    'numero_processo': ('número do processo', 'numero do processo', 'numero_processo'),
+}
+
+MAX_ERROS = 50
+
+TAMANHOS = {
+    campo: modelo._meta.get_field(campo).max_length
+    for modelo, campos in ((Cliente, ('nome_marca', 'nome', 'telefone', 'endereco')),
+                           (Produto, ('nome_produto', 'codigo_barras', 'numero_processo')))
+    for campo in campos
+}
+
+
+class ErroImportacao(Exception):
+    pass
+
+
+def _mapear_cabecalho(cabecalho):
+    posicoes = {}
+    normalizado = [coluna.strip().lstrip('\ufeff').lower() for coluna in cabecalho]
+    for campo, nomes in COLUNAS.items():
+        for nome in nomes:
+            if nome in normalizado:
+                posicoes[campo] = normalizado.index(nome)
+                break
+    if 'nome_marca' not in posicoes:
+        raise ErroImportacao('O arquivo precisa ter a coluna "Nome da Marca" (ou "nome_marca").')
+    return posicoes
+
+
+def _leitor(linhas):
+    linhas = iter(linhas)
+    primeira = next(linhas, '')
+    delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+
+    def todas():
+        yield primeira
+        yield from linhas
+
+    return csv.reader(todas(), delimiter=delimitador)
+
+
+def importar_csv(linhas, dry_run=False, tamanho_lote=1000):
+    """Importa clientes e produtos de um iterável de linhas de texto CSV.
+
+    Com dry_run=True nada é gravado, mas o relatório é calculado da mesma forma.
+    """
+    relatorio = {
+        'linhas': 0,
+        'clientes_criados': 0,
+        'produtos_criados': 0,
+        'produtos_duplicados': 0,
+        'linhas_invalidas': 0,
+        'erros': [],
+        'dry_run': dry_run,
+        'conflito': False,
+    }
+
+    leitor = _leitor(linhas)
+    posicoes = _mapear_cabecalho(next(leitor, []))
+
+    clientes = dict(Cliente.objects.values_list('nome_marca', 'id'))
+    produtos = set(Produto.objects.values_list('cliente__nome_marca', 'codigo_barras'))
+
+    clientes_pendentes = {}
+    produtos_pendentes = []
+
+    def valor(linha, campo):
+        posicao = posicoes.get(campo)
+        if posicao is None or posicao >= len(linha):
+            return ''
+        return linha[posicao].strip()
+
+    def gravar():
+        if dry_run:
+            # Na simulação os clientes novos só passam a contar como conhecidos
+            for nome_marca in clientes_pendentes:
+                clientes[nome_marca] = None
+            clientes_pendentes.clear()
+            produtos_pendentes.clear()
+            return
+        if clientes_pendentes:
+            criados = Cliente.objects.bulk_create(clientes_pendentes.values(), batch_size=tamanho_lote)
+            for cliente in criados:
+                clientes[cliente.nome_marca] = cliente.id
+            busca.indexar_clientes(criados)
+            clientes_pendentes.clear()
+        if produtos_pendentes:
+            for produto, nome_marca in produtos_pendentes:
+                produto.cliente_id = clientes[nome_marca]
+            criados = Produto.objects.bulk_create(
+                [produto for produto, _ in produtos_pendentes], batch_size=tamanho_lote
+            )
+            busca.indexar_produtos(criados)
+            produtos_pendentes.clear()
+
+    try:
+        with transaction.atomic():
+            for numero, linha in enumerate(leitor, start=2):
+                if not any(campo.strip() for campo in linha):
+                    continue
+                relatorio['linhas'] += 1
+
+                nome_marca = valor(linha, 'nome_marca')
+                nome_produto = valor(linha, 'nome_produto')
+                codigo_barras = valor(linha, 'codigo_barras')
+                erro = None
+                if not nome_marca or bool(nome_produto) != bool(codigo_barras):
+                    erro = 'informe a marca e, para produtos, o nome e o código de barras.'
+                else:
+                    campo = next((campo for campo in TAMANHOS if len(valor(linha, campo)) > TAMANHOS[campo]), None)
+                    if campo:
+                        erro = f'o campo "{campo}" excede {TAMANHOS[campo]} caracteres.'
+                if erro:
+                    relatorio['linhas_invalidas'] += 1
+                    if len(relatorio['erros']) < MAX_ERROS:
+                        relatorio['erros'].append(f'Linha {numero}: {erro}')
+                    continue
+
+                if nome_marca not in clientes and nome_marca not in clientes_pendentes:
+                    clientes_pendentes[nome_marca] = Cliente(
+                        nome_marca=nome_marca,
+                        nome=valor(linha, 'nome'),
+                        telefone=valor(linha, 'telefone'),
+                        endereco=valor(linha, 'endereco'),
+                    )
+                    relatorio['clientes_criados'] += 1
+
+                if nome_produto:
+                    chave = (nome_marca, codigo_barras)
+                    if chave in produtos:
+                        relatorio['produtos_duplicados'] += 1
+                    else:
+                        produtos.add(chave)
+                        produtos_pendentes.append((Produto(
+                            nome_produto=nome_produto,
+                            codigo_barras=codigo_barras,
+                            numero_processo=valor(linha, 'numero_processo'),
+                        ), nome_marca))
+                        relatorio['produtos_criados'] += 1
+
+                if len(produtos_pendentes) >= tamanho_lote or len(clientes_pendentes) >= tamanho_lote:
+                    gravar()
+
+            gravar()
+            if not dry_run and relatorio['clientes_criados']:
+                # bulk_create não dispara sinais; força a recontagem do dashboard
+                contadores.invalidar()
+    except IntegrityError:
+        relatorio.update(clientes_criados=0, produtos_criados=0, conflito=True)
+        relatorio['erros'].insert(0, 'Outro usuário gravou ao mesmo tempo um produto deste arquivo; '
+                                     'nada foi importado. Envie o arquivo novamente.')
+
+    return relatorio
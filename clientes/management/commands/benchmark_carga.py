@@ -0,0 +1,310 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from clientes.management.fabricas import semear
+from clientes.models import Cliente, Pedido
+
+STATUS = [status for status, _ in Pedido.STATUS_CHOICES]
+
+# Peso de cada endpoint na mistura padrão de requisições
+MISTURA_PADRAO = {
+    'dashboard': 15,
+    'lista_pedidos': 30,
+    'atualizar_status_pedido': 20,
+    'exportar_pedido_pdf': 10,
+    'produtos_por_cliente': 25,
+}
+
+USUARIO = 'benchmark'
+SENHA = 'benchmark'
+
+
+def _mistura(texto):
+    """Lê "nome=peso,nome=peso" e valida os nomes."""
+    mistura = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        nome = nome.strip()
+        if nome not in MISTURA_PADRAO:
+            raise CommandError(f'Endpoint desconhecido na mistura: {nome} (use {", ".join(MISTURA_PADRAO)}).')
+        mistura[nome] = int(peso or 1)
+    return mistura
+
+
+def _percentil(valores, fracao):
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, int(len(valores) * fracao))]
+
+
+class _ClienteLocal:
+    """Envia as requisições ao próprio processo, pelo test Client do Django."""
+
+    def __init__(self, usuario):
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(usuario)
+
+    def enviar(self, metodo, caminho, dados=None):
+        resposta = getattr(self.client, metodo)(caminho, dados or {})
+        if resposta.streaming:
+            b''.join(resposta.streaming_content)
+            resposta.close()
+        return resposta.status_code
+
+    def fechar(self):
+        connections.close_all()
+
+
+class _SemRedirecionamento(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ClienteHttp:
+    """Envia as requisições a um servidor em execução, com sessão e CSRF próprios."""
+
+    def __init__(self, url, usuario, senha):
+        self.url = url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionamento()
+        )
+        try:
+            self.enviar('get', reverse('login'))
+            status = self.enviar('post', reverse('login'), {'username': usuario, 'password': senha})
+        except urllib.error.URLError as erro:
+            raise CommandError(f'Não foi possível conectar a {self.url}: {erro.reason}')
+        if status != 302:
+            raise CommandError(f'Falha no login em {self.url} (status {status}).')
+
+    def _csrf(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def enviar(self, metodo, caminho, dados=None):
+        url = self.url + caminho
+        corpo = None
+        cabecalhos = {}
+        if metodo == 'post':
+            corpo = urllib.parse.urlencode(dados or {}, doseq=True).encode()
+            cabecalhos = {'X-CSRFToken': self._csrf(), 'Referer': url}
+        elif dados:
+            url += '?' + urllib.parse.urlencode(dados, doseq=True)
+        requisicao = urllib.request.Request(url, data=corpo, headers=cabecalhos, method=metodo.upper())
+        try:
+            with self.opener.open(requisicao) as resposta:
+                resposta.read()
+                return resposta.status
+        except urllib.error.HTTPError as erro:
+            return erro.code
+
+    def fechar(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga reproduzível: popula um banco na escala informada, reproduz uma mistura de '
+        'requisições (dashboard, lista de pedidos, atualização de status, PDF e API de produtos) com '
+        'trabalhadores concorrentes e emite vazão e latências p50/p95/p99 por endpoint em JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=500, help='Clientes a criar.')
+        parser.add_argument('--produtos-por-cliente', type=int, default=5)
+        parser.add_argument('--pedidos', type=int, default=5000, help='Pedidos a criar.')
+        parser.add_argument('--itens-por-pedido', type=int, default=3)
+        parser.add_argument('--requisicoes', type=int, default=1000, help='Total de requisições.')
+        parser.add_argument('--trabalhadores', type=int, default=4, help='Trabalhadores concorrentes.')
+        parser.add_argument('--aquecimento', type=int, default=20,
+                            help='Requisições por trabalhador descartadas antes da medição.')
+        parser.add_argument(
+            '--mistura', type=_mistura, default=MISTURA_PADRAO,
+            help='Pesos por endpoint, ex.: "lista_pedidos=50,dashboard=10" (padrão: %(default)s).',
+        )
+        parser.add_argument('--semente', type=int, default=42, help='Semente da sequência de requisições.')
+        parser.add_argument(
+            '--url',
+            help='Envia as requisições a um servidor em execução (ex.: http://127.0.0.1:8000) em vez de '
+                 'usar o próprio processo. O servidor precisa usar o mesmo banco deste comando.',
+        )
+        parser.add_argument(
+            '--semear', action='store_true',
+            help='Com --url, popula o banco configurado e cria o usuário de benchmark. Sem --url o '
+                 'comando sempre usa um banco temporário.',
+        )
+        parser.add_argument('--usuario', default=USUARIO, help='Usuário usado com --url.')
+        parser.add_argument('--senha', default=SENHA, help='Senha usada com --url.')
+        parser.add_argument('--saida', help='Grava o relatório JSON neste arquivo em vez da saída padrão.')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            if options['semear']:
+                self._semear(options)
+            relatorio = self._executar(options, lambda: _ClienteHttp(
+                options['url'], options['usuario'], options['senha']
+            ))
+        else:
+            relatorio = self._executar_local(options)
+
+        texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto + '\n')
+            self.stderr.write(f"Relatório gravado em {options['saida']}")
+        else:
+            self.stdout.write(texto)
+
+    def _semear(self, options):
+        inicio = time.perf_counter()
+        semear(
+            clientes=options['clientes'],
+            produtos_por_cliente=options['produtos_por_cliente'],
+            pedidos=options['pedidos'],
+            itens_por_pedido=options['itens_por_pedido'],
+        )
+        usuario, _ = User.objects.get_or_create(
+            username=options['usuario'], defaults={'is_superuser': True, 'is_staff': True}
+        )
+        usuario.set_password(options['senha'])
+        usuario.save()
+        self.stderr.write(f'Banco populado em {time.perf_counter() - inicio:.1f} s')
+        return usuario
+
+    def _executar_local(self, options):
+        nome_original = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as diretorio:
+            if connection.vendor == 'sqlite':
+                # Arquivo em disco (e não o banco em memória dos testes) para
+                # que os trabalhadores concorram como em produção
+                connection.settings_dict['TEST'] = {
+                    **connection.settings_dict.get('TEST', {}),
+                    'NAME': os.path.join(diretorio, 'benchmark.sqlite3'),
+                }
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                usuario = self._semear(options)
+                configuracao = override_settings(
+                    ALLOWED_HOSTS=['testserver'], PDF_CACHE_DIR=os.path.join(diretorio, 'pdf')
+                )
+                with configuracao:
+                    return self._executar(options, lambda: _ClienteLocal(usuario))
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+    def _sequencia(self, options):
+        """Gera a lista de requisições de forma determinística a partir da semente."""
+        aleatorio = random.Random(options['semente'])
+        pedidos = list(Pedido.objects.order_by('id').values_list('id', flat=True))
+        clientes = list(Cliente.objects.order_by('id').values_list('id', flat=True))
+        if not pedidos or not clientes:
+            raise CommandError('O banco não tem clientes e pedidos; use --semear.')
+
+        nomes = list(options['mistura'])
+        pesos = [options['mistura'][nome] for nome in nomes]
+        total = options['requisicoes'] + options['aquecimento'] * options['trabalhadores']
+        sequencia = []
+        for nome in aleatorio.choices(nomes, pesos, k=total):
+            if nome == 'dashboard':
+                sequencia.append((nome, 'get', reverse('dashboard'), None))
+            elif nome == 'lista_pedidos':
+                filtro = aleatorio.choice([{}, {'status': aleatorio.choice(STATUS)}])
+                sequencia.append((nome, 'get', reverse('lista_pedidos'), filtro))
+            elif nome == 'atualizar_status_pedido':
+                url = reverse('atualizar_status_pedido', args=[aleatorio.choice(pedidos)])
+                sequencia.append((nome, 'post', url, {'status': aleatorio.choice(STATUS)}))
+            elif nome == 'exportar_pedido_pdf':
+                url = reverse('exportar_pedido_pdf', args=[aleatorio.choice(pedidos)])
+                sequencia.append((nome, 'get', url, None))
+            else:
+                url = reverse('produtos_por_cliente', args=[aleatorio.choice(clientes)])
+                sequencia.append((nome, 'get', url, None))
+        return sequencia
+
+    def _executar(self, options, criar_cliente):
+        sequencia = self._sequencia(options)
+        trabalhadores = options['trabalhadores']
+        aquecimento = options['aquecimento']
+        medidas = {nome: [] for nome in options['mistura']}
+        erros = {nome: 0 for nome in options['mistura']}
+        lock = threading.Lock()
+        inicio_comum = threading.Barrier(trabalhadores + 1)
+        # Sessões (e o login, com --url) preparadas antes de iniciar as threads:
+        # uma falha aqui encerra o comando sem deixar trabalhadores esperando
+        clientes = [criar_cliente() for _ in range(trabalhadores)]
+
+        def trabalhador(numero):
+            cliente = clientes[numero]
+            # Cada trabalhador pega uma requisição a cada `trabalhadores`
+            minhas = sequencia[numero::trabalhadores]
+            for nome, metodo, caminho, dados in minhas[:aquecimento]:
+                cliente.enviar(metodo, caminho, dados)
+            inicio_comum.wait()
+            for nome, metodo, caminho, dados in minhas[aquecimento:]:
+                inicio = time.perf_counter()
+                status = cliente.enviar(metodo, caminho, dados)
+                duracao = time.perf_counter() - inicio
+                with lock:
+                    medidas[nome].append(duracao)
+                    if status >= 400:
+                        erros[nome] += 1
+            cliente.fechar()
+
+        threads = [threading.Thread(target=trabalhador, args=(numero,)) for numero in range(trabalhadores)]
+        for thread in threads:
+            thread.start()
+        inicio_comum.wait()
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        return {
+            'configuracao': {
+                'modo': options['url'] or 'local',
+                'banco': connection.vendor,
+                'clientes': Cliente.objects.count(),
+                'pedidos': Pedido.objects.count(),
+                'requisicoes': options['requisicoes'],
+                'trabalhadores': trabalhadores,
+                'aquecimento': aquecimento,
+                'mistura': options['mistura'],
+                'semente': options['semente'],
+            },
+            'total': self._resumo([medida for lista in medidas.values() for medida in lista],
+                                  sum(erros.values()), duracao),
+            'endpoints': {
+                nome: self._resumo(medidas[nome], erros[nome], duracao) for nome in medidas
+            },
+        }
+
+    def _resumo(self, duracoes, erros, duracao_total):
+        duracoes = sorted(duracoes)
+
+        def ms(valor):
+            return round(valor * 1000, 2) if valor is not None else None
+
+        return {
+            'requisicoes': len(duracoes),
+            'erros': erros,
+            'vazao_rps': round(len(duracoes) / duracao_total, 1) if duracao_total else None,
+            'media_ms': ms(sum(duracoes) / len(duracoes)) if duracoes else None,
+            'p50_ms': ms(_percentil(duracoes, 0.50)),
+            'p95_ms': ms(_percentil(duracoes, 0.95)),
+            'p99_ms': ms(_percentil(duracoes, 0.99)),
+            'max_ms': ms(duracoes[-1]) if duracoes else None,
+        }
@@ -0,0 +1,175 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Memória residente atual do processo (pico, onde /proc não existe)
+MEMORIA = '''
+import json, os, sys, time
+
+def memoria_mb():
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+'''
+
+SCRIPT_VAZIO = MEMORIA + '''
+print(json.dumps({'rss_mb': memoria_mb(), 'modulos': len(sys.modules)}))
+'''
+
+# Executado em um interpretador novo, como um worker do gunicorn/uvicorn ao
+# subir: carrega a aplicação (e o WeasyPrint, se PDF_AQUECER=1) e depois as
+# URLs e as views, o que o Django faria na primeira requisição.
+SCRIPT_WORKER = MEMORIA + '''
+inicio = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+aplicacao = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+fim = time.perf_counter()
+
+print(json.dumps({
+    'aplicacao_ms': (aplicacao - inicio) * 1000,
+    'urls_ms': (fim - aplicacao) * 1000,
+    'total_ms': (fim - inicio) * 1000,
+    'rss_mb': memoria_mb(),
+    'modulos': len(sys.modules),
+    'weasyprint_carregado': 'weasyprint' in sys.modules,
+}))
+'''
+
+CENARIOS = {
+    'preguicoso': '0',
+    'aquecido': '1',
+}
+
+
+def _mediana(valores):
+    valores = [valor for valor in valores if valor is not None]
+    return round(statistics.median(valores), 1) if valores else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o tempo de inicialização e a memória residente de um worker (wsgi ou asgi) em '
+        'interpretadores novos, com o WeasyPrint carregado sob demanda e com PDF_AQUECER=1, '
+        'e emite o resultado em JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidor', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='Módulo de aplicação carregado (core.wsgi ou core.asgi).')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Processos por cenário.')
+        parser.add_argument(
+            '--cenarios', default=','.join(CENARIOS),
+            help='Cenários separados por vírgula: preguicoso (PDF na primeira exportação) e '
+                 'aquecido (PDF_AQUECER=1) (padrão: %(default)s).',
+        )
+        parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                            help='Lista os N pacotes de primeiro nível mais lentos de importar '
+                                 '(python -X importtime) no primeiro cenário.')
+        parser.add_argument('--saida', help='Grava o relatório JSON neste arquivo em vez da saída padrão.')
+
+    def handle(self, *args, **options):
+        cenarios = [nome.strip() for nome in options['cenarios'].split(',') if nome.strip()]
+        desconhecidos = [nome for nome in cenarios if nome not in CENARIOS]
+        if desconhecidos or not cenarios:
+            raise CommandError(f'Cenário desconhecido: {", ".join(desconhecidos)} (use {", ".join(CENARIOS)}).')
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser pelo menos 1.')
+
+        modulo = f"core.{options['servidor']}"
+        relatorio = {
+            'configuracao': {
+                'servidor': modulo,
+                'repeticoes': options['repeticoes'],
+                'python': sys.version.split()[0],
+            },
+            'interpretador': self._interpretador(options['repeticoes']),
+            'cenarios': {
+                nome: self._cenario(modulo, CENARIOS[nome], options['repeticoes']) for nome in cenarios
+            },
+        }
+        if options['importtime']:
+            relatorio['importacoes_mais_lentas'] = self._importtime(
+                modulo, CENARIOS[cenarios[0]], options['importtime']
+            )
+
+        texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto + '\n')
+            self.stderr.write(f"Relatório gravado em {options['saida']}")
+        else:
+            self.stdout.write(texto)
+
+    def _executar(self, argumentos, aquecer='0'):
+        ambiente = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),
+            'PDF_AQUECER': aquecer,
+        }
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, *argumentos], cwd=settings.BASE_DIR, env=ambiente,
+            capture_output=True, text=True,
+        )
+        duracao = (time.perf_counter() - inicio) * 1000
+        if processo.returncode != 0:
+            raise CommandError(f'O worker falhou ao inicializar:\n{processo.stderr.strip()}')
+        return processo, duracao
+
+    def _interpretador(self, repeticoes):
+        """Custo de um interpretador vazio, a referência para os cenários."""
+        medidas = []
+        for _ in range(repeticoes):
+            processo, duracao = self._executar(['-c', SCRIPT_VAZIO])
+            medidas.append({**json.loads(processo.stdout), 'processo_ms': duracao})
+        return {
+            'processo_ms': _mediana([medida['processo_ms'] for medida in medidas]),
+            'rss_mb': _mediana([medida['rss_mb'] for medida in medidas]),
+            'modulos': medidas[-1]['modulos'],
+        }
+
+    def _cenario(self, modulo, aquecer, repeticoes):
+        medidas = []
+        for _ in range(repeticoes):
+            processo, duracao = self._executar(['-c', SCRIPT_WORKER, modulo], aquecer)
+            medidas.append({**json.loads(processo.stdout.strip().splitlines()[-1]), 'processo_ms': duracao})
+        resumo = {
+            campo: _mediana([medida[campo] for medida in medidas])
+            for campo in ('processo_ms', 'aplicacao_ms', 'urls_ms', 'total_ms', 'rss_mb')
+        }
+        resumo['total_min_ms'] = round(min(medida['total_ms'] for medida in medidas), 1)
+        resumo['total_max_ms'] = round(max(medida['total_ms'] for medida in medidas), 1)
+        resumo['modulos'] = medidas[-1]['modulos']
+        resumo['weasyprint_carregado'] = medidas[-1]['weasyprint_carregado']
+        return resumo
+
+    def _importtime(self, modulo, aquecer, quantidade):
+        processo, _ = self._executar(['-X', 'importtime', '-c', SCRIPT_WORKER, modulo], aquecer)
+        pacotes = {}
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith('import time:') or '|' not in linha:
+                continue
+            _, acumulado, nome = linha.split('|')
+            # Só os pacotes importados diretamente (sem recuo), com o tempo acumulado
+            if nome.startswith(' ') and not nome.startswith('  ') and acumulado.strip().isdigit():
+                raiz = nome.strip().split('.')[0]
+                pacotes[raiz] = pacotes.get(raiz, 0) + int(acumulado)
+        mais_lentos = sorted(pacotes.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+        return [{'pacote': nome, 'acumulado_ms': round(micros / 1000, 1)} for nome, micros in mais_lentos]
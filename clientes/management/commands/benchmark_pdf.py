@@ -0,0 +1,145 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.staticfiles.finders import find
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from clientes.models import Cliente, ItemPedido, Pedido, Produto
+from clientes.pdf import arquivo_estatico, contexto_renderizacao, logo_url
+
+
+def _pedido_exemplo(quantidade_itens):
+    """Pedido em memória (sem banco) com os atributos que o template do PDF usa."""
+    cliente = Cliente(
+        id=1, nome='Contato Exemplo', telefone='(11) 90000-0000', endereco='Rua Exemplo, 100',
+        nome_marca='Marca Exemplo',
+    )
+    agora = timezone.now()
+    pedido = Pedido(
+        id=1, cliente=cliente, status='envio', numero_rastreio='BR000000001',
+        nome_transportadora='Transportadora', data_criacao=agora, data_atualizacao=agora,
+    )
+    pedido.itens = [
+        ItemPedido(
+            id=indice + 1,
+            pedido=pedido,
+            produto=Produto(
+                id=indice + 1, cliente=cliente, nome_produto=f'Produto {indice}',
+                codigo_barras=f'789{indice:010d}',
+            ),
+            quantidade=indice % 10 + 1,
+        )
+        for indice in range(quantidade_itens)
+    ]
+    pedido.total_itens = len(pedido.itens)
+    pedido.quantidade_total = sum(item.quantidade for item in pedido.itens)
+    return pedido
+
+
+def _html_anterior(pedido):
+    """HTML como era gerado antes do contexto: CSS embutido e logo lido do disco."""
+    html = render_to_string('clientes/pedido_pdf.html', {
+        'pedido': pedido, 'logo_url': Path(find('images/logo.png')).as_uri(),
+    })
+    css = arquivo_estatico('css/pedido_pdf.css').decode()
+    return html.replace('</head>', f'<style>{css}</style>\n</head>', 1)
+
+
+def _renderizar_anterior(html):
+    from weasyprint import HTML
+    return HTML(string=html).render()
+
+
+def _renderizar_contexto(html):
+    return contexto_renderizacao().renderizar(html)
+
+
+def _percentil(valores, fracao):
+    return valores[min(len(valores) - 1, int(len(valores) * fracao))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara a renderização de PDFs de pedido (cache de PDF não utilizado) pelo caminho anterior '
+        '(CSS embutido, FontConfiguration nova e logo lido do disco a cada PDF) e pelo contexto de '
+        'renderização reaproveitado de clientes/pdf.py, e emite os tempos em JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renderizacoes', type=int, default=20, help='PDFs medidos por caminho.')
+        parser.add_argument('--itens', type=int, default=30, help='Itens do pedido de exemplo.')
+        parser.add_argument('--aquecimento', type=int, default=2,
+                            help='Renderizações por caminho descartadas antes da medição.')
+        parser.add_argument('--saida', help='Grava o relatório JSON neste arquivo em vez da saída padrão.')
+
+    def handle(self, *args, **options):
+        if options['renderizacoes'] < 1:
+            raise CommandError('--renderizacoes deve ser pelo menos 1.')
+        try:
+            import weasyprint
+        except (ImportError, OSError) as erro:
+            raise CommandError(f'WeasyPrint indisponível: {erro}')
+
+        pedido = _pedido_exemplo(options['itens'])
+        caminhos = {
+            'anterior': (_renderizar_anterior, _html_anterior(pedido)),
+            'contexto': (_renderizar_contexto, render_to_string(
+                'clientes/pedido_pdf.html', {'pedido': pedido, 'logo_url': logo_url()}
+            )),
+        }
+
+        # Renderizações alternadas, para que variações da máquina afetem os dois caminhos
+        medidas = {nome: {'layout': [], 'escrita': []} for nome in caminhos}
+        for rodada in range(options['aquecimento'] + options['renderizacoes']):
+            for nome, (renderizar, html) in caminhos.items():
+                inicio = time.perf_counter()
+                documento = renderizar(html)
+                layout = time.perf_counter()
+                documento.write_pdf()
+                fim = time.perf_counter()
+                if rodada >= options['aquecimento']:
+                    medidas[nome]['layout'].append(layout - inicio)
+                    medidas[nome]['escrita'].append(fim - layout)
+
+        resumos = {nome: self._resumo(valores) for nome, valores in medidas.items()}
+        medianas = {
+            nome: statistics.median(map(sum, zip(valores['layout'], valores['escrita'])))
+            for nome, valores in medidas.items()
+        }
+        relatorio = {
+            'configuracao': {
+                'weasyprint': getattr(weasyprint, '__version__', None),
+                'renderizacoes': options['renderizacoes'],
+                'aquecimento': options['aquecimento'],
+                'itens': options['itens'],
+            },
+            'caminhos': resumos,
+            # Quantas vezes a mediana do caminho anterior é maior que a do contexto
+            'ganho_total': round(medianas['anterior'] / medianas['contexto'], 2),
+        }
+
+        texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto + '\n')
+            self.stderr.write(f"Relatório gravado em {options['saida']}")
+        else:
+            self.stdout.write(texto)
+
+    def _resumo(self, valores):
+        totais = sorted(layout + escrita for layout, escrita in zip(valores['layout'], valores['escrita']))
+
+        def ms(valor):
+            return round(valor * 1000, 2)
+
+        return {
+            'layout_p50_ms': ms(statistics.median(valores['layout'])),
+            'escrita_p50_ms': ms(statistics.median(valores['escrita'])),
+            'total_p50_ms': ms(statistics.median(totais)),
+            'total_p95_ms': ms(_percentil(totais, 0.95)),
+            'total_max_ms': ms(totais[-1]),
+        }
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.models import Pedido
+
+STATUS = [status for status, _ in Pedido.STATUS_CHOICES]
+
+# Pedidos por transação nos escritores em lote (como transicionar_status)
+PEDIDOS_POR_LOTE = 20
+
+
+def _configuracao_padrao():
+    # O que o Django usa sem OPTIONS: journal DELETE, synchronous FULL,
+    # transações DEFERRED e timeout de 5 segundos do módulo sqlite3
+    return {'timeout': 5, 'transaction_mode': 'DEFERRED', 'init_command': ''}
+
+
+def _configuracao_ajustada():
+    opcoes = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        'timeout': opcoes.get('timeout', 5),
+        'transaction_mode': opcoes.get('transaction_mode') or 'DEFERRED',
+        'init_command': opcoes.get('init_command', ''),
+    }
+
+
+def _conectar(caminho, configuracao):
+    conexao = sqlite3.connect(caminho, timeout=configuracao['timeout'], isolation_level=None,
+                              check_same_thread=False)
+    for comando in configuracao['init_command'].split(';'):
+        if comando.strip():
+            conexao.execute(comando)
+    return conexao
+
+
+def _preparar(caminho, linhas):
+    conexao = sqlite3.connect(caminho)
+    conexao.execute(
+        'CREATE TABLE pedido (id INTEGER PRIMARY KEY, cliente_id INTEGER, status TEXT, data_atualizacao TEXT)'
+    )
+    conexao.execute('CREATE INDEX pedido_status_id ON pedido (status, id)')
+    conexao.execute('CREATE TABLE contador (chave TEXT PRIMARY KEY, valor INTEGER)')
+    conexao.executemany('INSERT INTO contador (chave, valor) VALUES (?, 0)', ((status,) for status in STATUS))
+    conexao.execute(
+        'CREATE TABLE evento (id INTEGER PRIMARY KEY, pedido_id INTEGER, status_anterior TEXT, status TEXT, data TEXT)'
+    )
+    agora = datetime.now(timezone.utc).isoformat()
+    conexao.executemany(
+        'INSERT INTO pedido (cliente_id, status, data_atualizacao) VALUES (?, ?, ?)',
+        ((indice % 100, STATUS[indice % len(STATUS)], agora) for indice in range(linhas)),
+    )
+    conexao.commit()
+    conexao.close()
+
+
+def _mudar_status(conexao, pedido_id, status, agora):
+    """Gravações de uma mudança de status: pedido, contadores e histórico (ver clientes/signals.py)."""
+    novo = STATUS[(STATUS.index(status) + 1) % len(STATUS)]
+    conexao.execute(
+        'UPDATE pedido SET status = ?, data_atualizacao = ? WHERE id = ?', (novo, agora, pedido_id)
+    )
+    conexao.execute('UPDATE contador SET valor = valor - 1 WHERE chave = ?', (status,))
+    conexao.execute('UPDATE contador SET valor = valor + 1 WHERE chave = ?', (novo,))
+    conexao.execute(
+        'INSERT INTO evento (pedido_id, status_anterior, status, data) VALUES (?, ?, ?, ?)',
+        (pedido_id, status, novo, agora),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede escritas concorrentes no SQLite com a configuração padrão do Django e com a '
+        'configuração de DATABASES, em bancos temporários. Os escritores reproduzem '
+        'atualizar_status_pedido, que roda em autocommit (cada comando na sua própria '
+        'transação); os escritores em lote reproduzem transicionar_status, a única gravação '
+        'em transação explícita, onde transaction_mode faz diferença.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help='Threads que atualizam status.')
+        parser.add_argument('--escritores-lote', type=int, default=2,
+                            help='Threads que atualizam status em lote.')
+        parser.add_argument('--leitores', type=int, default=4, help='Threads que listam pedidos.')
+        parser.add_argument('--operacoes', type=int, default=200, help='Operações por thread.')
+        parser.add_argument('--linhas', type=int, default=20000, help='Pedidos no banco de teste.')
+
+    def handle(self, *args, **options):
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('O banco configurado não é SQLite.')
+
+        for nome, configuracao in (('padrão', _configuracao_padrao()), ('ajustada', _configuracao_ajustada())):
+            with tempfile.TemporaryDirectory() as diretorio:
+                caminho = os.path.join(diretorio, 'benchmark.sqlite3')
+                _preparar(caminho, options['linhas'])
+                resultado = self._executar(caminho, configuracao, options)
+            self._relatar(nome, resultado)
+
+    def _executar(self, caminho, configuracao, options):
+        latencias = {'view': [], 'lote': []}
+        erros = []
+        lock = threading.Lock()
+        inicio_comum = threading.Barrier(options['escritores'] + options['escritores_lote'] + options['leitores'])
+
+        def medir(tipo, conexao, operacao):
+            inicio = time.perf_counter()
+            try:
+                operacao()
+            except sqlite3.OperationalError as erro:
+                if conexao.in_transaction:
+                    conexao.execute('ROLLBACK')
+                with lock:
+                    erros.append(str(erro))
+                return
+            with lock:
+                latencias[tipo].append(time.perf_counter() - inicio)
+
+        def escritor(numero):
+            conexao = _conectar(caminho, configuracao)
+            inicio_comum.wait()
+            for operacao in range(options['operacoes']):
+                pedido_id = (numero * options['operacoes'] + operacao) % options['linhas'] + 1
+
+                def atualizar():
+                    # Como a view: sem transação explícita, cada comando em autocommit
+                    (status,) = conexao.execute(
+                        'SELECT status FROM pedido WHERE id = ?', (pedido_id,)
+                    ).fetchone()
+                    _mudar_status(conexao, pedido_id, status, datetime.now(timezone.utc).isoformat())
+
+                medir('view', conexao, atualizar)
+            conexao.close()
+
+        def escritor_lote(numero):
+            conexao = _conectar(caminho, configuracao)
+            inicio_comum.wait()
+            for operacao in range(options['operacoes'] // PEDIDOS_POR_LOTE or 1):
+                primeiro = (numero * options['operacoes'] + operacao * PEDIDOS_POR_LOTE) % options['linhas'] + 1
+
+                def atualizar_lote():
+                    # Como transicionar_status: lê e grava na mesma transação (transaction.atomic)
+                    conexao.execute(f"BEGIN {configuracao['transaction_mode']}")
+                    linhas = conexao.execute(
+                        'SELECT id, status FROM pedido WHERE id >= ? AND id < ?',
+                        (primeiro, primeiro + PEDIDOS_POR_LOTE),
+                    ).fetchall()
+                    agora = datetime.now(timezone.utc).isoformat()
+                    for pedido_id, status in linhas:
+                        _mudar_status(conexao, pedido_id, status, agora)
+                    conexao.execute('COMMIT')
+
+                medir('lote', conexao, atualizar_lote)
+            conexao.close()
+
+        def leitor(numero):
+            conexao = _conectar(caminho, configuracao)
+            inicio_comum.wait()
+            for operacao in range(options['operacoes']):
+                try:
+                    conexao.execute(
+                        'SELECT id, status FROM pedido WHERE status = ? ORDER BY id DESC LIMIT 51',
+                        (STATUS[(numero + operacao) % len(STATUS)],),
+                    ).fetchall()
+                except sqlite3.OperationalError as erro:
+                    with lock:
+                        erros.append(str(erro))
+            conexao.close()
+
+        threads = [threading.Thread(target=escritor, args=(numero,)) for numero in range(options['escritores'])]
+        threads += [
+            threading.Thread(target=escritor_lote, args=(numero,)) for numero in range(options['escritores_lote'])
+        ]
+        threads += [threading.Thread(target=leitor, args=(numero,)) for numero in range(options['leitores'])]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {'duracao': time.perf_counter() - inicio, 'latencias': latencias, 'erros': erros}
+
+    def _relatar(self, nome, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Configuração {nome}'))
+        for tipo, descricao in (('view', 'Mudanças de status (autocommit)'), ('lote', 'Lotes (transação)')):
+            latencias = sorted(resultado['latencias'][tipo])
+            self.stdout.write(f"  {descricao}: {len(latencias)} concluídas, "
+                              f"{len(latencias) / resultado['duracao']:.0f} por segundo")
+            if latencias:
+                p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+                self.stdout.write(
+                    f"    Latência: mediana {statistics.median(latencias) * 1000:.2f} ms, "
+                    f"p95 {p95 * 1000:.2f} ms"
+                )
+        estilo = self.style.ERROR if resultado['erros'] else self.style.SUCCESS
+        self.stdout.write(estilo(f"  Erros (OperationalError, ex.: database is locked): {len(resultado['erros'])}"))
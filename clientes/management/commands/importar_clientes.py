@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.importacao import ErroImportacao, importar_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes e produtos de um arquivo CSV (uma linha por produto).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas valida o arquivo e mostra o relatório, sem gravar.')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Quantidade de registros por bulk_create.')
+        parser.add_argument('--encoding', default='utf-8-sig',
+                            help='Codificação do arquivo (padrão: utf-8 com ou sem BOM).')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], encoding=options['encoding'], newline='') as arquivo:
+                relatorio = importar_csv(arquivo, dry_run=options['dry_run'], tamanho_lote=options['lote'])
+        except (OSError, UnicodeDecodeError, ErroImportacao) as erro:
+            raise CommandError(str(erro))
+
+        if relatorio['dry_run']:
+            self.stdout.write(self.style.WARNING('Simulação: nenhum dado foi gravado.'))
+        self.stdout.write(f"Linhas lidas: {relatorio['linhas']}")
+        self.stdout.write(f"Clientes criados: {relatorio['clientes_criados']}")
+        self.stdout.write(f"Produtos criados: {relatorio['produtos_criados']}")
+        self.stdout.write(f"Produtos já existentes: {relatorio['produtos_duplicados']}")
+        self.stdout.write(f"Linhas inválidas: {relatorio['linhas_invalidas']}")
+        for erro in relatorio['erros']:
+            self.stdout.write(self.style.ERROR(erro))
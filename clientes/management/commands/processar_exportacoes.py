@@ -0,0 +1,54 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+
+from clientes.tarefas import criar_executor, limpar_exportacoes, processar, reservar_proxima
+
+# Intervalo entre limpezas dos arquivos expirados
+INTERVALO_LIMPEZA = 3600
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de exportações de PDFs em lote usando um pool de processos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=None,
+                            help='Quantidade de processos de renderização (padrão: número de CPUs; '
+                                 '0 renderiza no próprio processo).')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos entre consultas à fila quando ela está vazia.')
+        parser.add_argument('--uma-vez', action='store_true',
+                            help='Processa os jobs pendentes e encerra.')
+
+    def handle(self, *args, **options):
+        executor = criar_executor(options['processos'])
+        ultima_limpeza = None
+        try:
+            while True:
+                if ultima_limpeza is None or time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                    limpar_exportacoes()
+                    ultima_limpeza = time.monotonic()
+
+                exportacao = reservar_proxima()
+                if exportacao is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                self.stdout.write(f'Processando exportação {exportacao.pk} ({exportacao.total} pedidos)...')
+                try:
+                    concluida = processar(exportacao, executor)
+                except BrokenProcessPool:
+                    # Um processo do pool morreu: recria o pool e segue com a fila
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = criar_executor(options['processos'])
+                    concluida = False
+
+                if concluida:
+                    self.stdout.write(self.style.SUCCESS(f'Exportação {exportacao.pk} concluída.'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Exportação {exportacao.pk} falhou.'))
+        finally:
+            executor.shutdown()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clientes.busca import reindexar_tudo
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual de clientes, produtos e pedidos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000,
+                            help='Quantidade de registros gravados por vez.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reindexar_tudo(tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS('Índice de busca reconstruído.'))
@@ -0,0 +1,103 @@
+# clientes/management/fabricas.py
+
+# Fábricas de dados em massa para testes e benchmarks.
+#
+# Os registros são gravados com bulk_create em lotes, sem passar pelos
+# sinais; ao final o índice de busca é reconstruído e os contadores do
+# dashboard são invalidados, deixando o banco no mesmo estado que teria
+# se os dados tivessem sido cadastrados pelas telas.
+
+from datetime import timedelta
+from itertools import cycle
+
+from django.utils import timezone
+
+from clientes import busca, contadores
+from clientes.historico import registrar_transicoes
+from clientes.models import Cliente, ItemPedido, Pedido, PedidoStatusEvento, Produto
+
+TAMANHO_LOTE = 1000
+
+STATUS = [status for status, _ in Pedido.STATUS_CHOICES]
+
+
+def criar_clientes(quantidade, produtos_por_cliente=5, inicio=0):
+    """Cria `quantidade` clientes com `produtos_por_cliente` produtos cada."""
+    clientes = Cliente.objects.bulk_create([
+        Cliente(
+            nome=f'Contato {numero}',
+            telefone=f'(11) 9{numero:08d}',
+            endereco=f'Rua {numero}, {numero % 1000}',
+            nome_marca=f'Marca {numero:06d}',
+        )
+        for numero in range(inicio, inicio + quantidade)
+    ], batch_size=TAMANHO_LOTE)
+    Produto.objects.bulk_create([
+        Produto(
+            cliente=cliente,
+            nome_produto=f'Produto {indice} da {cliente.nome_marca}',
+            codigo_barras=f'789{cliente.id:07d}{indice:03d}',
+            numero_processo=f'PROC-{cliente.id}-{indice}',
+        )
+        for cliente in clientes
+        for indice in range(produtos_por_cliente)
+    ], batch_size=TAMANHO_LOTE)
+    return clientes
+
+
+def criar_pedidos(quantidade, clientes=None, itens_por_pedido=3):
+    """Cria pedidos distribuídos entre os clientes e os status, com itens e histórico.
+
+    Cada pedido recebe o evento de criação e um terço deles (os que ainda
+    não estão no status final) avança para o status seguinte, com o evento
+    e o tempo por etapa, como faria transicionar_status.
+    """
+    clientes = list(clientes if clientes is not None else Cliente.objects.all())
+    produtos = {}
+    for produto_id, cliente_id in Produto.objects.filter(
+        cliente__in=clientes
+    ).order_by('id').values_list('id', 'cliente_id'):
+        produtos.setdefault(cliente_id, []).append(produto_id)
+
+    agora = timezone.now()
+    status = cycle(STATUS)
+    pedidos = Pedido.objects.bulk_create([
+        Pedido(
+            cliente=clientes[numero % len(clientes)],
+            status=next(status),
+            numero_rastreio=f'BR{numero:09d}' if numero % 2 else None,
+            nome_transportadora='Transportadora' if numero % 2 else None,
+            data_status=agora - timedelta(hours=numero % 500),
+        )
+        for numero in range(quantidade)
+    ], batch_size=TAMANHO_LOTE)
+
+    ItemPedido.objects.bulk_create([
+        ItemPedido(pedido=pedido, produto_id=produto_id, quantidade=indice + 1)
+        for pedido in pedidos
+        for indice, produto_id in enumerate(produtos.get(pedido.cliente_id, [])[:itens_por_pedido])
+    ], batch_size=TAMANHO_LOTE)
+
+    PedidoStatusEvento.objects.bulk_create([
+        PedidoStatusEvento(pedido=pedido, status=pedido.status, data=pedido.data_status)
+        for pedido in pedidos
+    ], batch_size=TAMANHO_LOTE)
+
+    avancados = [pedido for pedido in pedidos[::3] if pedido.status != STATUS[-1]]
+    transicoes = []
+    for pedido in avancados:
+        novo = STATUS[STATUS.index(pedido.status) + 1]
+        transicoes.append((pedido.id, pedido.cliente_id, pedido.status, novo, pedido.data_status))
+        pedido.status, pedido.data_status = novo, agora
+    Pedido.objects.bulk_update(avancados, ['status', 'data_status'], batch_size=TAMANHO_LOTE)
+    registrar_transicoes(transicoes, data=agora)
+    return pedidos
+
+
+def semear(clientes=2000, produtos_por_cliente=5, pedidos=3000, itens_por_pedido=3):
+    """Popula o banco com um volume realista e deixa índice e contadores em dia."""
+    criados = criar_clientes(clientes, produtos_por_cliente, inicio=Cliente.objects.count())
+    criar_pedidos(pedidos, criados, itens_por_pedido)
+    busca.reindexar_tudo()
+    contadores.invalidar()
+    return criados
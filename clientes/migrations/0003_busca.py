@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Índice de busca textual (ver clientes/busca.py). A tabela não tem modelo:
+# no SQLite é uma tabela virtual FTS5 e no PostgreSQL uma tabela com uma
+# coluna tsvector gerada e índice GIN. Outros bancos usam a busca sem índice.
+
+PREENCHER = [
+    "INSERT INTO clientes_busca ({chave}, titulo, texto) "
+    "SELECT id * 4 + 1, nome_marca, nome_marca || ' ' || nome FROM clientes_cliente",
+    "INSERT INTO clientes_busca ({chave}, titulo, texto) "
+    "SELECT id * 4 + 2, nome_produto, nome_produto || ' ' || codigo_barras || ' ' || numero_processo "
+    "FROM clientes_produto",
+    "INSERT INTO clientes_busca ({chave}, titulo, texto) "
+    "SELECT p.id * 4 + 3, 'Pedido #' || CAST(p.id AS TEXT), "
+    "CAST(p.id AS TEXT) || ' ' || COALESCE(p.numero_rastreio, '') || ' ' || c.nome_marca "
+    "FROM clientes_pedido p JOIN clientes_cliente c ON c.id = p.cliente_id",
+]
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE clientes_busca USING fts5("
+            "titulo, texto, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        chave = 'rowid'
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE clientes_busca ("
+            "id bigint PRIMARY KEY, titulo text NOT NULL, texto text NOT NULL, "
+            "documento tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', titulo), 'A') || to_tsvector('simple', texto)) STORED)"
+        )
+        schema_editor.execute(
+            'CREATE INDEX clientes_busca_documento ON clientes_busca USING GIN (documento)'
+        )
+        chave = 'id'
+    else:
+        return
+    for sql in PREENCHER:
+        schema_editor.execute(sql.format(chave=chave))
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS clientes_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_exportacaopedidos'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def mesclar_produtos_duplicados(apps, schema_editor):
+    # Prepara a restrição única (cliente, codigo_barras) da migração 0005:
+    # mantém o produto mais antigo de cada código e move para ele os itens
+    # de pedido que apontavam para as cópias.
+    Produto = apps.get_model('clientes', 'Produto')
+    ItemPedido = apps.get_model('clientes', 'ItemPedido')
+    duplicados = (
+        Produto.objects.values('cliente_id', 'codigo_barras')
+        .annotate(total=Count('id'), manter=Min('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in duplicados:
+        copias = Produto.objects.filter(
+            cliente_id=grupo['cliente_id'], codigo_barras=grupo['codigo_barras']
+        ).exclude(id=grupo['manter'])
+        ItemPedido.objects.filter(produto__in=copias).update(produto_id=grupo['manter'])
+        copias.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_busca'),
+    ]
+
+    operations = [
+        migrations.RunPython(mesclar_produtos_duplicados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_mesclar_produtos_duplicados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome_marca'], name='cliente_nome_marca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', '-id'], name='pedido_status_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', 'data_atualizacao'], name='pedido_status_atualizacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='pedido_atualizacao_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='produto',
+            constraint=models.UniqueConstraint(fields=('cliente', 'codigo_barras'), name='produto_cliente_codigo_barras_unico'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='data_status',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='PedidoStatusEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_anterior', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(choices=[('entrada', 'Pagamento da Entrada'), ('materia_prima', 'Solicitação de Matéria Prima'), ('producao', 'Produção'), ('envase', 'Envase'), ('acabamento', 'Acabamento'), ('transporte', 'Solicitação de Transporte'), ('envio', 'Envio de Mercadoria'), ('entregue', 'Entregue')], max_length=50)),
+                ('data', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pedido', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='clientes.pedido')),
+                ('usuario', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pedido', 'id'], name='evento_pedido_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TempoEtapa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etapa', models.CharField(choices=[('entrada', 'Pagamento da Entrada'), ('materia_prima', 'Solicitação de Matéria Prima'), ('producao', 'Produção'), ('envase', 'Envase'), ('acabamento', 'Acabamento'), ('transporte', 'Solicitação de Transporte'), ('envio', 'Envio de Mercadoria'), ('entregue', 'Entregue')], max_length=50)),
+                ('semana', models.DateField()),
+                ('faixa', models.PositiveSmallIntegerField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('soma_segundos', models.FloatField(default=0)),
+                ('cliente', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='clientes.cliente')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cliente', 'semana', 'etapa', 'faixa'], name='tempo_etapa_cliente_idx')],
+            },
+        ),
+    ]
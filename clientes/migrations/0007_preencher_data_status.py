@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def preencher_data_status(apps, schema_editor):
+    # Para pedidos anteriores ao histórico, a melhor estimativa de entrada no
+    # status atual é a última atualização
+    Pedido = apps.get_model('clientes', 'Pedido')
+    Pedido.objects.update(data_status=F('data_atualizacao'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_historico_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_data_status, migrations.RunPython.noop),
+    ]
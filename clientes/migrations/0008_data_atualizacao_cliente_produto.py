@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0007_preencher_data_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['data_atualizacao'], name='cliente_atualizacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['cliente', 'data_atualizacao'], name='produto_atualizacao_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0008_data_atualizacao_cliente_produto'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cliente',
+            name='cliente_atualizacao_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='cliente_atualizacao_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['data_atualizacao', 'id'], name='produto_atualizacao_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0011_indice_evento_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacaopedidos',
+            name='tentativas',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0012_tentativas_exportacao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'data_atualizacao'], name='pedido_cliente_atualizacao_idx'),
+        ),
+    ]
@@ -1,12 +1,24 @@
 # clientes/models.py
 
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 class Cliente(models.Model):
     nome = models.CharField(max_length=255)
     telefone = models.CharField(max_length=20)
     endereco = models.CharField(max_length=255)
     nome_marca = models.CharField(max_length=255)
+    # Usado no ETag/Last-Modified das páginas de cliente (ver clientes/condicional.py)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nome_marca'], name='cliente_nome_marca_idx'),
+            # Max(data_atualizacao) do GET condicional e paginação da API por (data, id)
+            models.Index(fields=['data_atualizacao', 'id'], name='cliente_atualizacao_id_idx'),
+        ]
 
     def __str__(self):
         return self.nome_marca
@@ -16,10 +28,43 @@ class Produto(models.Model):
     nome_produto = models.CharField(max_length=255)
     codigo_barras = models.CharField(max_length=100)
     numero_processo = models.CharField(max_length=100)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'codigo_barras'], name='produto_cliente_codigo_barras_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['cliente', 'data_atualizacao'], name='produto_atualizacao_idx'),
+            # Paginação da API por (data_atualizacao, id)
+            models.Index(fields=['data_atualizacao', 'id'], name='produto_atualizacao_id_idx'),
+        ]
 
     def __str__(self):
         return self.nome_produto
-    
+
+
+class PedidoQuerySet(models.QuerySet):
+
+    def com_itens(self):
+        """Carrega cliente, itens e produtos dos itens em um número fixo de consultas.
+
+        Os itens ficam na lista pedido.itens e os totais em pedido.total_itens
+        e pedido.quantidade_total.
+        """
+        itens = (
+            ItemPedido.objects.select_related('produto')
+            .only('pedido', 'produto', 'quantidade', 'produto__nome_produto', 'produto__codigo_barras')
+            .order_by('id')
+        )
+        return self.select_related('cliente').prefetch_related(
+            models.Prefetch('itempedido_set', queryset=itens, to_attr='itens')
+        ).annotate(
+            total_itens=models.Count('itempedido'),
+            quantidade_total=Coalesce(models.Sum('itempedido__quantidade'), 0),
+        )
+
+
 class Pedido(models.Model):
     STATUS_CHOICES = (
         ('entrada', 'Pagamento da Entrada'),
@@ -39,6 +84,21 @@ class Pedido(models.Model):
     nome_transportadora = models.CharField(max_length=255, blank=True, null=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
+    # Quando o pedido entrou no status atual (base do tempo por etapa)
+    data_status = models.DateTimeField(default=timezone.now)
+
+    objects = PedidoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Filtros por status (com ou sem período) e listagem paginada por id
+            models.Index(fields=['status', '-id'], name='pedido_status_id_idx'),
+            models.Index(fields=['status', 'data_atualizacao'], name='pedido_status_atualizacao_idx'),
+            # Pedidos de um cliente por período; sem período basta o índice da FK
+            models.Index(fields=['cliente', 'data_atualizacao'], name='pedido_cliente_atualizacao_idx'),
+            # Filtro por período e paginação por data de atualização
+            models.Index(fields=['data_atualizacao', 'id'], name='pedido_atualizacao_id_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id} de {self.cliente.nome_marca}"
@@ -49,4 +109,78 @@ class ItemPedido(models.Model):
     quantidade = models.PositiveIntegerField()
 
     def __str__(self):
-        return f"{self.produto.nome_produto} ({self.quantidade})"
\ No newline at end of file
+        return f"{self.produto.nome_produto} ({self.quantidade})"
+
+class PedidoStatusEvento(models.Model):
+    """Histórico de mudanças de status (somente inserção)."""
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='eventos', db_index=False)
+    status_anterior = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=50, choices=Pedido.STATUS_CHOICES)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    data = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Linha do tempo de um pedido em ordem de inserção
+            models.Index(fields=['pedido', 'id'], name='evento_pedido_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido {self.pedido_id}: {self.status_anterior or '-'} -> {self.status}"
+
+class ContadorDashboard(models.Model):
+    """Valor de um contador do dashboard (ver clientes/contadores.py)."""
+    chave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.chave}: {self.valor}"
+
+class TempoEtapa(models.Model):
+    """Histograma pré-calculado do tempo que os pedidos passam em cada etapa.
+
+    Cada linha conta os pedidos que saíram de `etapa` na `semana` com duração
+    dentro da faixa `faixa` (ver clientes/historico.py). Linhas com cliente
+    nulo acumulam todos os clientes.
+    """
+    etapa = models.CharField(max_length=50, choices=Pedido.STATUS_CHOICES)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    semana = models.DateField()
+    faixa = models.PositiveSmallIntegerField()
+    quantidade = models.PositiveIntegerField(default=0)
+    soma_segundos = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', 'semana', 'etapa', 'faixa'], name='tempo_etapa_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.etapa} ({self.semana}, faixa {self.faixa}): {self.quantidade}"
+
+class ExportacaoPedidos(models.Model):
+    FORMATO_CHOICES = (
+        ('pdf', 'PDF único'),
+        ('zip', 'Arquivo ZIP'),
+    )
+    STATUS_CHOICES = (
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+        ('erro', 'Erro'),
+    )
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    pedidos_ids = models.JSONField(default=list)
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, default='zip')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    total = models.PositiveIntegerField(default=0)
+    concluidos = models.PositiveIntegerField(default=0)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    arquivo = models.CharField(max_length=500, blank=True)
+    erro = models.TextField(blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Exportação {self.id} ({self.get_status_display()})"
@@ -0,0 +1,100 @@
+# clientes/paginacao.py
+
+# Paginação por chave (keyset / seek) sobre o campo id.
+#
+# Em vez de OFFSET, cada página é buscada a partir do último id visto
+# ("apos") ou do primeiro id da página seguinte ("antes"), de modo que o
+# custo de uma página não cresce com o tamanho da tabela.
+#
+# Com um filtro de intervalo sobre outro campo (ex.: data_atualizacao), a
+# ordem passa a ser (campo, id): assim o mesmo índice que atende o
+# intervalo entrega as linhas já ordenadas, sem ordenar em memória. O
+# cursor então leva os dois valores ("<microssegundos>.<id>").
+
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+
+ORIGEM = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSSEGUNDO = timedelta(microseconds=1)
+
+
+def _parse_id(valor):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor if valor > 0 else None
+
+
+def _parse_cursor(valor, campo):
+    """Cursor como (valor do campo, id); None se ausente ou inválido."""
+    if campo is None:
+        pk = _parse_id(valor)
+        return None if pk is None else (None, pk)
+    try:
+        micro, pk = valor.split('.')
+        momento = ORIGEM + int(micro) * MICROSSEGUNDO
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    pk = _parse_id(pk)
+    return None if pk is None else (momento, pk)
+
+
+def _cursor(item, campo):
+    if campo is None:
+        return item.id
+    return f'{(getattr(item, campo) - ORIGEM) // MICROSSEGUNDO}.{item.id}'
+
+
+def _alem(campo, cursor, operador):
+    """Registros depois do cursor na direção do operador ('lt' ou 'gt')."""
+    valor, pk = cursor
+    if campo is None:
+        return Q(**{f'id__{operador}': pk})
+    # O primeiro termo repete o limite sobre o campo fora do OR, para que o
+    # índice comece a leitura no cursor em vez de percorrer o que já passou
+    return Q(**{f'{campo}__{operador}e': valor}) & (
+        Q(**{f'{campo}__{operador}': valor}) | Q(**{campo: valor, f'id__{operador}': pk})
+    )
+
+
+def consulta_da_pagina(queryset, apos=None, antes=None, tamanho=50, campo=None):
+    """Queryset (já limitado) lido por paginar_por_id para os cursores informados."""
+    ordem = [campo, 'id'] if campo else ['id']
+    antes = _parse_cursor(antes, campo)
+    if antes is not None:
+        return queryset.filter(_alem(campo, antes, 'gt')).order_by(*ordem)[:tamanho + 1]
+    apos = _parse_cursor(apos, campo)
+    if apos is not None:
+        queryset = queryset.filter(_alem(campo, apos, 'lt'))
+    return queryset.order_by(*[f'-{nome}' for nome in ordem])[:tamanho + 1]
+
+
+def paginar_por_id(queryset, apos=None, antes=None, tamanho=50, campo=None):
+    """Retorna uma página do queryset em ordem decrescente de id.
+
+    `apos` busca os registros com id menor que o informado (próxima página);
+    `antes` busca os registros com id maior (página anterior). Com `campo`,
+    a ordem é decrescente por (campo, id). Cursores inválidos são ignorados
+    e levam à primeira página.
+    """
+    voltando = _parse_cursor(antes, campo) is not None
+    avancando = not voltando and _parse_cursor(apos, campo) is not None
+    itens = list(consulta_da_pagina(queryset, apos, antes, tamanho, campo))
+
+    if voltando:
+        # Buscada em ordem crescente a partir do cursor; inverte em memória
+        tem_anterior = len(itens) > tamanho
+        itens = itens[:tamanho][::-1]
+        tem_proxima = True
+    else:
+        tem_proxima = len(itens) > tamanho
+        itens = itens[:tamanho]
+        tem_anterior = avancando
+
+    return {
+        'itens': itens,
+        'proximo_cursor': _cursor(itens[-1], campo) if itens and tem_proxima else None,
+        'anterior_cursor': _cursor(itens[0], campo) if itens and tem_anterior else None,
+    }
@@ -0,0 +1,307 @@
+# clientes/pdf.py
+
+# Geração dos PDFs de pedido com cache em disco.
+#
+# Cada PDF é gravado com um nome derivado do conteúdo do pedido (id,
+# data_atualizacao, dados do cliente e itens) e da versão do layout
+# (template, folha de estilos e VERSAO_LAYOUT), de modo que downloads
+# repetidos de um pedido inalterado são servidos direto do arquivo e uma
+# mudança no layout não serve PDFs antigos.
+# O diretório é limitado em tamanho e os arquivos menos usados são
+# removidos primeiro (LRU pela data de modificação).
+#
+# O WeasyPrint (e as bibliotecas nativas de fontes e layout que ele carrega)
+# só é importado na primeira renderização, para não pesar na inicialização
+# dos workers e dos comandos do manage.py que nunca geram PDF. Com
+# PDF_AQUECER ativo, core/wsgi.py e core/asgi.py chamam aquecer() ao subir
+# o worker, tirando esse custo da primeira requisição de PDF.
+#
+# Cada processo mantém um contexto de renderização reaproveitado entre os
+# PDFs: a folha de estilos (static/css/pedido_pdf.css) é interpretada uma
+# só vez, a FontConfiguration é compartilhada e a imagem do logo fica no
+# cache de imagens do WeasyPrint. Os arquivos estáticos referenciados como
+# "cct-estatico:<caminho>" são servidos da memória pelo URL fetcher, sem
+# acessar o disco a cada renderização.
+
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import find
+from django.template.loader import get_template, render_to_string
+
+from core.metricas import medir_pdf
+
+from .models import ItemPedido
+
+
+def _diretorio_cache():
+    return str(getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'pdf')))
+
+
+def _tamanho_maximo():
+    return getattr(settings, 'PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+ESQUEMA_ESTATICO = 'cct-estatico:'
+TEMPLATE_PDF = 'clientes/pedido_pdf.html'
+ESTILO_PDF = 'css/pedido_pdf.css'
+
+# Incrementar quando a renderização mudar por outro motivo (versão do
+# WeasyPrint, logo, filtros usados no template)
+VERSAO_LAYOUT = 1
+
+
+@lru_cache(maxsize=None)
+def arquivo_estatico(caminho):
+    """Conteúdo de um arquivo estático, lido do disco uma vez por processo."""
+    encontrado = find(caminho)
+    if encontrado is None:
+        raise FileNotFoundError(f'Arquivo estático não encontrado pelos STATICFILES_FINDERS: {caminho}')
+    with open(encontrado, 'rb') as arquivo:
+        return arquivo.read()
+
+
+@lru_cache(maxsize=None)
+def versao_renderizacao():
+    """Hash do template e da folha de estilos do PDF, calculado uma vez por processo."""
+    h = hashlib.sha256(str(VERSAO_LAYOUT).encode())
+    h.update(get_template(TEMPLATE_PDF).template.source.encode())
+    h.update(arquivo_estatico(ESTILO_PDF))
+    return h.hexdigest()
+
+
+def logo_url():
+    return ESQUEMA_ESTATICO + 'images/logo.png'
+
+
+def _estatico_da_url(url):
+    caminho = url[len(ESQUEMA_ESTATICO):]
+    return arquivo_estatico(caminho), mimetypes.guess_type(caminho)[0]
+
+
+def criar_url_fetcher():
+    """URL fetcher que serve "cct-estatico:" da memória e delega o resto ao padrão."""
+    try:
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        # Versões anteriores do WeasyPrint: o fetcher é uma função que retorna um dict
+        from weasyprint import default_url_fetcher
+
+        def buscar(url, *args, **kwargs):
+            if url.startswith(ESQUEMA_ESTATICO):
+                conteudo, tipo = _estatico_da_url(url)
+                return {'string': conteudo, 'mime_type': tipo, 'redirected_url': url}
+            return default_url_fetcher(url, *args, **kwargs)
+        return buscar
+
+    class BuscadorEstatico(URLFetcher):
+        def fetch(self, url, headers=None):
+            if url.startswith(ESQUEMA_ESTATICO):
+                conteudo, tipo = _estatico_da_url(url)
+                return URLFetcherResponse(url, conteudo, {'Content-Type': tipo})
+            return super().fetch(url, headers)
+
+    return BuscadorEstatico()
+
+
+class ContextoRenderizacao:
+    """Estado do WeasyPrint reaproveitado entre as renderizações do processo.
+
+    A FontConfiguration não pode ser usada por duas renderizações ao mesmo
+    tempo, por isso o layout é serializado; como ele roda em Python (preso
+    ao GIL), threads simultâneas não o deixariam mais rápido.
+    """
+
+    def __init__(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.fontes = FontConfiguration()
+        self.url_fetcher = criar_url_fetcher()
+        self.estilos = [CSS(
+            string=arquivo_estatico(ESTILO_PDF).decode(),
+            font_config=self.fontes,
+            url_fetcher=self.url_fetcher,
+        )]
+        # Imagens já decodificadas, por URL
+        self.imagens = {}
+        self.lock = threading.Lock()
+
+    def renderizar(self, html_string):
+        from weasyprint import HTML
+        documento = HTML(string=html_string, url_fetcher=self.url_fetcher)
+        with self.lock:
+            return documento.render(stylesheets=self.estilos, font_config=self.fontes, cache=self.imagens)
+
+
+_contexto = None
+_lock_contexto = threading.Lock()
+
+
+def contexto_renderizacao():
+    global _contexto
+    with _lock_contexto:
+        if _contexto is None:
+            _contexto = ContextoRenderizacao()
+        return _contexto
+
+
+def chave_pdf(pedido):
+    """Hash do conteúdo que aparece no PDF do pedido."""
+    if hasattr(pedido, 'itens'):
+        # Itens já carregados por Pedido.objects.com_itens()
+        itens = [
+            (item.id, item.quantidade, item.produto.nome_produto, item.produto.codigo_barras)
+            for item in pedido.itens
+        ]
+    else:
+        itens = (
+            ItemPedido.objects.filter(pedido=pedido)
+            .order_by('id')
+            .values_list('id', 'quantidade', 'produto__nome_produto', 'produto__codigo_barras')
+        )
+    cliente = pedido.cliente
+    h = hashlib.sha256(versao_renderizacao().encode())
+    h.update(repr((
+        pedido.pk,
+        pedido.data_atualizacao.isoformat(),
+        cliente.nome_marca,
+        cliente.telefone,
+        cliente.endereco,
+    )).encode())
+    for item in itens:
+        h.update(repr(item).encode())
+    return h.hexdigest()
+
+
+def aquecer():
+    """Importa o WeasyPrint e prepara o contexto de renderização do processo.
+
+    Renderiza um documento com o logo para carregar as fontes, a folha de
+    estilos padrão do WeasyPrint e o cache de imagens.
+    """
+    contexto_renderizacao().renderizar(f'<img src="{logo_url()}"><p>cct</p>')
+
+
+def renderizar_documento(pedido):
+    html_string = render_to_string(TEMPLATE_PDF, {'pedido': pedido, 'logo_url': logo_url()})
+    with medir_pdf('layout'):
+        return contexto_renderizacao().renderizar(html_string)
+
+
+def renderizar_pdf(pedido):
+    documento = renderizar_documento(pedido)
+    with medir_pdf('escrita'):
+        return documento.write_pdf()
+
+
+def juntar_documentos(documentos, destino):
+    """Grava vários documentos renderizados em um único PDF."""
+    paginas = [pagina for documento in documentos for pagina in documento.pages]
+    with medir_pdf('escrita'):
+        documentos[0].copy(paginas).write_pdf(destino)
+
+
+def juntar_arquivos_pdf(caminhos, destino):
+    """Concatena PDFs já gravados, na ordem, em um único arquivo (usa o pypdf)."""
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for caminho in caminhos:
+        escritor.append(caminho)
+    with medir_pdf('escrita'):
+        escritor.write(destino)
+
+
+def _caminho(pedido, chave):
+    return os.path.join(_diretorio_cache(), f'{pedido.pk}-{chave}.pdf')
+
+
+def _gravar(pedido, chave, conteudo):
+    diretorio = _diretorio_cache()
+    os.makedirs(diretorio, exist_ok=True)
+
+    # Uma leitura do diretório: remove versões anteriores do mesmo pedido e
+    # guarda os demais PDFs para o limite de tamanho
+    caminho = _caminho(pedido, chave)
+    prefixo = f'{pedido.pk}-'
+    outros = []
+    for entrada in os.scandir(diretorio):
+        if not entrada.name.endswith('.pdf') or entrada.path == caminho:
+            continue
+        if entrada.name.startswith(prefixo):
+            _remover(entrada.path)
+        else:
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            outros.append((info.st_mtime, info.st_size, entrada.path))
+
+    # Grava em arquivo temporário e renomeia, para nunca servir um PDF pela metade
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+    # O arquivo recém-gravado nunca entra na remoção, mesmo maior que o limite
+    _aplicar_limite(outros, ocupado=len(conteudo))
+    return caminho
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _arquivos_em_cache(diretorio):
+    """(mtime, tamanho, caminho) de cada PDF do diretório."""
+    arquivos = []
+    for entrada in os.scandir(diretorio):
+        if entrada.name.endswith('.pdf'):
+            info = entrada.stat()
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+    return arquivos
+
+
+def _aplicar_limite(arquivos, ocupado=0):
+    """Remove os arquivos menos usados até o total (mais `ocupado`) caber no limite."""
+    total = ocupado + sum(tamanho for _, tamanho, _ in arquivos)
+    limite = _tamanho_maximo()
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        _remover(caminho)
+        total -= tamanho
+
+
+def abrir_pdf(pedido, chave=None):
+    """Abre o PDF do pedido a partir do cache, renderizando se necessário."""
+    chave = chave or chave_pdf(pedido)
+    caminho = _caminho(pedido, chave)
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        # Marca o arquivo como usado recentemente para a política LRU
+        try:
+            os.utime(caminho)
+        except FileNotFoundError:
+            pass
+        return arquivo
+    conteudo = renderizar_pdf(pedido)
+    caminho = _gravar(pedido, chave, conteudo)
+    try:
+        return open(caminho, 'rb')
+    except FileNotFoundError:
+        # Removido por outro processo ao aplicar o limite: serve da memória
+        return io.BytesIO(conteudo)
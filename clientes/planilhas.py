@@ -0,0 +1,262 @@
+# clientes/planilhas.py
+
+# Exportação de pedidos e clientes em CSV e XLSX por streaming.
+#
+# As linhas são geradas a partir de querysets percorridos com iterator()
+# e enviadas ao navegador em blocos, então a memória usada não depende do
+# número de registros. O XLSX é montado diretamente como um zip com uma
+# única planilha de strings inline, sem depender de bibliotecas externas.
+#
+# Textos que começam com =, +, - ou @ recebem um apóstrofo na frente para
+# que a planilha não os interprete como fórmula (nomes de marca, rastreios
+# e endereços vêm de cadastro livre).
+#
+# Sob ASGI, um gerador síncrono seria lido inteiro antes do envio; nesse
+# caso os blocos são entregues por um iterador assíncrono que busca cada
+# bloco na thread do banco (ver resposta_planilha).
+
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ItemPedido, Produto
+
+TAMANHO_BLOCO = 64 * 1024
+TAMANHO_LOTE = 1000
+
+CABECALHO_PEDIDOS = [
+    'Pedido', 'Cliente', 'Status', 'Número de Rastreio', 'Transportadora',
+    'Data de Criação', 'Última Atualização', 'Produto', 'Código de Barras', 'Quantidade',
+]
+CABECALHO_CLIENTES = [
+    'Cliente', 'Nome da Marca', 'Nome do Contato', 'Telefone', 'Endereço',
+    'Produto', 'Código de Barras', 'Número do Processo',
+]
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_seguro(valor):
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _data(valor):
+    return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M') if valor else ''
+
+
+def linhas_pedidos(pedidos):
+    """Uma linha por item de pedido (pedidos sem itens geram uma linha vazia)."""
+    pedidos = (
+        pedidos.select_related('cliente')
+        .prefetch_related(Prefetch(
+            'itempedido_set',
+            queryset=ItemPedido.objects.select_related('produto').order_by('id'),
+        ))
+        .order_by('id')
+    )
+    for pedido in pedidos.iterator(chunk_size=TAMANHO_LOTE):
+        base = [
+            pedido.id,
+            pedido.cliente.nome_marca,
+            pedido.get_status_display(),
+            pedido.numero_rastreio or '',
+            pedido.nome_transportadora or '',
+            _data(pedido.data_criacao),
+            _data(pedido.data_atualizacao),
+        ]
+        itens = pedido.itempedido_set.all()
+        if not itens:
+            yield base + ['', '', '']
+        for item in itens:
+            yield base + [item.produto.nome_produto, item.produto.codigo_barras, item.quantidade]
+
+
+def linhas_clientes(clientes):
+    """Uma linha por produto do cliente (clientes sem produtos geram uma linha vazia)."""
+    clientes = clientes.prefetch_related(
+        Prefetch('produtos', queryset=Produto.objects.order_by('id'))
+    ).order_by('id')
+    for cliente in clientes.iterator(chunk_size=TAMANHO_LOTE):
+        base = [cliente.id, cliente.nome_marca, cliente.nome, cliente.telefone, cliente.endereco]
+        produtos = cliente.produtos.all()
+        if not produtos:
+            yield base + ['', '', '']
+        for produto in produtos:
+            yield base + [produto.nome_produto, produto.codigo_barras, produto.numero_processo]
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve o que recebe, para uso com csv.writer."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(cabecalho, linhas):
+    # BOM + ";" para que o Excel em pt-BR abra acentos e colunas corretamente
+    escritor = csv.writer(_Eco(), delimiter=';')
+    bloco = ['\ufeff', escritor.writerow(cabecalho)]
+    tamanho = 0
+    for linha in linhas:
+        texto = escritor.writerow([_texto_seguro(valor) for valor in linha])
+        bloco.append(texto)
+        tamanho += len(texto)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(bloco).encode('utf-8')
+            bloco = []
+            tamanho = 0
+    yield ''.join(bloco).encode('utf-8')
+
+
+class _SaidaStream(io.RawIOBase):
+    """Destino não posicionável para o zipfile; os bytes são retirados em blocos."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+        self.pendente = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        self.pendente += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        self.pendente = 0
+        return dados
+
+
+_XLSX_TIPOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_XLSX_INICIO_PLANILHA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_FIM_PLANILHA = '</sheetData></worksheet>'
+
+# Caracteres de controle não são permitidos em XML
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _coluna(indice):
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _linha_xml(numero, valores):
+    celulas = []
+    for indice, valor in enumerate(valores):
+        referencia = f'{_coluna(indice)}{numero}'
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            celulas.append(f'<c r="{referencia}"><v>{valor}</v></c>')
+        else:
+            texto = escape(_CARACTERES_INVALIDOS.sub('', str(_texto_seguro(valor))))
+            celulas.append(f'<c r="{referencia}" t="inlineStr"><is><t>{texto}</t></is></c>')
+    return f'<row r="{numero}">{"".join(celulas)}</row>'
+
+
+def gerar_xlsx(cabecalho, linhas, nome_planilha='Dados'):
+    saida = _SaidaStream()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr('[Content_Types].xml', _XLSX_TIPOS)
+        arquivo.writestr('_rels/.rels', _XLSX_RELS)
+        arquivo.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(nome=escape(nome_planilha)))
+        arquivo.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        yield saida.retirar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(_XLSX_INICIO_PLANILHA.encode('utf-8'))
+            planilha.write(_linha_xml(1, cabecalho).encode('utf-8'))
+            for numero, linha in enumerate(linhas, start=2):
+                planilha.write(_linha_xml(numero, linha).encode('utf-8'))
+                if saida.pendente >= TAMANHO_BLOCO:
+                    yield saida.retirar()
+            planilha.write(_XLSX_FIM_PLANILHA.encode('utf-8'))
+    yield saida.retirar()
+
+
+async def blocos_assincronos(blocos):
+    """Entrega os blocos de um gerador síncrono sem bloquear o event loop.
+
+    Cada bloco é produzido na thread compartilhada do sync_to_async, a mesma
+    em que o cursor do iterator() foi aberto.
+    """
+    fim = object()
+    proximo = sync_to_async(next)
+    while (bloco := await proximo(blocos, fim)) is not fim:
+        yield bloco
+
+
+def resposta_planilha(request, formato, nome, cabecalho, linhas):
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportação inválido.')
+    if formato == 'csv':
+        conteudo = gerar_csv(cabecalho, linhas)
+    else:
+        conteudo = gerar_xlsx(cabecalho, linhas, nome_planilha=nome.capitalize())
+    if isinstance(request, ASGIRequest):
+        conteudo = blocos_assincronos(conteudo)
+    response = StreamingHttpResponse(conteudo, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome}.{formato}"'
+    return response
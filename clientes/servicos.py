@@ -0,0 +1,262 @@
+# clientes/servicos.py
+
+# Regras de gravação usadas pelas views de cliente e pedido.
+
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from . import busca, contadores, historico
+from .models import ItemPedido, Pedido, Produto
+
+CAMPOS_PRODUTO = ('nome_produto', 'codigo_barras', 'numero_processo')
+
+# Posição de cada status no fluxo do pedido (ordem de STATUS_CHOICES)
+ORDEM_STATUS = {status: posicao for posicao, (status, _) in enumerate(Pedido.STATUS_CHOICES)}
+
+
+def _parse_id(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def produtos_do_post(post):
+    """Extrai as linhas de produto enviadas pelo formulário de cliente."""
+    linhas = []
+    for key, value in post.items():
+        if key.startswith('produto-') and key.endswith('-nome_produto'):
+            index = key.split('-')[1]
+            linha = {
+                'id': _parse_id(post.get(f'produto-{index}-id')),
+                'nome_produto': value.strip(),
+                'codigo_barras': (post.get(f'produto-{index}-codigo_barras') or '').strip(),
+                'numero_processo': (post.get(f'produto-{index}-numero_processo') or '').strip(),
+            }
+            if all(linha[campo] for campo in CAMPOS_PRODUTO):
+                linhas.append(linha)
+    return linhas
+
+
+def sincronizar_produtos(cliente, linhas):
+    """Aplica ao cliente a lista de produtos enviada pelo formulário.
+
+    Cada linha é associada a um produto existente pelo id ou, na falta dele,
+    pelo código de barras. Os produtos associados são atualizados, as linhas
+    sem correspondência viram produtos novos e os produtos que não vieram no
+    formulário são excluídos. Levanta ValidationError se dois produtos
+    ficarem com o mesmo código de barras. Deve ser chamada dentro de uma
+    transação.
+    """
+    existentes = {produto.id: produto for produto in cliente.produtos.all()}
+    por_codigo = {produto.codigo_barras: produto for produto in existentes.values()}
+    codigos_originais = {produto.id: produto.codigo_barras for produto in existentes.values()}
+
+    # Destino de cada código de barras já visto nesta submissão, para que
+    # linhas repetidas não criem produtos duplicados
+    destinos = {}
+    usados = set()
+    novos = []
+    alterados = {}
+
+    for linha in linhas:
+        codigo = linha['codigo_barras']
+        produto = None
+        if linha['id'] in existentes and linha['id'] not in usados:
+            produto = existentes[linha['id']]
+        elif codigo in destinos:
+            produto = destinos[codigo]
+        elif codigo in por_codigo and por_codigo[codigo].id not in usados:
+            produto = por_codigo[codigo]
+
+        if produto is None:
+            produto = Produto(cliente=cliente)
+            novos.append(produto)
+        elif produto.id is not None:
+            usados.add(produto.id)
+            if any(getattr(produto, campo) != linha[campo] for campo in CAMPOS_PRODUTO):
+                alterados[produto.id] = produto
+
+        for campo in CAMPOS_PRODUTO:
+            setattr(produto, campo, linha[campo])
+        destinos[codigo] = produto
+
+    # O código de barras é único por cliente (produto_cliente_codigo_barras_unico)
+    finais = {}
+    for produto in [*(existentes[pk] for pk in usados), *novos]:
+        if finais.setdefault(produto.codigo_barras, produto) is not produto:
+            raise ValidationError(
+                f'O código de barras {produto.codigo_barras} foi informado para mais de um produto.'
+            )
+
+    removidos = set(existentes) - usados
+    if removidos:
+        Produto.objects.filter(cliente=cliente, id__in=removidos).delete()
+    if alterados:
+        mudaram = [pk for pk, produto in alterados.items() if produto.codigo_barras != codigos_originais[pk]]
+        if any(codigos_originais[pk] in finais for pk in mudaram):
+            # Troca de códigos entre produtos: libera os códigos antigos antes,
+            # já que a restrição de unicidade é verificada linha a linha
+            Produto.objects.filter(id__in=mudaram).update(
+                codigo_barras=Concat(Value('~'), Cast('id', CharField()))
+            )
+        # bulk_update não aplica auto_now
+        agora = timezone.now()
+        for produto in alterados.values():
+            produto.data_atualizacao = agora
+        Produto.objects.bulk_update(alterados.values(), [*CAMPOS_PRODUTO, 'data_atualizacao'])
+    if novos:
+        Produto.objects.bulk_create(novos)
+    # bulk_update e bulk_create não disparam sinais; atualiza o índice de busca aqui
+    busca.indexar_produtos([*alterados.values(), *novos])
+
+    return {'criados': len(novos), 'atualizados': len(alterados), 'removidos': len(removidos)}
+
+
+def itens_do_post(post):
+    """Extrai os itens (produto e quantidade) enviados pelo formulário de pedido."""
+    itens = []
+    for key, value in post.items():
+        if key.startswith('produto-') and key.endswith('-id'):
+            index = key.split('-')[1]
+            itens.append({
+                'produto_id': _parse_id(value),
+                'quantidade': _parse_id(post.get(f'produto-{index}-quantidade')),
+            })
+    return itens
+
+
+def validar_itens(cliente, itens):
+    """Valida os itens do pedido e retorna as quantidades por produto.
+
+    Itens repetidos do mesmo produto são somados. Todos os produtos são
+    buscados em uma única consulta e precisam pertencer ao cliente.
+    """
+    quantidades = {}
+    for item in itens:
+        if item['produto_id'] is None or not item['quantidade'] or item['quantidade'] < 1:
+            raise ValidationError('Produto ou quantidade inválidos.')
+        quantidades[item['produto_id']] = quantidades.get(item['produto_id'], 0) + item['quantidade']
+
+    if quantidades:
+        produtos = Produto.objects.filter(cliente=cliente).only('id').in_bulk(list(quantidades))
+        if len(produtos) != len(quantidades):
+            raise ValidationError('Há produtos que não pertencem ao cliente selecionado.')
+    return quantidades
+
+
+def salvar_itens_pedido(pedido, quantidades, novo=False):
+    """Grava os itens do pedido atualizando, criando e removendo em lote.
+
+    Deve ser chamada dentro de uma transação.
+    """
+    existentes = {}
+    removidos = []
+    if not novo:
+        for item in pedido.itempedido_set.all():
+            if item.produto_id in existentes:
+                # Pedidos antigos podem ter o mesmo produto em mais de uma linha
+                removidos.append(item.id)
+            else:
+                existentes[item.produto_id] = item
+
+    novos = []
+    alterados = []
+    for produto_id, quantidade in quantidades.items():
+        item = existentes.get(produto_id)
+        if item is None:
+            novos.append(ItemPedido(pedido=pedido, produto_id=produto_id, quantidade=quantidade))
+        elif item.quantidade != quantidade:
+            item.quantidade = quantidade
+            alterados.append(item)
+
+    removidos += [item.id for produto_id, item in existentes.items() if produto_id not in quantidades]
+    if removidos:
+        ItemPedido.objects.filter(id__in=removidos).delete()
+    if alterados:
+        ItemPedido.objects.bulk_update(alterados, ['quantidade'])
+    if novos:
+        ItemPedido.objects.bulk_create(novos)
+
+
+def transicionar_status(pedidos_ids, status, numero_rastreio='', nome_transportadora='', usuario=None):
+    """Avança um conjunto de pedidos para o status informado com um único UPDATE.
+
+    Só são atualizados os pedidos cujo status atual vem antes do novo na
+    ordem de STATUS_CHOICES. Rastreio e transportadora só são gravados se
+    informados. Cada mudança entra no histórico (ver clientes/historico.py).
+    Retorna um dicionário {id: {'success', 'message'}} com o resultado de
+    cada id.
+    """
+    posicao = ORDEM_STATUS[status]
+    anteriores = [atual for atual, ordem in ORDEM_STATUS.items() if ordem < posicao]
+    agora = timezone.now()
+    campos = {'status': status, 'data_atualizacao': agora, 'data_status': agora}
+    if numero_rastreio:
+        campos['numero_rastreio'] = numero_rastreio
+    if nome_transportadora:
+        campos['nome_transportadora'] = nome_transportadora
+
+    resultados = {}
+    with transaction.atomic():
+        pedidos = {
+            pedido_id: (atual, cliente_id, inicio)
+            for pedido_id, atual, cliente_id, inicio in Pedido.objects.select_for_update()
+            .filter(id__in=pedidos_ids).values_list('id', 'status', 'cliente_id', 'data_status')
+        }
+        atuais = {pedido_id: dados[0] for pedido_id, dados in pedidos.items()}
+        elegiveis = []
+        for pedido_id in pedidos_ids:
+            atual = atuais.get(pedido_id)
+            if atual is None:
+                resultados[pedido_id] = {'success': False, 'message': 'Pedido não encontrado.'}
+            elif ORDEM_STATUS[atual] >= posicao:
+                resultados[pedido_id] = {
+                    'success': False,
+                    'message': 'O pedido já está neste status.' if atual == status
+                    else 'O status não pode voltar para uma etapa anterior.',
+                }
+            else:
+                elegiveis.append(pedido_id)
+
+        if elegiveis:
+            # O filtro por status repete a regra de ordem dentro do próprio UPDATE;
+            # é ele que vale onde select_for_update não trava linhas (SQLite)
+            atualizados = Pedido.objects.filter(id__in=elegiveis, status__in=anteriores).update(**campos)
+            if atualizados < len(elegiveis):
+                # Algum pedido mudou de status entre a leitura e o UPDATE: só
+                # os gravados agora (data_status == agora) entram no resultado
+                gravados = set(
+                    Pedido.objects.filter(id__in=elegiveis, status=status, data_status=agora)
+                    .values_list('id', flat=True)
+                )
+                for pedido_id in elegiveis:
+                    if pedido_id not in gravados:
+                        resultados[pedido_id] = {
+                            'success': False, 'message': 'O status do pedido mudou durante a atualização.',
+                        }
+                elegiveis = [pedido_id for pedido_id in elegiveis if pedido_id in gravados]
+
+        if elegiveis:
+            for pedido_id in elegiveis:
+                resultados[pedido_id] = {'success': True, 'message': 'Status atualizado.'}
+
+            # QuerySet.update não dispara sinais: ajusta contadores e índice de busca aqui
+            contadores.ajustar_status_lote(Counter(atuais[pedido_id] for pedido_id in elegiveis), status)
+            historico.registrar_transicoes(
+                [(pedido_id, pedidos[pedido_id][1], atuais[pedido_id], status, pedidos[pedido_id][2])
+                 for pedido_id in elegiveis],
+                usuario=usuario, data=agora,
+            )
+            if numero_rastreio:
+                busca.indexar_pedidos(
+                    Pedido.objects.filter(id__in=elegiveis).select_related('cliente')
+                    .only('id', 'numero_rastreio', 'cliente__nome_marca')
+                )
+    # Na mesma ordem dos ids recebidos
+    return {pedido_id: resultados[pedido_id] for pedido_id in pedidos_ids}
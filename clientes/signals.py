@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import busca, contadores, historico
+from .models import Cliente, Pedido, Produto
+
+
+@receiver(post_init, sender=Pedido)
+def guardar_status_original(sender, instance, **kwargs):
+    # Lê do __dict__ para não disparar consulta quando o campo foi adiado (only/defer)
+    instance._status_original = instance.__dict__.get('status')
+    instance._rastreio_original = instance.__dict__.get('numero_rastreio')
+    instance._cliente_original = instance.__dict__.get('cliente_id')
+    instance._data_status_original = instance.__dict__.get('data_status')
+
+
+def _status_alterado(instance, update_fields):
+    anterior = instance._status_original
+    return (
+        not instance._state.adding
+        and anterior and anterior != instance.status
+        and (update_fields is None or 'status' in update_fields)
+    )
+
+
+@receiver(pre_save, sender=Pedido)
+def marcar_data_status(sender, instance, update_fields, **kwargs):
+    # Gravado no mesmo UPDATE do status: quem salva com update_fields deve
+    # incluir 'data_status' (como atualizar_status_pedido)
+    if _status_alterado(instance, update_fields):
+        instance.data_status = timezone.now()
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_salvo(sender, instance, created, update_fields, **kwargs):
+    # Quem altera o pedido pode informar o usuário em instance._usuario_alteracao
+    usuario = getattr(instance, '_usuario_alteracao', None)
+    anterior = instance._status_original
+    if created:
+        contadores.ajustar_pedidos(1, instance.status)
+        historico.registrar_transicoes(
+            [(instance.pk, instance.cliente_id, '', instance.status, None)],
+            usuario=usuario, data=instance.data_status,
+        )
+    elif _status_alterado(instance, update_fields):
+        contadores.ajustar_status(anterior, instance.status)
+        historico.registrar_transicoes(
+            [(instance.pk, instance.cliente_id, anterior, instance.status, instance._data_status_original)],
+            usuario=usuario, data=instance.data_status,
+        )
+    instance._status_original = instance.status
+    instance._data_status_original = instance.data_status
+
+    # O índice de busca só depende do número de rastreio e da marca do cliente
+    if (
+        created
+        or instance._rastreio_original != instance.numero_rastreio
+        or instance._cliente_original != instance.cliente_id
+    ):
+        busca.indexar_pedidos([instance])
+    instance._rastreio_original = instance.numero_rastreio
+    instance._cliente_original = instance.cliente_id
+
+
+@receiver(post_delete, sender=Pedido)
+def contar_pedido_excluido(sender, instance, **kwargs):
+    status = instance._status_original or instance.__dict__.get('status')
+    contadores.ajustar_pedidos(-1, status)
+    busca.remover(busca.TIPO_PEDIDO, [instance.pk])
+
+
+@receiver(post_init, sender=Cliente)
+def guardar_marca_original(sender, instance, **kwargs):
+    instance._marca_original = instance.__dict__.get('nome_marca')
+
+
+@receiver(post_save, sender=Cliente)
+def contar_cliente_salvo(sender, instance, created, **kwargs):
+    if created:
+        contadores.ajustar_clientes(1)
+    busca.indexar_clientes([instance])
+    if not created and instance._marca_original != instance.nome_marca:
+        # Os pedidos são encontrados também pela marca do cliente
+        busca.indexar_pedidos_do_cliente(instance)
+    instance._marca_original = instance.nome_marca
+
+
+@receiver(post_delete, sender=Cliente)
+def contar_cliente_excluido(sender, instance, **kwargs):
+    contadores.ajustar_clientes(-1)
+    busca.remover(busca.TIPO_CLIENTE, [instance.pk])
+
+
+@receiver(post_save, sender=Produto)
+def indexar_produto_salvo(sender, instance, **kwargs):
+    busca.indexar_produtos([instance])
+
+
+@receiver(post_delete, sender=Produto)
+def remover_produto_excluido(sender, instance, **kwargs):
+    busca.remover(busca.TIPO_PRODUTO, [instance.pk])
@@ -0,0 +1,240 @@
+# clientes/tarefas.py
+
+# Fila local de exportações de PDFs em lote.
+#
+# Os jobs ficam na tabela ExportacaoPedidos (sem broker externo). O comando
+# `manage.py processar_exportacoes` reserva os jobs pendentes e renderiza os
+# PDFs num pool de processos, gravando o progresso no banco para que a
+# interface possa acompanhar por polling.
+#
+# O PDF único também é dividido entre os processos: cada um renderiza uma
+# parte de TAMANHO_PARTE pedidos em um PDF temporário e as partes são
+# concatenadas na ordem com o pypdf. Sem o pypdf instalado, o PDF único é
+# renderizado inteiro por um só processo.
+#
+# Cada pedido concluído atualiza data_atualizacao do job. Um job em
+# 'processando' sem progresso por EXPORTACAO_TEMPO_LIMITE_SEGUNDOS (worker
+# morto no meio) volta para a fila, até EXPORTACAO_MAX_TENTATIVAS vezes.
+# Os arquivos gerados são apagados depois de EXPORTACAO_VALIDADE_HORAS.
+
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from importlib.util import find_spec
+
+import django
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ExportacaoPedidos, Pedido
+from .pdf import abrir_pdf, juntar_arquivos_pdf, juntar_documentos, renderizar_documento
+
+TAMANHO_PARTE = 25
+PDF_EM_PARTES = find_spec('pypdf') is not None
+
+
+def _diretorio_exportacoes():
+    return str(getattr(settings, 'EXPORTACOES_DIR', os.path.join(settings.BASE_DIR, 'cache', 'exportacoes')))
+
+
+def criar_exportacao(usuario, pedidos_ids, formato='zip'):
+    # Remove ids repetidos mantendo a ordem informada
+    ids = list(dict.fromkeys(int(pedido_id) for pedido_id in pedidos_ids))
+    return ExportacaoPedidos.objects.create(
+        usuario=usuario,
+        pedidos_ids=ids,
+        formato=formato,
+        total=len(ids),
+    )
+
+
+def recuperar_travadas():
+    """Devolve à fila os jobs em processamento sem progresso recente.
+
+    Jobs que já esgotaram as tentativas são marcados como erro.
+    """
+    agora = timezone.now()
+    travadas = ExportacaoPedidos.objects.filter(
+        status='processando',
+        data_atualizacao__lt=agora - timedelta(seconds=settings.EXPORTACAO_TEMPO_LIMITE_SEGUNDOS),
+    )
+    travadas.filter(tentativas__gte=settings.EXPORTACAO_MAX_TENTATIVAS).update(
+        status='erro', erro='O processamento foi interrompido.', data_atualizacao=agora
+    )
+    return travadas.update(status='pendente', concluidos=0, data_atualizacao=agora)
+
+
+def reservar_proxima():
+    """Marca a exportação pendente mais antiga como em processamento.
+
+    A reserva é um UPDATE condicional, então vários workers podem consumir
+    a mesma fila sem processar o mesmo job duas vezes. Antes, os jobs
+    travados voltam para a fila (ver recuperar_travadas).
+    """
+    recuperar_travadas()
+    pendentes = ExportacaoPedidos.objects.filter(status='pendente').order_by('id')
+    for exportacao in pendentes[:10]:
+        reservada = ExportacaoPedidos.objects.filter(
+            pk=exportacao.pk, status='pendente'
+        ).update(status='processando', tentativas=F('tentativas') + 1, data_atualizacao=timezone.now())
+        if reservada:
+            exportacao.refresh_from_db()
+            return exportacao
+    return None
+
+
+def limpar_exportacoes():
+    """Apaga os arquivos e os jobs encerrados há mais de EXPORTACAO_VALIDADE_HORAS."""
+    limite = time.time() - settings.EXPORTACAO_VALIDADE_HORAS * 3600
+    removidos = 0
+    try:
+        entradas = list(os.scandir(_diretorio_exportacoes()))
+    except FileNotFoundError:
+        entradas = []
+    for entrada in entradas:
+        if entrada.is_file() and entrada.stat().st_mtime < limite:
+            try:
+                os.remove(entrada.path)
+                removidos += 1
+            except FileNotFoundError:
+                pass
+    ExportacaoPedidos.objects.filter(
+        status__in=('concluida', 'erro'),
+        data_atualizacao__lt=timezone.now() - timedelta(hours=settings.EXPORTACAO_VALIDADE_HORAS),
+    ).delete()
+    return removidos
+
+
+def _inicializar_processo():
+    django.setup()
+
+
+class ExecutorLocal(Executor):
+    """Executa as tarefas no próprio processo (--processos 0 e testes)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        futuro = Future()
+        try:
+            futuro.set_result(fn(*args, **kwargs))
+        except Exception as erro:
+            futuro.set_exception(erro)
+        return futuro
+
+
+def criar_executor(processos=None):
+    if processos == 0:
+        return ExecutorLocal()
+    # "spawn" evita herdar conexões de banco abertas pelo processo principal
+    return ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_inicializar_processo,
+    )
+
+
+def _incrementar_progresso(exportacao_id):
+    # Também serve de sinal de vida para recuperar_travadas()
+    ExportacaoPedidos.objects.filter(pk=exportacao_id).update(
+        concluidos=F('concluidos') + 1, data_atualizacao=timezone.now()
+    )
+
+
+def _renderizar_pedido(exportacao_id, pedido_id):
+    """Executado nos processos do pool: devolve o PDF de um pedido."""
+    pedido = Pedido.objects.com_itens().filter(pk=pedido_id).first()
+    conteudo = None
+    if pedido is not None:
+        with abrir_pdf(pedido) as arquivo:
+            conteudo = arquivo.read()
+    _incrementar_progresso(exportacao_id)
+    return pedido_id, conteudo
+
+
+def _renderizar_parte(exportacao_id, pedidos_ids, destino):
+    """Executado nos processos do pool: grava os pedidos em um só PDF.
+
+    Retorna quantos pedidos entraram no arquivo; sem nenhum, nada é gravado.
+    """
+    pedidos = Pedido.objects.com_itens().in_bulk(pedidos_ids)
+    documentos = []
+    for pedido_id in pedidos_ids:
+        if pedido_id in pedidos:
+            documentos.append(renderizar_documento(pedidos[pedido_id]))
+        _incrementar_progresso(exportacao_id)
+    if documentos:
+        juntar_documentos(documentos, destino)
+    return len(documentos)
+
+
+def _gerar_pdf_unico(exportacao, executor, destino):
+    ids = exportacao.pedidos_ids
+    if not PDF_EM_PARTES:
+        partes = [(ids, destino)]
+    else:
+        partes = [
+            (ids[inicio:inicio + TAMANHO_PARTE], f'{destino}.{numero}')
+            for numero, inicio in enumerate(range(0, len(ids), TAMANHO_PARTE))
+        ]
+    futuros = []
+    try:
+        for parte_ids, caminho in partes:
+            futuros.append(executor.submit(_renderizar_parte, exportacao.pk, parte_ids, caminho))
+        gravadas = [caminho for (_, caminho), futuro in zip(partes, futuros) if futuro.result()]
+        if not gravadas:
+            raise ValueError('Nenhum dos pedidos selecionados existe mais.')
+        if PDF_EM_PARTES:
+            juntar_arquivos_pdf(gravadas, destino)
+    finally:
+        # Se uma parte falhou, as outras podem ainda estar gravando: cancela as
+        # que não começaram e espera as demais antes de apagar os arquivos
+        for futuro in futuros:
+            futuro.cancel()
+        wait(futuros)
+        if PDF_EM_PARTES:
+            for _, caminho in partes:
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+
+
+def processar(exportacao, executor):
+    diretorio = _diretorio_exportacoes()
+    os.makedirs(diretorio, exist_ok=True)
+    destino = os.path.join(diretorio, f'exportacao_{exportacao.pk}.{exportacao.formato}')
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    os.close(fd)
+
+    try:
+        if exportacao.formato == 'pdf':
+            _gerar_pdf_unico(exportacao, executor, temporario)
+        else:
+            futuros = [
+                executor.submit(_renderizar_pedido, exportacao.pk, pedido_id)
+                for pedido_id in exportacao.pedidos_ids
+            ]
+            with zipfile.ZipFile(temporario, 'w', zipfile.ZIP_DEFLATED) as arquivo_zip:
+                for futuro in as_completed(futuros):
+                    pedido_id, conteudo = futuro.result()
+                    if conteudo is not None:
+                        arquivo_zip.writestr(f'pedido_{pedido_id}.pdf', conteudo)
+        os.replace(temporario, destino)
+    except Exception as erro:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        ExportacaoPedidos.objects.filter(pk=exportacao.pk).update(
+            status='erro', erro=str(erro), data_atualizacao=timezone.now()
+        )
+        if isinstance(erro, BrokenProcessPool):
+            # O pool não aceita mais tarefas; quem chamou deve recriá-lo
+            raise
+        return False
+
+    ExportacaoPedidos.objects.filter(pk=exportacao.pk).update(
+        status='concluida', arquivo=destino, data_atualizacao=timezone.now()
+    )
+    return True
@@ -1,3 +1,1882 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+from unittest import skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metricas import CONSULTAS, LATENCIA, TAMANHO_RESPOSTA
+from core.testes import CONSULTAS_VERSAO_GRUPOS, OrcamentoRotasMixin, consumir, criar_usuario, weasyprint_disponivel
+
+from . import busca, contadores, importacao, urls as clientes_urls, views
+from .busca import buscar, buscar_clientes
+from .management.fabricas import semear
+from .forms import PedidoFiltroForm
+from .paginacao import consulta_da_pagina, paginar_por_id
+from .historico import inicio_janela, tempos_por_etapa
+from .planilhas import CABECALHO_PEDIDOS
+from .models import Cliente, ExportacaoPedidos, ItemPedido, Pedido, PedidoStatusEvento, Produto
+from .servicos import (
+    itens_do_post, produtos_do_post, salvar_itens_pedido, sincronizar_produtos, transicionar_status,
+    validar_itens,
+)
+from . import tarefas
+
+
+def plano_de_execucao(queryset):
+    """Retorna as linhas de EXPLAIN QUERY PLAN (SQLite) do queryset."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [linha[-1] for linha in cursor.fetchall()]
+
+
+def varreduras_completas(queryset):
+    """Retorna as varreduras de tabela inteira do plano do queryset.
+
+    Um SCAN só é aceito numa consulta sem filtros, com LIMIT e sem ordenação
+    em memória (USE TEMP B-TREE): a leitura segue a ordem do índice e para
+    ao atingir o limite. Com filtros, verifique o índice com indice_usado.
+    """
+    plano = plano_de_execucao(queryset)
+    limitada = queryset.query.is_sliced and queryset.query.high_mark is not None
+    ordena_em_memoria = any('USE TEMP B-TREE' in linha for linha in plano)
+    return [
+        linha for linha in plano
+        if linha.startswith('SCAN ') and (ordena_em_memoria or not limitada or queryset.query.where)
+    ]
+
+
+def indice_usado(queryset, tabela):
+    """Índice pelo qual o plano busca (SEARCH) a tabela; None se não houver busca."""
+    for linha in plano_de_execucao(queryset):
+        encontrado = re.match(rf'SEARCH {tabela} USING (?:COVERING )?(?:INDEX (\w+)|(INTEGER PRIMARY KEY))', linha)
+        if encontrado:
+            return encontrado.group(1) or encontrado.group(2)
+    return None
+
+
+def indice_da_fk(modelo, campo):
+    """Nome do índice criado automaticamente para a FK."""
+    coluna = modelo._meta.get_field(campo).column
+    with connection.cursor() as cursor:
+        restricoes = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+    return next(
+        nome for nome, restricao in restricoes.items()
+        if restricao['index'] and restricao['columns'] == [coluna] and not restricao['unique']
+    )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN é específico do SQLite')
+class PlanoConsultasTests(TestCase):
+    """As consultas das views não podem percorrer tabelas inteiras."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        cls.produto = Produto.objects.create(
+            cliente=cls.cliente, nome_produto='Creme', codigo_barras='789', numero_processo='P1'
+        )
+        cls.pedido = Pedido.objects.create(cliente=cls.cliente)
+        ItemPedido.objects.create(pedido=cls.pedido, produto=cls.produto, quantidade=1)
+
+    def assertSemVarreduraCompleta(self, queryset):
+        varreduras = varreduras_completas(queryset)
+        self.assertEqual(varreduras, [], f'Plano: {plano_de_execucao(queryset)}')
+
+    def assertUsaIndice(self, queryset, tabela, indice, ordena_em_memoria=False):
+        plano = plano_de_execucao(queryset)
+        self.assertEqual(indice_usado(queryset, tabela), indice, f'Plano: {plano}')
+        self.assertEqual(any('USE TEMP B-TREE' in linha for linha in plano), ordena_em_memoria, f'Plano: {plano}')
+        self.assertSemVarreduraCompleta(queryset)
+
+    def test_lista_pedidos(self):
+        fk_cliente = indice_da_fk(Pedido, 'cliente')
+        # Filtros e o índice esperado (primeira página, páginas por cursor)
+        filtros = [
+            ({}, (None, 'INTEGER PRIMARY KEY')),
+            ({'status': 'envio'}, ('pedido_status_id_idx', 'pedido_status_id_idx')),
+            ({'cliente': self.cliente.pk}, (fk_cliente, fk_cliente)),
+            ({'data_inicio': date(2024, 1, 1), 'data_fim': date(2024, 1, 31)},
+             ('pedido_atualizacao_id_idx', 'pedido_atualizacao_id_idx')),
+            ({'data_inicio': date(2024, 1, 1)}, ('pedido_atualizacao_id_idx', 'pedido_atualizacao_id_idx')),
+            ({'status': 'envio', 'data_inicio': date(2024, 1, 1)},
+             ('pedido_status_atualizacao_idx', 'pedido_status_atualizacao_idx')),
+            ({'status': 'envio', 'cliente': self.cliente.pk}, (fk_cliente, fk_cliente)),
+            ({'cliente': self.cliente.pk, 'data_fim': date(2024, 1, 31)},
+             ('pedido_cliente_atualizacao_idx', 'pedido_cliente_atualizacao_idx')),
+        ]
+        for dados, (primeira, seguintes) in filtros:
+            form = PedidoFiltroForm(dados)
+            pedidos = form.filtrar(Pedido.objects.select_related('cliente'))
+            cursor = '1000' if form.campo_ordem is None else '1704067200000000.1000'
+            # Mesmas consultas feitas por paginar_por_id
+            for queryset, indice in (
+                (consulta_da_pagina(pedidos, campo=form.campo_ordem), primeira),
+                (consulta_da_pagina(pedidos, apos=cursor, campo=form.campo_ordem), seguintes),
+                (consulta_da_pagina(pedidos, antes=cursor, campo=form.campo_ordem), seguintes),
+            ):
+                with self.subTest(filtros=dados, sql=str(queryset.query)):
+                    self.assertUsaIndice(queryset, 'clientes_pedido', indice)
+
+    def test_produtos_do_cliente(self):
+        fk_cliente = indice_da_fk(Produto, 'cliente')
+        self.assertUsaIndice(self.cliente.produtos.all(), 'clientes_produto', fk_cliente)
+        self.assertUsaIndice(self.cliente.produtos.values('id', 'nome_produto'), 'clientes_produto', fk_cliente)
+        # Índice da restrição produto_cliente_codigo_barras_unico
+        self.assertUsaIndice(
+            Produto.objects.filter(cliente=self.cliente, codigo_barras='789'),
+            'clientes_produto', 'sqlite_autoindex_clientes_produto_1',
+        )
+        self.assertUsaIndice(
+            Produto.objects.filter(cliente=self.cliente).only('id').filter(id__in=[1, 2, 3]),
+            'clientes_produto', fk_cliente,
+        )
+
+    def test_itens_do_pedido(self):
+        self.assertUsaIndice(
+            ItemPedido.objects.filter(pedido=self.pedido).select_related('produto'),
+            'clientes_itempedido', indice_da_fk(ItemPedido, 'pedido'),
+        )
+
+    def test_api_paginada(self):
+        from django.http import QueryDict
+
+        from .api import RECURSOS, _consulta, codificar_cursor
+
+        agora = timezone.now()
+        # Tabela e índice esperado (cursor, updated_since) de cada recurso
+        esperados = {
+            'clientes': ('clientes_cliente', 'cliente_atualizacao_id_idx', 'cliente_atualizacao_id_idx'),
+            'produtos': ('clientes_produto', 'produto_atualizacao_id_idx', 'produto_atualizacao_id_idx'),
+            'pedidos': ('clientes_pedido', 'pedido_atualizacao_id_idx', 'pedido_atualizacao_id_idx'),
+            'itens-pedido': ('clientes_itempedido', 'INTEGER PRIMARY KEY', indice_da_fk(ItemPedido, 'pedido')),
+        }
+        for nome, recurso in RECURSOS.items():
+            tabela, por_cursor, por_data = esperados[nome]
+            ultimo = [7] if len(recurso.ordem) == 1 else [agora, 7]
+            with self.subTest(recurso=nome):
+                self.assertSemVarreduraCompleta(_consulta(recurso, QueryDict(''))[:501])
+                self.assertUsaIndice(
+                    _consulta(recurso, QueryDict(f'cursor={codificar_cursor(ultimo)}'))[:501], tabela, por_cursor
+                )
+                # Itens: só os dos pedidos alterados são lidos, e então ordenados por id
+                self.assertUsaIndice(
+                    _consulta(recurso, QueryDict('updated_since=2024-01-01'))[:501], tabela, por_data,
+                    ordena_em_memoria=nome == 'itens-pedido',
+                )
+
+    def test_detecta_varredura(self):
+        self.assertTrue(varreduras_completas(Pedido.objects.filter(nome_transportadora='X')))
+        self.assertTrue(varreduras_completas(Pedido.objects.order_by('nome_transportadora')[:10]))
+        # Filtro sem índice, mesmo com LIMIT e na ordem do índice
+        self.assertTrue(varreduras_completas(Pedido.objects.filter(nome_transportadora='X').order_by('-id')[:10]))
+        self.assertIsNone(indice_usado(Pedido.objects.filter(nome_transportadora='X'), 'clientes_pedido'))
+
+
+class PaginacaoTests(TestCase):
+    """Navegação por cursor e filtros da lista de pedidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        cls.bia = Cliente.objects.create(nome='Bia', telefone='2', endereco='Rua B', nome_marca='Marca B')
+        cls.pedidos = [
+            Pedido.objects.create(cliente=cls.ana if i % 2 else cls.bia, status='envio' if i % 3 else 'entrada')
+            for i in range(7)
+        ]
+        # Datas repetidas em pares para exercitar o desempate por id
+        base = timezone.make_aware(datetime(2024, 1, 10, 12))
+        for i, pedido in enumerate(cls.pedidos):
+            Pedido.objects.filter(pk=pedido.pk).update(data_atualizacao=base - timedelta(days=i // 2))
+        cls.usuario = criar_usuario('supervisora', 'Supervisão')
+
+    def percorrer(self, queryset, campo=None):
+        """Avança até a última página e volta até a primeira."""
+        paginas, cursor = [], None
+        while True:
+            pagina = paginar_por_id(queryset, apos=cursor, tamanho=3, campo=campo)
+            paginas.append([p.pk for p in pagina['itens']])
+            cursor = pagina['proximo_cursor']
+            if cursor is None:
+                break
+        voltando, cursor = [paginas[-1]], pagina['anterior_cursor']
+        while cursor is not None:
+            pagina = paginar_por_id(queryset, antes=cursor, tamanho=3, campo=campo)
+            voltando.append([p.pk for p in pagina['itens']])
+            cursor = pagina['anterior_cursor']
+        return paginas, voltando[::-1]
+
+    def test_navegacao_por_id(self):
+        ids = sorted((p.pk for p in self.pedidos), reverse=True)
+        avancando, voltando = self.percorrer(Pedido.objects.all())
+        self.assertEqual(avancando, [ids[:3], ids[3:6], ids[6:]])
+        self.assertEqual(voltando, avancando)
+
+        primeira = paginar_por_id(Pedido.objects.all(), tamanho=3)
+        self.assertIsNone(primeira['anterior_cursor'])
+        ultima = paginar_por_id(Pedido.objects.all(), apos=ids[3], tamanho=3)
+        self.assertIsNone(ultima['proximo_cursor'])
+        self.assertEqual([p.pk for p in ultima['itens']], ids[4:])
+
+    def test_navegacao_por_data(self):
+        esperado = [
+            p.pk for p in Pedido.objects.order_by('-data_atualizacao', '-id')
+        ]
+        avancando, voltando = self.percorrer(Pedido.objects.all(), campo='data_atualizacao')
+        self.assertEqual(sum(avancando, []), esperado)
+        self.assertEqual(voltando, avancando)
+
+    def test_cursor_invalido_volta_a_primeira_pagina(self):
+        for campo, cursor in [
+            (None, 'abc'), (None, '-1'), (None, '0'), (None, '1.5'),
+            ('data_atualizacao', '12'), ('data_atualizacao', '1.x'), ('data_atualizacao', 'a.1'),
+            ('data_atualizacao', '9' * 30 + '.1'), ('data_atualizacao', '1.2.3'),
+        ]:
+            primeira = paginar_por_id(Pedido.objects.all(), tamanho=3, campo=campo)
+            for chave in ('apos', 'antes'):
+                with self.subTest(campo=campo, **{chave: cursor}):
+                    pagina = paginar_por_id(Pedido.objects.all(), tamanho=3, campo=campo, **{chave: cursor})
+                    self.assertEqual(pagina, primeira)
+                    self.assertIsNone(pagina['anterior_cursor'])
+
+    def test_filtros(self):
+        todos = Pedido.objects.all()
+        casos = [
+            ({'status': 'envio'}, todos.filter(status='envio')),
+            ({'cliente': self.ana.pk}, todos.filter(cliente=self.ana)),
+            ({'data_inicio': '2024-01-09', 'data_fim': '2024-01-10'}, todos.filter(pk__in=[p.pk for p in self.pedidos[:4]])),
+            ({'data_fim': '2024-01-08'}, todos.filter(pk__in=[p.pk for p in self.pedidos[4:]])),
+        ]
+        for dados, esperado in casos:
+            with self.subTest(dados):
+                form = PedidoFiltroForm(dados)
+                self.assertEqual(set(form.filtrar(todos)), set(esperado))
+        self.assertEqual(PedidoFiltroForm({'data_inicio': '2024-01-09'}).campo_ordem, 'data_atualizacao')
+        self.assertIsNone(PedidoFiltroForm({'status': 'envio'}).campo_ordem)
+
+    def test_filtro_invalido_mostra_erros(self):
+        self.client.force_login(self.usuario)
+        for dados in (
+            {'status': 'inexistente'},
+            {'data_inicio': 'ontem'},
+            {'data_inicio': '2024-01-10', 'data_fim': '2024-01-01'},
+            {'cliente': 0},
+        ):
+            with self.subTest(dados):
+                form = PedidoFiltroForm(dados)
+                self.assertFalse(form.is_valid())
+                self.assertFalse(form.filtrar(Pedido.objects.all()).exists())
+
+                resposta = self.client.get(reverse('lista_pedidos'), dados)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(list(resposta.context['pedidos']), [])
+                self.assertTrue(resposta.context['filtro_form'].errors)
+                self.assertContains(resposta, 'bg-red-100')
+
+                resposta = self.client.get(reverse('exportar_pedidos', args=['csv']), dados)
+                self.assertEqual(resposta.status_code, 400)
+
+    def test_filtro_de_cliente_sem_listar_clientes(self):
+        self.client.force_login(self.usuario)
+        outros = Cliente.objects.bulk_create([
+            Cliente(nome=f'C{numero}', telefone='1', endereco='Rua', nome_marca=f'Outra {numero}')
+            for numero in range(20)
+        ])
+        resposta = self.client.get(reverse('lista_pedidos'))
+        self.assertNotContains(resposta, outros[0].nome_marca)
+        self.assertNotContains(resposta, '<option value="{}"'.format(self.ana.pk))
+
+        # Só o cliente enviado é consultado e aparece no campo de busca
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('lista_pedidos'), {'cliente': self.ana.pk})
+        clientes = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('SELECT "clientes_cliente"')]
+        self.assertEqual(len(clientes), 1)
+        self.assertContains(resposta, f'value="{self.ana.nome_marca}"')
+        self.assertNotContains(resposta, outros[0].nome_marca)
+
+    def test_lista_pagina_por_data_com_filtro(self):
+        self.client.force_login(self.usuario)
+        dados = {'data_inicio': '2024-01-01'}
+        self.addCleanup(setattr, views, 'PEDIDOS_POR_PAGINA', views.PEDIDOS_POR_PAGINA)
+        views.PEDIDOS_POR_PAGINA = 3
+        vistos, cursor = [], None
+        while True:
+            resposta = self.client.get(reverse('lista_pedidos'), {**dados, **({'apos': cursor} if cursor else {})})
+            vistos += [p.pk for p in resposta.context['pedidos']]
+            cursor = resposta.context['proximo_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(vistos, [p.pk for p in Pedido.objects.order_by('-data_atualizacao', '-id')])
+
+
+class SincronizarProdutosTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.a = Produto.objects.create(cliente=self.cliente, nome_produto='A', codigo_barras='1', numero_processo='P')
+        self.b = Produto.objects.create(cliente=self.cliente, nome_produto='B', codigo_barras='2', numero_processo='P')
+
+    def linha(self, produto, codigo):
+        return {'id': produto.id, 'nome_produto': produto.nome_produto,
+                'codigo_barras': codigo, 'numero_processo': 'P'}
+
+    def test_troca_de_codigos(self):
+        with transaction.atomic():
+            sincronizar_produtos(self.cliente, [self.linha(self.a, '2'), self.linha(self.b, '1')])
+        self.assertEqual(
+            dict(self.cliente.produtos.values_list('nome_produto', 'codigo_barras')), {'A': '2', 'B': '1'}
+        )
+
+    def test_codigo_repetido(self):
+        with self.assertRaises(ValidationError):
+            with transaction.atomic():
+                sincronizar_produtos(self.cliente, [self.linha(self.a, '2'), self.linha(self.b, '2')])
+        self.assertEqual(self.cliente.produtos.count(), 2)
+
+    def post(self, *linhas, marca='Marca A'):
+        dados = {'nome': 'Ana', 'telefone': '1', 'endereco': 'Rua A', 'nome_marca': marca}
+        for indice, (produto_id, nome, codigo) in enumerate(linhas):
+            dados.update({
+                f'produto-{indice}-id': produto_id or '',
+                f'produto-{indice}-nome_produto': nome,
+                f'produto-{indice}-codigo_barras': codigo,
+                f'produto-{indice}-numero_processo': 'P',
+            })
+        return dados
+
+    def test_produtos_do_post(self):
+        dados = self.post((self.a.id, ' A ', ' 1 '), ('abc', 'Novo', '3'), (None, 'Sem código', ''), (None, '', '4'))
+        self.assertEqual(produtos_do_post(dados), [
+            {'id': self.a.id, 'nome_produto': 'A', 'codigo_barras': '1', 'numero_processo': 'P'},
+            {'id': None, 'nome_produto': 'Novo', 'codigo_barras': '3', 'numero_processo': 'P'},
+        ])
+
+    def test_linhas_repetidas_e_id_desconhecido(self):
+        with transaction.atomic():
+            resultado = sincronizar_produtos(self.cliente, [
+                self.linha(self.a, '1'),
+                {'id': 999999, 'nome_produto': 'C', 'codigo_barras': '3', 'numero_processo': 'P'},
+                {'id': None, 'nome_produto': 'C', 'codigo_barras': '3', 'numero_processo': 'P'},
+            ])
+        self.assertEqual(resultado, {'criados': 1, 'atualizados': 0, 'removidos': 1})
+        self.assertEqual(sorted(self.cliente.produtos.values_list('codigo_barras', flat=True)), ['1', '3'])
+
+    def test_editar_cliente(self):
+        self.client.force_login(criar_usuario('admin', 'Administrador'))
+        url = reverse('editar_cliente', args=[self.cliente.pk])
+
+        resposta = self.client.post(url, self.post((self.a.id, 'A', '1'), (self.b.id, 'B', '1'), marca='Outra'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('1', resposta.context['erro'])
+        # A transação desfaz também a alteração do cliente
+        self.assertEqual(Cliente.objects.get(pk=self.cliente.pk).nome_marca, 'Marca A')
+
+        resposta = self.client.post(url, self.post((self.a.id, 'A', '1'), (None, 'Gel', '5')))
+        self.assertRedirects(resposta, reverse('lista_clientes'), fetch_redirect_response=False)
+        self.assertEqual(sorted(self.cliente.produtos.values_list('nome_produto', flat=True)), ['A', 'Gel'])
+        if connection.vendor == 'sqlite':
+            self.assertEqual([r['titulo'] for r in buscar('gel')], ['Gel'])
+
+
+class ImportacaoTests(TestCase):
+
+    CABECALHO = 'Nome da Marca;Nome do Contato;Telefone;Endereço;Produto;Código de Barras;Número do Processo'
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        Produto.objects.create(cliente=self.cliente, nome_produto='Creme', codigo_barras='1', numero_processo='P')
+
+    def importar(self, *linhas, **opcoes):
+        return importacao.importar_csv([self.CABECALHO, *linhas], **opcoes)
+
+    def produtos(self):
+        return set(Produto.objects.values_list('cliente__nome_marca', 'codigo_barras'))
+
+    def test_ignora_duplicados(self):
+        relatorio = self.importar(
+            'Marca A;Ana;1;Rua A;Creme;1;P',       # já existe no banco
+            'Marca A;Ana;1;Rua A;Sabonete;2;P',
+            'Marca B;Bia;2;Rua B;Creme;1;P',       # mesmo código, outra marca
+            'Marca B;Bia;2;Rua B;Creme;1;P',       # repetido no próprio arquivo
+            'Marca C;Caio;3;Rua C;;;',             # cliente sem produtos
+        )
+        self.assertEqual(relatorio['clientes_criados'], 2)
+        self.assertEqual(relatorio['produtos_criados'], 2)
+        self.assertEqual(relatorio['produtos_duplicados'], 2)
+        self.assertEqual(Cliente.objects.count(), 3)
+        self.assertEqual(self.produtos(), {('Marca A', '1'), ('Marca A', '2'), ('Marca B', '1')})
+
+    def test_simulacao_nao_grava(self):
+        linhas = ['Marca B;Bia;2;Rua B;Creme;1;P', 'Marca B;Bia;2;Rua B;Creme;1;P', 'Marca A;;;;Sabonete;2;P']
+        simulacao = self.importar(*linhas, dry_run=True)
+        self.assertEqual((Cliente.objects.count(), Produto.objects.count()), (1, 1))
+
+        real = self.importar(*linhas)
+        self.assertEqual({**simulacao, 'dry_run': False}, real)
+
+    def test_lotes(self):
+        linhas = [f'Marca {i % 3};Contato;1;Rua;Produto {i};{i};P' for i in range(7)]
+        relatorio = self.importar(*linhas, tamanho_lote=2)
+        self.assertEqual(relatorio['clientes_criados'], 3)
+        self.assertEqual(relatorio['produtos_criados'], 7)
+        # Produtos de clientes criados em lotes anteriores apontam para o cliente certo
+        self.assertEqual(
+            self.produtos() - {('Marca A', '1')},
+            {(f'Marca {i % 3}', str(i)) for i in range(7)},
+        )
+        self.assertEqual(Cliente.objects.filter(nome_marca__startswith='Marca ').count(), 4)
+
+    def test_linhas_invalidas(self):
+        relatorio = self.importar(
+            ';Ana;1;Rua;Creme;9;P',
+            'Marca B;Bia;2;Rua;Creme;;P',
+            'Marca B;Bia;2;Rua;;9;P',
+            'Marca B;' + 'x' * 300 + ';2;Rua;Creme;9;P',
+            ';;;;;;',
+            'Marca B;Bia;2;Rua;Creme;9;P',
+        )
+        self.assertEqual(relatorio['linhas'], 5)
+        self.assertEqual(relatorio['linhas_invalidas'], 4)
+        self.assertEqual([erro.split(':')[0] for erro in relatorio['erros']],
+                         ['Linha 2', 'Linha 3', 'Linha 4', 'Linha 5'])
+        self.assertIn('"nome"', relatorio['erros'][3])
+        self.assertEqual(relatorio['produtos_criados'], 1)
+
+        relatorio = self.importar(*[';;;;Creme;9;P'] * (importacao.MAX_ERROS + 5))
+        self.assertEqual(relatorio['linhas_invalidas'], importacao.MAX_ERROS + 5)
+        self.assertEqual(len(relatorio['erros']), importacao.MAX_ERROS)
+
+    def test_cabecalho_sem_marca(self):
+        with self.assertRaises(importacao.ErroImportacao):
+            importacao.importar_csv(['Produto;Código de Barras', 'Creme;1'])
+
+    def test_conflito_com_gravacao_concorrente(self):
+        indexar_clientes = importacao.busca.indexar_clientes
+
+        def gravacao_concorrente(clientes):
+            # Outra requisição grava o mesmo produto depois da leitura inicial
+            indexar_clientes(clientes)
+            Produto.objects.create(cliente=self.cliente, nome_produto='Sabonete', codigo_barras='2')
+
+        self.addCleanup(setattr, importacao.busca, 'indexar_clientes', indexar_clientes)
+        importacao.busca.indexar_clientes = gravacao_concorrente
+
+        usuario = criar_usuario('admin', 'Administrador')
+        self.client.force_login(usuario)
+        arquivo = SimpleUploadedFile('clientes.csv', '\n'.join([
+            self.CABECALHO, 'Marca B;Bia;2;Rua B;Creme;1;P', 'Marca A;Ana;1;Rua A;Sabonete;2;P',
+        ]).encode())
+        resposta = self.client.post(reverse('importar_clientes'), {'arquivo': arquivo})
+
+        self.assertEqual(resposta.status_code, 200)
+        relatorio = resposta.context['relatorio']
+        self.assertTrue(relatorio['conflito'])
+        self.assertEqual((relatorio['clientes_criados'], relatorio['produtos_criados']), (0, 0))
+        self.assertContains(resposta, 'Importação não gravada')
+        self.assertFalse(Cliente.objects.filter(nome_marca='Marca B').exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Testa o índice FTS5; o ramo do PostgreSQL (tsvector) não roda aqui')
+class BuscaTests(TestCase):
+    """Índice textual mantido pelos sinais e consultado por busca.buscar."""
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Lavanda Cosméticos')
+        self.sabonete = Produto.objects.create(
+            cliente=self.cliente, nome_produto='Sabonete Lavanda', codigo_barras='7891', numero_processo='P1'
+        )
+        self.creme = Produto.objects.create(
+            cliente=self.cliente, nome_produto='Creme Hidratante', codigo_barras='7892', numero_processo='LAVANDA'
+        )
+        self.pedido = Pedido.objects.create(cliente=self.cliente, numero_rastreio='BR123456')
+
+    def encontrados(self, consulta, **opcoes):
+        return [(resultado['tipo'], resultado['titulo']) for resultado in buscar(consulta, **opcoes)]
+
+    def test_indexa_clientes_produtos_e_pedidos(self):
+        self.assertEqual(self.encontrados('hidratante'), [('Produto', 'Creme Hidratante')])
+        self.assertEqual(self.encontrados('7891'), [('Produto', 'Sabonete Lavanda')])
+        self.assertEqual(self.encontrados('BR123456'), [('Pedido', f'Pedido #{self.pedido.pk}')])
+        self.assertEqual(buscar('hidratante')[0]['url'], reverse('detalhe_cliente', args=[self.cliente.pk]))
+        self.assertEqual(buscar_clientes('ana'), [(self.cliente.pk, 'Lavanda Cosméticos')])
+
+    def test_ordena_por_relevancia(self):
+        # O título pesa mais que o restante do texto
+        resultados = self.encontrados('lavanda')
+        self.assertEqual(len(resultados), 4)
+        self.assertLess(
+            resultados.index(('Produto', 'Sabonete Lavanda')), resultados.index(('Produto', 'Creme Hidratante'))
+        )
+        self.assertEqual(self.encontrados('lavanda', limite=2), resultados[:2])
+
+    def test_prefixo_e_todos_os_termos(self):
+        self.assertEqual(self.encontrados('hidra'), [('Produto', 'Creme Hidratante')])
+        self.assertEqual(self.encontrados('lav sab'), [('Produto', 'Sabonete Lavanda')])
+        self.assertEqual(self.encontrados('lavanda inexistente'), [])
+        # Aspas e operadores do FTS5 na consulta não quebram a expressão
+        self.assertEqual(self.encontrados('"hidra*" OR'), [])
+        self.assertEqual(self.encontrados('"hidra*"'), [('Produto', 'Creme Hidratante')])
+        self.assertEqual(self.encontrados('  '), [])
+
+    def test_reindexa_apos_edicao(self):
+        self.creme.nome_produto = 'Creme Nutritivo'
+        self.creme.save()
+        self.assertEqual(self.encontrados('hidratante'), [])
+        self.assertEqual(self.encontrados('nutritivo'), [('Produto', 'Creme Nutritivo')])
+
+        # Pedidos também são encontrados pela marca do cliente
+        self.cliente.nome_marca = 'Alecrim'
+        self.cliente.save()
+        self.assertEqual(
+            self.encontrados('alecrim'), [('Cliente', 'Alecrim'), ('Pedido', f'Pedido #{self.pedido.pk}')]
+        )
+
+        self.pedido.numero_rastreio = 'BR999'
+        self.pedido.save()
+        self.assertEqual(self.encontrados('BR123456'), [])
+        self.assertEqual(self.encontrados('BR999'), [('Pedido', f'Pedido #{self.pedido.pk}')])
+
+    def test_reindexa_pedido_movido_para_outro_cliente(self):
+        outro = Cliente.objects.create(nome='Bia', telefone='2', endereco='Rua B', nome_marca='Bravo')
+        produto = Produto.objects.create(
+            cliente=outro, nome_produto='Gel', codigo_barras='7893', numero_processo='P3'
+        )
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        # editar_pedido grava só cliente e data_atualizacao (update_fields)
+        resposta = self.client.post(reverse('editar_pedido', args=[self.pedido.pk]), {
+            'cliente': outro.pk, 'produto-0-id': produto.pk, 'produto-0-quantidade': 1,
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(self.encontrados('bravo'), [('Cliente', 'Bravo'), ('Pedido', f'Pedido #{self.pedido.pk}')])
+        self.assertNotIn(('Pedido', f'Pedido #{self.pedido.pk}'), self.encontrados('lavanda'))
+
+    def test_remove_apos_exclusao(self):
+        self.sabonete.delete()
+        self.assertEqual(self.encontrados('sabonete'), [])
+
+        # A exclusão em cascata também limpa produtos e pedidos do cliente
+        self.cliente.delete()
+        self.assertEqual(self.encontrados('lavanda'), [])
+        self.assertEqual(self.encontrados('BR123456'), [])
+
+    def test_reindexar_tudo(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {busca.TABELA}')
+        self.assertEqual(self.encontrados('hidratante'), [])
+        busca.reindexar_tudo(tamanho_lote=1)
+        self.assertEqual(self.encontrados('hidratante'), [('Produto', 'Creme Hidratante')])
+        self.assertEqual(len(self.encontrados('lavanda')), 4)
+
+
+class ItensPedidoTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.outro = Cliente.objects.create(nome='Bia', telefone='2', endereco='Rua B', nome_marca='Marca B')
+        self.a, self.b, self.c = [
+            Produto.objects.create(cliente=self.cliente, nome_produto=nome, codigo_barras=nome, numero_processo='P')
+            for nome in 'ABC'
+        ]
+        self.alheio = Produto.objects.create(cliente=self.outro, nome_produto='X', codigo_barras='X', numero_processo='P')
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        ItemPedido.objects.create(pedido=self.pedido, produto=self.a, quantidade=1)
+        ItemPedido.objects.create(pedido=self.pedido, produto=self.b, quantidade=2)
+        self.client.force_login(criar_usuario('admin', 'Administrador'))
+
+    def itens(self):
+        return sorted(self.pedido.itempedido_set.values_list('produto_id', 'quantidade'))
+
+    def post(self, *itens, cliente=None):
+        dados = {'cliente': (cliente or self.cliente).pk}
+        for indice, (produto_id, quantidade) in enumerate(itens):
+            dados.update({f'produto-{indice}-id': produto_id, f'produto-{indice}-quantidade': quantidade})
+        return dados
+
+    def test_itens_do_post(self):
+        itens = itens_do_post(self.post((self.a.pk, '3'), ('abc', '1'), (self.b.pk, '')))
+        self.assertEqual(itens, [
+            {'produto_id': self.a.pk, 'quantidade': 3},
+            {'produto_id': None, 'quantidade': 1},
+            {'produto_id': self.b.pk, 'quantidade': None},
+        ])
+
+    def test_validar_itens_soma_repetidos(self):
+        itens = [{'produto_id': self.a.pk, 'quantidade': 2}, {'produto_id': self.a.pk, 'quantidade': 3},
+                 {'produto_id': self.c.pk, 'quantidade': 1}]
+        with self.assertNumQueries(1):
+            self.assertEqual(validar_itens(self.cliente, itens), {self.a.pk: 5, self.c.pk: 1})
+        self.assertEqual(validar_itens(self.cliente, []), {})
+
+    def test_validar_itens_rejeita(self):
+        for item in (
+            {'produto_id': self.a.pk, 'quantidade': 0},
+            {'produto_id': self.a.pk, 'quantidade': -2},
+            {'produto_id': self.a.pk, 'quantidade': None},
+            {'produto_id': None, 'quantidade': 1},
+            {'produto_id': 999999, 'quantidade': 1},
+            {'produto_id': self.alheio.pk, 'quantidade': 1},
+        ):
+            with self.subTest(item):
+                with self.assertRaises(ValidationError):
+                    validar_itens(self.cliente, [{'produto_id': self.b.pk, 'quantidade': 1}, item])
+
+    def test_salvar_itens_pedido(self):
+        # a muda de quantidade, b sai, c entra; itens inalterados não são regravados
+        with transaction.atomic():
+            salvar_itens_pedido(self.pedido, {self.a.pk: 4, self.c.pk: 1})
+        self.assertEqual(self.itens(), [(self.a.pk, 4), (self.c.pk, 1)])
+
+        with self.assertNumQueries(1):
+            salvar_itens_pedido(self.pedido, {self.a.pk: 4, self.c.pk: 1})
+
+    def test_salvar_itens_com_linhas_repetidas(self):
+        # Pedidos antigos podem ter o mesmo produto em mais de uma linha
+        ItemPedido.objects.create(pedido=self.pedido, produto=self.a, quantidade=7)
+        with transaction.atomic():
+            salvar_itens_pedido(self.pedido, {self.a.pk: 3})
+        self.assertEqual(self.itens(), [(self.a.pk, 3)])
+
+    def test_criar_pedido(self):
+        resposta = self.client.post(reverse('criar_pedido'), self.post((self.a.pk, 1), (self.a.pk, 2), (self.c.pk, 5)))
+        self.assertRedirects(resposta, reverse('lista_pedidos'), fetch_redirect_response=False)
+        pedido = Pedido.objects.latest('id')
+        self.assertEqual(sorted(pedido.itempedido_set.values_list('produto_id', 'quantidade')),
+                         [(self.a.pk, 3), (self.c.pk, 5)])
+
+    def test_criar_pedido_invalido_nao_grava(self):
+        for itens in (((self.a.pk, 0),), ((self.a.pk, 1), (999999, 1)), ((self.alheio.pk, 1),)):
+            with self.subTest(itens):
+                resposta = self.client.post(reverse('criar_pedido'), self.post(*itens))
+                self.assertEqual(resposta.status_code, 200)
+                self.assertTrue(resposta.context['erro'])
+                self.assertEqual(Pedido.objects.count(), 1)
+                self.assertEqual(ItemPedido.objects.count(), 2)
+
+    def test_editar_pedido(self):
+        url = reverse('editar_pedido', args=[self.pedido.pk])
+        resposta = self.client.post(url, self.post((self.b.pk, -1)))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.itens(), [(self.a.pk, 1), (self.b.pk, 2)])
+
+        resposta = self.client.post(url, self.post((self.b.pk, 2), (self.c.pk, 1), (self.c.pk, 1)))
+        self.assertRedirects(resposta, reverse('lista_pedidos'), fetch_redirect_response=False)
+        self.assertEqual(self.itens(), [(self.b.pk, 2), (self.c.pk, 2)])
+
+        # Trocar o cliente exige produtos do novo cliente
+        resposta = self.client.post(url, self.post((self.a.pk, 1), cliente=self.outro))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(Pedido.objects.get(pk=self.pedido.pk).cliente_id, self.cliente.pk)
+        resposta = self.client.post(url, self.post((self.alheio.pk, 1), cliente=self.outro))
+        self.assertEqual(Pedido.objects.get(pk=self.pedido.pk).cliente_id, self.outro.pk)
+        self.assertEqual(self.itens(), [(self.alheio.pk, 1)])
+
+
+class TransicaoStatusTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.pedidos = [Pedido.objects.create(cliente=self.cliente, status='producao') for _ in range(3)]
+        self.entregue = Pedido.objects.create(cliente=self.cliente, status='entregue')
+        Pedido.objects.update(data_status=timezone.now() - timedelta(hours=10))
+
+    def test_avanca_somente_para_frente(self):
+        ids = [pedido.id for pedido in self.pedidos] + [self.entregue.id, 0]
+        resultados = transicionar_status(ids, 'envase', numero_rastreio='BR1')
+
+        self.assertEqual([resultados[pedido_id]['success'] for pedido_id in ids], [True, True, True, False, False])
+        self.assertEqual(Pedido.objects.filter(status='envase', numero_rastreio='BR1').count(), 3)
+        self.assertEqual(Pedido.objects.get(pk=self.entregue.pk).status, 'entregue')
+
+    def test_registra_historico_e_tempo_por_etapa(self):
+        transicionar_status([pedido.id for pedido in self.pedidos], 'envase')
+
+        self.assertEqual(PedidoStatusEvento.objects.filter(status='envase', status_anterior='producao').count(), 3)
+        for cliente in (None, self.cliente):
+            (producao,) = tempos_por_etapa(cliente=cliente)
+            self.assertEqual((producao['etapa'], producao['quantidade']), ('producao', 3))
+            self.assertAlmostEqual(producao['media'], 10 * 3600, delta=60)
+            self.assertTrue(8 * 3600 <= producao['p50'] <= 12 * 3600)
+
+    def test_save_grava_data_status_no_mesmo_update(self):
+        pedido = Pedido.objects.get(pk=self.pedidos[0].pk)
+        pedido.status = 'envase'
+        with CaptureQueriesContext(connection) as consultas:
+            pedido.save(update_fields=['status', 'data_status'])
+        atualizacoes = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('UPDATE "clientes_pedido"')]
+        self.assertEqual(len(atualizacoes), 1)
+
+        evento = PedidoStatusEvento.objects.get(pedido=pedido, status='envase')
+        self.assertEqual(Pedido.objects.get(pk=pedido.pk).data_status, evento.data)
+        (producao,) = tempos_por_etapa(cliente=self.cliente)
+        self.assertAlmostEqual(producao['media'], 10 * 3600, delta=60)
+
+    def test_rastreio_entra_na_busca_e_nos_contadores(self):
+        contadores.recontar()
+        transicionar_status([self.pedidos[0].id, self.entregue.id], 'envio', numero_rastreio='BR777')
+        dados = contadores.obter_contadores()
+        por_status = {item['status']: item['count'] for item in dados['pedidos_por_status']}
+        self.assertEqual(por_status, {'producao': 2, 'envio': 1, 'entregue': 1})
+        if connection.vendor == 'sqlite':
+            self.assertEqual([r['titulo'] for r in buscar('BR777')], [f'Pedido #{self.pedidos[0].id}'])
+
+    def test_pedido_alterado_antes_do_update(self):
+        contadores.recontar()
+        alterado = self.pedidos[0]
+        disparada = []
+
+        def escrita_concorrente(execute, sql, params, many, context):
+            # Outra conexão entrega o pedido entre a leitura e o UPDATE em lote
+            if sql.startswith('UPDATE "clientes_pedido"') and not disparada:
+                disparada.append(sql)
+                with context['connection'].cursor() as cursor:
+                    cursor.execute('UPDATE clientes_pedido SET status = %s WHERE id = %s', ['entregue', alterado.id])
+            return execute(sql, params, many, context)
+
+        ids = [pedido.id for pedido in self.pedidos]
+        with connection.execute_wrapper(escrita_concorrente):
+            resultados = transicionar_status(ids, 'envase')
+
+        self.assertEqual([resultados[pedido_id]['success'] for pedido_id in ids], [False, True, True])
+        self.assertEqual(
+            list(PedidoStatusEvento.objects.filter(status='envase').values_list('pedido_id', flat=True).order_by('pedido_id')),
+            ids[1:],
+        )
+        # A escrita concorrente não passa pelos sinais: só o lote conta aqui
+        por_status = {item['status']: item['count'] for item in contadores.obter_contadores()['pedidos_por_status']}
+        self.assertEqual(por_status, {'producao': 1, 'envase': 2, 'entregue': 1})
+
+    def test_view_em_lote(self):
+        url = reverse('atualizar_status_pedidos_lote')
+        self.client.force_login(criar_usuario('admin', 'Administrador'))
+        a, b = self.pedidos[0].id, self.pedidos[1].id
+
+        resposta = self.client.post(url, {'status': 'envase', 'ids': [a, b, a, self.entregue.id, 999999]})
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual(dados['message'], '2 de 4 pedidos atualizados.')
+        self.assertEqual([(r['id'], r['success']) for r in dados['resultados']],
+                         [(a, True), (b, True), (self.entregue.id, False), (999999, False)])
+        evento = PedidoStatusEvento.objects.filter(pedido_id=a, status='envase').get()
+        self.assertEqual(evento.usuario.username, 'admin')
+
+        # Repetir a mesma transição não gera novas mudanças
+        dados = self.client.post(url, {'status': 'envase', 'ids': [a]}).json()
+        self.assertFalse(dados['success'])
+        self.assertEqual(PedidoStatusEvento.objects.filter(pedido_id=a, status='envase').count(), 1)
+
+    def test_view_em_lote_rejeita(self):
+        url = reverse('atualizar_status_pedidos_lote')
+        self.client.force_login(criar_usuario('admin', 'Administrador'))
+        self.addCleanup(setattr, views, 'MAX_PEDIDOS_STATUS_LOTE', views.MAX_PEDIDOS_STATUS_LOTE)
+        views.MAX_PEDIDOS_STATUS_LOTE = 2
+        for dados in (
+            {'status': 'inexistente', 'ids': [self.pedidos[0].id]},
+            {'status': 'envase', 'ids': ['abc']},
+            {'status': 'envase'},
+            {'status': 'envase', 'ids': [pedido.id for pedido in self.pedidos]},
+            {'status': 'envio', 'numero_rastreio': 'x' * 101, 'ids': [self.pedidos[0].id]},
+        ):
+            with self.subTest(dados):
+                resposta = self.client.post(url, dados)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertFalse(resposta.json()['success'])
+        self.assertFalse(Pedido.objects.filter(status__in=['envase', 'envio']).exists())
+
+        self.client.force_login(criar_usuario('supervisora', 'Supervisão'))
+        resposta = self.client.post(url, {'status': 'envase', 'ids': [self.pedidos[0].id]})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class ContadoresTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        contadores.recontar()
+
+    def valores(self):
+        dados = contadores.obter_contadores()
+        por_status = {item['status']: item['count'] for item in dados['pedidos_por_status']}
+        return dados['total_pedidos'], dados['total_clientes'], por_status
+
+    def test_criacao_incrementa_sem_recontar(self):
+        Pedido.objects.create(cliente=self.cliente)
+        Cliente.objects.create(nome='Bia', telefone='2', endereco='Rua B', nome_marca='Marca B')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.valores(), (2, 2, {'entrada': 2}))
+        self.assertEqual(len(consultas), 1)
+
+    def test_mudanca_de_status(self):
+        self.pedido.status = 'producao'
+        self.pedido.save()
+        self.assertEqual(self.valores(), (1, 1, {'producao': 1}))
+
+        outros = [Pedido.objects.create(cliente=self.cliente).id for _ in range(2)]
+        transicionar_status(outros + [self.pedido.id], 'envase')
+        self.assertEqual(self.valores(), (3, 1, {'envase': 3}))
+
+    def test_exclusao(self):
+        Pedido.objects.create(cliente=self.cliente, status='envio')
+        self.pedido.delete()
+        self.assertEqual(self.valores(), (1, 1, {'envio': 1}))
+
+        # Os pedidos do cliente saem junto, pela exclusão em cascata
+        self.cliente.delete()
+        self.assertEqual(self.valores(), (0, 0, {}))
+
+    def test_transacao_desfeita_desfaz_ajuste(self):
+        with self.assertRaises(ValidationError):
+            with transaction.atomic():
+                Pedido.objects.create(cliente=self.cliente)
+                raise ValidationError('desfaz')
+        self.assertEqual(self.valores(), (1, 1, {'entrada': 1}))
+
+    def test_reconciliacao(self):
+        # QuerySet.update não dispara sinais: os contadores ficam defasados
+        Pedido.objects.update(status='entregue')
+        self.assertEqual(self.valores(), (1, 1, {'entrada': 1}))
+
+        with override_settings(CONTADORES_RECONCILIACAO_SEGUNDOS=0):
+            self.assertEqual(self.valores(), (1, 1, {'entregue': 1}))
+
+        Pedido.objects.update(status='envio')
+        contadores.invalidar()
+        self.assertEqual(self.valores(), (1, 1, {'envio': 1}))
+
+
+class PlanilhasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nome='Ana', telefone='+55 11', endereco='Rua A', nome_marca='=HYPERLINK("x")')
+        produto = Produto.objects.create(
+            cliente=cliente, nome_produto='Creme; 50g', codigo_barras='1', numero_processo='P'
+        )
+        com_itens = Pedido.objects.create(cliente=cliente, numero_rastreio='@BR1')
+        ItemPedido.objects.create(pedido=com_itens, produto=produto, quantidade=2)
+        ItemPedido.objects.create(pedido=com_itens, produto=produto, quantidade=3)
+        Pedido.objects.create(cliente=cliente)
+        cls.admin = criar_usuario('admin', 'Administrador')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def linhas_csv(self, conteudo):
+        self.assertTrue(conteudo.startswith('\ufeff'.encode('utf-8')))
+        return list(csv.reader(io.StringIO(conteudo.decode('utf-8')[1:]), delimiter=';'))
+
+    def test_csv(self):
+        linhas = self.linhas_csv(consumir(self.client.get(reverse('exportar_pedidos', args=['csv']))))
+        # Cabeçalho + dois itens do primeiro pedido + linha vazia do segundo
+        self.assertEqual(linhas[0], CABECALHO_PEDIDOS)
+        self.assertEqual(len(linhas), 4)
+        self.assertEqual(linhas[1][1], '\'=HYPERLINK("x")')
+        self.assertEqual(linhas[1][3], "'@BR1")
+        self.assertEqual(linhas[1][7:], ['Creme; 50g', '1', '2'])
+        self.assertEqual(linhas[3][7:], ['', '', ''])
+
+    def test_xlsx_legivel(self):
+        conteudo = consumir(self.client.get(reverse('exportar_pedidos', args=['xlsx'])))
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+            self.assertIsNone(arquivo.testzip())
+            planilha = ElementTree.fromstring(arquivo.read('xl/worksheets/sheet1.xml'))
+        ns = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        linhas = [
+            [celula.findtext('.//s:t', namespaces=ns) or celula.findtext('s:v', namespaces=ns)
+             for celula in linha.findall('s:c', ns)]
+            for linha in planilha.iterfind('.//s:row', ns)
+        ]
+        self.assertEqual(linhas[0], CABECALHO_PEDIDOS)
+        self.assertEqual(len(linhas), 4)
+        self.assertEqual(linhas[1][1], '\'=HYPERLINK("x")')
+
+    def test_asgi_entrega_iterador_assincrono(self):
+        cliente = AsyncClient()
+        async_to_sync(cliente.aforce_login)(self.admin)
+        resposta = async_to_sync(cliente.get)(reverse('exportar_clientes', args=['csv']))
+        self.assertTrue(resposta.is_async)
+        linhas = self.linhas_csv(consumir(resposta))
+        self.assertEqual(len(linhas), 2)
+        self.assertEqual(linhas[1][3], "'+55 11")
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get(reverse('exportar_pedidos', args=['pdf'])).status_code, 404)
+
+
+class ViewsAssincronasTests(TestCase):
+    # As views assíncronas chamadas pelo AsyncClient, como sob o uvicorn
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        cls.produto = Produto.objects.create(
+            cliente=cls.cliente, nome_produto='Creme', codigo_barras='1', numero_processo='P'
+        )
+        cls.pedido = Pedido.objects.create(cliente=cls.cliente)
+        cls.admin = criar_usuario('admin', 'Administrador')
+        cls.supervisor = criar_usuario('supervisor', 'Supervisão')
+
+    def setUp(self):
+        self.url_status = reverse('atualizar_status_pedido', args=[self.pedido.pk])
+        self.url_produtos = reverse('produtos_por_cliente', args=[self.cliente.pk])
+
+    async def test_status_exige_admin(self):
+        await self.async_client.aforce_login(self.supervisor)
+        resposta = await self.async_client.post(self.url_status, {'status': 'envio'})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual((await Pedido.objects.aget(pk=self.pedido.pk)).status, 'entrada')
+
+    async def test_status_invalido(self):
+        await self.async_client.aforce_login(self.admin)
+        resposta = await self.async_client.post(self.url_status, {'status': 'inexistente'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(resposta.json()['success'])
+        self.assertEqual((await Pedido.objects.aget(pk=self.pedido.pk)).status, 'entrada')
+
+    async def test_status_alterado(self):
+        await self.async_client.aforce_login(self.admin)
+        resposta = await self.async_client.post(
+            self.url_status, {'status': 'envio', 'numero_rastreio': 'BR1', 'nome_transportadora': 'T'}
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.json()['success'])
+        pedido = await Pedido.objects.aget(pk=self.pedido.pk)
+        self.assertEqual((pedido.status, pedido.numero_rastreio), ('envio', 'BR1'))
+        evento = await PedidoStatusEvento.objects.aget(pedido=pedido, status='envio')
+        self.assertEqual((evento.status_anterior, evento.usuario_id), ('entrada', self.admin.pk))
+        self.assertEqual(evento.data, pedido.data_status)
+
+    async def test_produtos_por_cliente(self):
+        await self.async_client.aforce_login(self.supervisor)
+        resposta = await self.async_client.get(self.url_produtos)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), [{'id': self.produto.pk, 'nome_produto': 'Creme'}])
+
+        resposta = await self.async_client.get(self.url_produtos, headers={'If-None-Match': resposta['ETag']})
+        self.assertEqual(resposta.status_code, 304)
+
+        resposta = await self.async_client.get(reverse('produtos_por_cliente', args=[0]))
+        self.assertEqual(resposta.status_code, 404)
+
+    async def test_produtos_exige_login(self):
+        self.assertEqual((await self.async_client.get(self.url_produtos)).status_code, 302)
+
+
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+
+    def amostras(self, metrica, sufixo='_count', **rotulos):
+        return sum(
+            amostra.value for familia in metrica.collect() for amostra in familia.samples
+            if amostra.name.endswith(sufixo) and rotulos.items() <= amostra.labels.items()
+        )
+
+    @override_settings(DEBUG=True)
+    def test_registra_por_view(self):
+        antes = self.amostras(LATENCIA, view='lista_pedidos', status='200')
+        consultas_antes = self.amostras(CONSULTAS, view='lista_pedidos')
+        self.client.get(reverse('lista_pedidos'))
+        self.assertEqual(self.amostras(LATENCIA, view='lista_pedidos', status='200'), antes + 1)
+        self.assertEqual(self.amostras(CONSULTAS, view='lista_pedidos'), consultas_antes + 1)
+
+        resposta = self.client.get('/metrics')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(b'cct_requisicao_duracao_segundos_bucket{', resposta.content)
+
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_metrics_exige_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        resposta = self.client.get('/metrics', headers={'Authorization': 'Bearer segredo'})
+        self.assertEqual(resposta.status_code, 200)
+
+    @override_settings(METRICAS_TOKEN='', DEBUG=False)
+    def test_loopback_sem_token_so_em_debug(self):
+        # Atrás de um proxy local toda requisição chega de 127.0.0.1
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    def test_streaming_mede_o_corpo(self):
+        view = 'exportar_pedidos'
+        antes = self.amostras(CONSULTAS, view=view)
+        consultas_antes = self.amostras(CONSULTAS, sufixo='_sum', view=view)
+        bytes_antes = self.amostras(TAMANHO_RESPOSTA, sufixo='_sum', view=view)
+        resposta = self.client.get(reverse(view, args=['csv']))
+        # Nada é registrado antes de o corpo ser enviado
+        self.assertEqual(self.amostras(CONSULTAS, view=view), antes)
+
+        conteudo = consumir(resposta)
+        self.assertEqual(self.amostras(CONSULTAS, view=view), antes + 1)
+        # Pedidos e itens são lidos durante o envio
+        self.assertGreaterEqual(self.amostras(CONSULTAS, sufixo='_sum', view=view) - consultas_antes, 2)
+        self.assertEqual(self.amostras(TAMANHO_RESPOSTA, sufixo='_sum', view=view) - bytes_antes, len(conteudo))
+
+    @override_settings(METRICAS_ORCAMENTO_CONSULTAS=1)
+    def test_aviso_acima_do_orcamento(self):
+        with self.assertLogs('core.metricas', 'WARNING') as logs:
+            self.client.get(reverse('lista_pedidos'))
+        self.assertIn('lista_pedidos', logs.output[0])
+
+
+class PedidoGrandeTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        produtos = Produto.objects.bulk_create([
+            Produto(cliente=self.cliente, nome_produto=f'Produto {i}', codigo_barras=f'789{i:05d}',
+                    numero_processo=f'P{i}')
+            for i in range(300)
+        ])
+        self.pequeno = Pedido.objects.create(cliente=self.cliente)
+        ItemPedido.objects.create(pedido=self.pequeno, produto=produtos[0], quantidade=2)
+        self.grande = Pedido.objects.create(cliente=self.cliente)
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=self.grande, produto=produto, quantidade=3) for produto in produtos
+        ])
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def consultas(self, nome, pk):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse(nome, args=[pk]))
+            if resposta.streaming:
+                consumir(resposta)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas), resposta
+
+    def test_com_itens_totais(self):
+        pedido = Pedido.objects.com_itens().get(pk=self.grande.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(pedido.total_itens, 300)
+            self.assertEqual(pedido.quantidade_total, 900)
+            self.assertEqual(len(pedido.itens), 300)
+            pedido.itens[-1].produto.nome_produto
+            pedido.cliente.nome_marca
+
+    def test_consultas_independem_do_numero_de_itens(self):
+        rotas = ['detalhe_pedido', 'editar_pedido']
+        if weasyprint_disponivel():
+            rotas.append('exportar_pedido_pdf')
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(PDF_CACHE_DIR=diretorio):
+            for nome in rotas:
+                with self.subTest(rota=nome):
+                    # A primeira visita inclui custos únicos (sessão, cookie CSRF, caches)
+                    self.consultas(nome, self.pequeno.pk)
+                    pequeno, _ = self.consultas(nome, self.pequeno.pk)
+                    grande, resposta = self.consultas(nome, self.grande.pk)
+                    self.assertEqual(grande, pequeno)
+        _, resposta = self.consultas('detalhe_pedido', self.grande.pk)
+        self.assertContains(resposta, '300 itens')
+
+    def test_detalhe_cliente_consultas_fixas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('detalhe_cliente', args=[self.cliente.pk]))
+        self.assertContains(resposta, 'Produto 299')
+        produtos = [sql for sql in consultas.captured_queries if 'clientes_produto' in sql['sql']]
+        # Uma para a versão (GET condicional) e uma para a lista
+        self.assertEqual(len(produtos), 2)
+
+
+class CarregamentoPdfTests(SimpleTestCase):
+
+    def test_views_nao_importam_weasyprint(self):
+        # Em um interpretador novo: nos testes o WeasyPrint pode já estar carregado
+        codigo = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; get_resolver().url_patterns; '
+            'print("weasyprint" in sys.modules)'
+        )
+        processo = subprocess.run(
+            [sys.executable, '-c', codigo], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings'},
+        )
+        self.assertEqual(processo.stdout.strip(), 'False')
+
+    def test_contexto_reaproveitado(self):
+        if not weasyprint_disponivel():
+            self.skipTest('WeasyPrint indisponível')
+        from .pdf import aquecer, arquivo_estatico, contexto_renderizacao, logo_url
+
+        aquecer()
+        contexto = contexto_renderizacao()
+        self.assertIs(contexto_renderizacao(), contexto)
+        self.assertIn(logo_url(), contexto.imagens)
+        with open(os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png'), 'rb') as logo:
+            self.assertEqual(arquivo_estatico('images/logo.png'), logo.read())
+
+
+class CachePdfTests(TestCase):
+    # Os PDFs são gravados direto no cache com _gravar: nada é renderizado
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        configuracao = override_settings(PDF_CACHE_DIR=self.diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.pedido = Pedido.objects.create(cliente=cliente)
+        self.url = reverse('exportar_pedido_pdf', args=[self.pedido.pk])
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def pedido_atual(self):
+        return Pedido.objects.com_itens().get(pk=self.pedido.pk)
+
+    def arquivos(self):
+        return sorted(os.listdir(self.diretorio))
+
+    def test_serve_do_cache_e_responde_304(self):
+        from .pdf import _gravar, chave_pdf
+
+        chave = chave_pdf(self.pedido_atual())
+        _gravar(self.pedido, chave, b'%PDF-cache')
+        resposta = self.client.get(self.url)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF-cache')
+        self.assertEqual(resposta['ETag'], f'"{chave}"')
+
+        resposta = self.client.get(self.url, headers={'If-None-Match': f'"{chave}"'})
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta['ETag'], f'"{chave}"')
+
+    def test_chave_muda_com_pedido_e_layout(self):
+        from . import pdf
+
+        chave = pdf.chave_pdf(self.pedido_atual())
+        self.pedido.save()
+        self.assertNotEqual(pdf.chave_pdf(self.pedido_atual()), chave)
+
+        chave = pdf.chave_pdf(self.pedido_atual())
+        pdf.versao_renderizacao.cache_clear()
+        self.addCleanup(pdf.versao_renderizacao.cache_clear)
+        versao = pdf.VERSAO_LAYOUT
+        self.addCleanup(setattr, pdf, 'VERSAO_LAYOUT', versao)
+        pdf.VERSAO_LAYOUT = versao + 1
+        self.assertNotEqual(pdf.chave_pdf(self.pedido_atual()), chave)
+
+    def test_versao_anterior_removida(self):
+        from .pdf import _gravar
+
+        _gravar(self.pedido, 'a', b'1')
+        _gravar(self.pedido, 'b', b'2')
+        self.assertEqual(self.arquivos(), [f'{self.pedido.pk}-b.pdf'])
+
+    @override_settings(PDF_CACHE_MAX_BYTES=10)
+    def test_limite_remove_os_menos_usados(self):
+        from .pdf import _aplicar_limite, _arquivos_em_cache
+
+        for numero in range(4):
+            caminho = os.path.join(self.diretorio, f'{numero}-x.pdf')
+            with open(caminho, 'wb') as arquivo:
+                arquivo.write(b'12345')
+            os.utime(caminho, (1000 + numero, 1000 + numero))
+        # O primeiro foi usado por último
+        os.utime(os.path.join(self.diretorio, '0-x.pdf'), (2000, 2000))
+
+        _aplicar_limite(_arquivos_em_cache(self.diretorio))
+        self.assertEqual(self.arquivos(), ['0-x.pdf', '3-x.pdf'])
+
+    @override_settings(PDF_CACHE_MAX_BYTES=3)
+    def test_pdf_maior_que_o_limite_nao_e_removido(self):
+        from . import pdf
+
+        outro = os.path.join(self.diretorio, '999-x.pdf')
+        with open(outro, 'wb') as arquivo:
+            arquivo.write(b'12')
+        original = pdf.renderizar_pdf
+        self.addCleanup(setattr, pdf, 'renderizar_pdf', original)
+        pdf.renderizar_pdf = lambda pedido: b'%PDF-grande'
+
+        resposta = self.client.get(self.url)
+        self.assertEqual(b''.join(resposta.streaming_content), b'%PDF-grande')
+        chave = resposta['ETag'].strip('"')
+        self.assertEqual(self.arquivos(), [f'{self.pedido.pk}-{chave}.pdf'])
+
+    def test_estatico_ausente(self):
+        from .pdf import arquivo_estatico
+
+        with self.assertRaisesMessage(FileNotFoundError, 'css/inexistente.css'):
+            arquivo_estatico('css/inexistente.css')
+
+
+class ExportacaoLoteTests(TestCase):
+    # As tarefas rodam com o ExecutorLocal, no próprio processo do teste
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+        configuracao = override_settings(
+            EXPORTACOES_DIR=os.path.join(self.diretorio, 'exportacoes'),
+            PDF_CACHE_DIR=os.path.join(self.diretorio, 'pdf'),
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.pedidos = [Pedido.objects.create(cliente=cliente) for _ in range(3)]
+        self.usuario = User.objects.create_user('admin', password='x')
+
+    def exportacao(self, formato='zip', ids=None):
+        ids = [pedido.pk for pedido in self.pedidos] if ids is None else ids
+        return tarefas.criar_exportacao(self.usuario, ids, formato)
+
+    def envelhecer(self, exportacao, segundos):
+        ExportacaoPedidos.objects.filter(pk=exportacao.pk).update(
+            data_atualizacao=timezone.now() - timedelta(seconds=segundos)
+        )
+
+    def test_reserva_em_ordem_uma_vez(self):
+        primeira, segunda = self.exportacao(), self.exportacao()
+        reservada = tarefas.reservar_proxima()
+        self.assertEqual((reservada.pk, reservada.status, reservada.tentativas), (primeira.pk, 'processando', 1))
+        self.assertEqual(tarefas.reservar_proxima().pk, segunda.pk)
+        self.assertIsNone(tarefas.reservar_proxima())
+
+    def test_recupera_job_travado(self):
+        exportacao = self.exportacao()
+        tarefas.reservar_proxima()
+        ExportacaoPedidos.objects.filter(pk=exportacao.pk).update(concluidos=2)
+        self.envelhecer(exportacao, settings.EXPORTACAO_TEMPO_LIMITE_SEGUNDOS - 60)
+        self.assertIsNone(tarefas.reservar_proxima())
+
+        self.envelhecer(exportacao, settings.EXPORTACAO_TEMPO_LIMITE_SEGUNDOS + 60)
+        reservada = tarefas.reservar_proxima()
+        self.assertEqual((reservada.pk, reservada.concluidos, reservada.tentativas), (exportacao.pk, 0, 2))
+
+    def test_desiste_depois_das_tentativas(self):
+        exportacao = self.exportacao()
+        ExportacaoPedidos.objects.filter(pk=exportacao.pk).update(
+            status='processando', tentativas=settings.EXPORTACAO_MAX_TENTATIVAS
+        )
+        self.envelhecer(exportacao, settings.EXPORTACAO_TEMPO_LIMITE_SEGUNDOS + 60)
+        self.assertIsNone(tarefas.reservar_proxima())
+        self.assertEqual(ExportacaoPedidos.objects.get(pk=exportacao.pk).status, 'erro')
+
+    def test_limpa_arquivos_e_jobs_expirados(self):
+        diretorio = settings.EXPORTACOES_DIR
+        os.makedirs(diretorio)
+        antigo, recente = os.path.join(diretorio, 'antigo.zip'), os.path.join(diretorio, 'recente.zip')
+        for caminho in (antigo, recente):
+            open(caminho, 'wb').close()
+        validade = settings.EXPORTACAO_VALIDADE_HORAS * 3600
+        os.utime(antigo, (time.time() - validade - 60,) * 2)
+        expirada, pendente = self.exportacao(), self.exportacao()
+        ExportacaoPedidos.objects.filter(pk=expirada.pk).update(status='concluida', arquivo=antigo)
+        self.envelhecer(expirada, validade + 60)
+        self.envelhecer(pendente, validade + 60)
+
+        self.assertEqual(tarefas.limpar_exportacoes(), 1)
+        self.assertEqual(os.listdir(diretorio), ['recente.zip'])
+        self.assertEqual(list(ExportacaoPedidos.objects.values_list('pk', flat=True)), [pendente.pk])
+
+    def test_pdf_sem_pedidos_existentes(self):
+        exportacao = self.exportacao('pdf', ids=[0, -1])
+        self.assertFalse(tarefas.processar(tarefas.reservar_proxima(), tarefas.ExecutorLocal()))
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'erro')
+        self.assertEqual(os.listdir(settings.EXPORTACOES_DIR), [])
+
+    def test_zip(self):
+        if not weasyprint_disponivel():
+            self.skipTest('WeasyPrint indisponível')
+        exportacao = self.exportacao(ids=[self.pedidos[0].pk, 0, self.pedidos[1].pk])
+        self.assertTrue(tarefas.processar(tarefas.reservar_proxima(), tarefas.ExecutorLocal()))
+        exportacao.refresh_from_db()
+        self.assertEqual((exportacao.status, exportacao.concluidos), ('concluida', 3))
+        with zipfile.ZipFile(exportacao.arquivo) as arquivo:
+            self.assertEqual(
+                sorted(arquivo.namelist()), sorted(f'pedido_{pedido.pk}.pdf' for pedido in self.pedidos[:2])
+            )
+
+    @skipUnless(tarefas.PDF_EM_PARTES, 'pypdf indisponível')
+    def test_pdf_unico_em_partes(self):
+        if not weasyprint_disponivel():
+            self.skipTest('WeasyPrint indisponível')
+        from pypdf import PdfReader
+
+        parte = tarefas.TAMANHO_PARTE
+        self.addCleanup(setattr, tarefas, 'TAMANHO_PARTE', parte)
+        tarefas.TAMANHO_PARTE = 2
+        exportacao = self.exportacao('pdf')
+        self.assertTrue(tarefas.processar(tarefas.reservar_proxima(), tarefas.ExecutorLocal()))
+        exportacao.refresh_from_db()
+        self.assertEqual(len(PdfReader(exportacao.arquivo).pages), 3)
+        self.assertEqual(os.listdir(settings.EXPORTACOES_DIR), [os.path.basename(exportacao.arquivo)])
+
+    def test_parte_com_erro_espera_as_outras(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def renderizar_parte(exportacao_id, pedidos_ids, destino):
+            if destino.endswith('.0'):
+                raise ValueError('Falha na primeira parte.')
+            # As outras partes ainda estão gravando quando a primeira falha
+            time.sleep(0.2)
+            with open(destino, 'wb') as arquivo:
+                arquivo.write(b'%PDF-parte')
+            return len(pedidos_ids)
+
+        for nome, valor in (('TAMANHO_PARTE', 1), ('PDF_EM_PARTES', True), ('_renderizar_parte', renderizar_parte)):
+            self.addCleanup(setattr, tarefas, nome, getattr(tarefas, nome))
+            setattr(tarefas, nome, valor)
+        exportacao = self.exportacao('pdf')
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            self.assertFalse(tarefas.processar(tarefas.reservar_proxima(), executor))
+        exportacao.refresh_from_db()
+        self.assertEqual((exportacao.status, exportacao.erro), ('erro', 'Falha na primeira parte.'))
+        self.assertEqual(os.listdir(settings.EXPORTACOES_DIR), [])
+
+    def test_comando(self):
+        # Pedidos inexistentes: o zip sai vazio, sem renderizar nada
+        exportacao = self.exportacao(ids=[0])
+        saida = io.StringIO()
+        call_command('processar_exportacoes', uma_vez=True, processos=0, stdout=saida)
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'concluida')
+        self.assertIn(f'Exportação {exportacao.pk} concluída.', saida.getvalue())
+        with zipfile.ZipFile(exportacao.arquivo) as arquivo:
+            self.assertEqual(arquivo.namelist(), [])
+
+
+@override_settings(EVENTOS_PEDIDOS_DURACAO=0)
+class EventosPedidosTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        self.usuario = criar_usuario('supervisor', 'Supervisão')
+        self.client.force_login(self.usuario)
+        self.async_client.force_login(self.usuario)
+        self.url = reverse('eventos_pedidos')
+
+    def get(self, *args, **kwargs):
+        # O fluxo só é servido sob ASGI
+        return async_to_sync(self.async_client.get)(*args, **kwargs)
+
+    def eventos(self, resposta):
+        # (cursor, dados) de cada evento
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        blocos = consumir(resposta).decode().split('\n\n')
+        eventos = []
+        for bloco in blocos:
+            campos = dict(linha.split(': ', 1) for linha in bloco.splitlines() if not linha.startswith(':'))
+            if 'data' in campos:
+                eventos.append((campos['id'], json.loads(campos['data'])))
+        return eventos
+
+    def test_retoma_do_last_event_id(self):
+        inicio = PedidoStatusEvento.objects.latest('id').id
+        transicionar_status([self.pedido.id], 'materia_prima')
+        transicionar_status([self.pedido.id], 'producao')
+
+        eventos = self.eventos(self.get(self.url, {'desde': inicio}))
+        self.assertEqual([dados['status'] for _, dados in eventos], ['materia_prima', 'producao'])
+        self.assertEqual(eventos[1][1]['anterior'], 'materia_prima')
+        self.assertEqual(eventos[1][1]['pedido'], self.pedido.id)
+
+        # Na reconexão o navegador envia o último id recebido, que tem precedência
+        retomados = self.eventos(self.get(
+            self.url, {'desde': inicio}, headers={'Last-Event-ID': eventos[0][0]}
+        ))
+        self.assertEqual(retomados, eventos[1:])
+
+    def test_sem_id_envia_so_eventos_futuros(self):
+        self.assertEqual(self.eventos(self.get(self.url)), [])
+
+    def test_commit_fora_de_ordem(self):
+        inicio = PedidoStatusEvento.objects.latest('id').id
+        for status in ('materia_prima', 'producao', 'envase'):
+            transicionar_status([self.pedido.id], status)
+        # O evento do meio ainda não foi "commitado" quando o fluxo lê
+        atrasado = PedidoStatusEvento.objects.get(status='producao')
+        atrasado_id = atrasado.pk
+        atrasado.delete()
+
+        eventos = self.eventos(self.get(self.url, {'desde': inicio}))
+        self.assertEqual([dados['status'] for _, dados in eventos], ['materia_prima', 'envase'])
+        cursor = eventos[-1][0]
+        self.assertEqual(cursor, f'{inicio + 3}:{inicio + 2}')
+
+        # O commit chega depois: a reconexão envia só o evento atrasado, uma vez
+        atrasado.pk = atrasado_id
+        atrasado.save(force_insert=True)
+        retomados = self.eventos(self.get(self.url, headers={'Last-Event-ID': cursor}))
+        self.assertEqual([(cursor, dados['status']) for cursor, dados in retomados], [(str(inicio + 3), 'producao')])
+        self.assertEqual(self.eventos(self.get(self.url, headers={'Last-Event-ID': str(inicio + 3)})), [])
+
+    @override_settings(EVENTOS_PEDIDOS_JANELA_IDS=10)
+    def test_cursor_limitado_a_janela(self):
+        from .eventos import Cursor
+
+        cursor = Cursor.decodificar('100:1-95,97,99')
+        self.assertEqual(cursor.codificar(), '100:91-95,97,99')
+        cursor.avancar(97)
+        cursor.avancar(104)
+        self.assertEqual(cursor.codificar(), '104:95,99,101-103')
+
+    def test_lista_informa_ultimo_evento(self):
+        resposta = self.get(reverse('lista_pedidos'))
+        ultimo = PedidoStatusEvento.objects.latest('id').id
+        self.assertContains(resposta, f'?desde={ultimo}')
+        self.assertContains(resposta, 'window.EventSource && true')
+
+    def test_sem_fluxo_sob_wsgi(self):
+        # Sob WSGI o gerador seria lido até o fim antes de enviar qualquer evento
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 204)
+        self.assertFalse(resposta.streaming)
+        resposta = self.client.get(reverse('lista_pedidos'))
+        self.assertContains(resposta, 'window.EventSource && false')
+
+    def test_notificacao_acorda_conexao(self):
+        from . import eventos
+
+        async def cenario():
+            fluxo = eventos.fluxo(await eventos.acursor_atual())
+            self.assertTrue((await fluxo.__anext__()).startswith('retry:'))
+            # Sem eventos novos, a conexão fica esperando a notificação
+            proximo = asyncio.ensure_future(fluxo.__anext__())
+            await asyncio.sleep(0.05)
+            self.assertFalse(proximo.done())
+            await sync_to_async(transicionar_status)([self.pedido.id], 'producao')
+            await sync_to_async(eventos.notificar)()
+            evento = await asyncio.wait_for(proximo, 2)
+            await fluxo.aclose()
+            return evento
+
+        with override_settings(EVENTOS_PEDIDOS_DURACAO=60, EVENTOS_PEDIDOS_INTERVALO=30):
+            evento = async_to_sync(cenario)()
+        self.assertIn('"status": "producao"', evento)
+
+
+class GetCondicionalTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nome='Ana', telefone='1', endereco='Rua A', nome_marca='Marca A')
+        self.produto = Produto.objects.create(
+            cliente=self.cliente, nome_produto='Creme', codigo_barras='789', numero_processo='P1'
+        )
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        self.admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.admin)
+
+    def revalidar(self, url):
+        # A primeira visita define o cookie CSRF, que faz parte do ETag
+        self.client.get(url)
+        primeira = self.client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        return self.client.get(url, headers={'If-None-Match': primeira['ETag']})
+
+    def test_304_sem_renderizar(self):
+        for url in (
+            reverse('lista_clientes'),
+            reverse('detalhe_cliente', args=[self.cliente.pk]),
+            reverse('detalhe_pedido', args=[self.pedido.pk]),
+            reverse('produtos_por_cliente', args=[self.cliente.pk]),
+        ):
+            with self.subTest(url=url):
+                resposta = self.revalidar(url)
+                self.assertEqual(resposta.status_code, 304)
+                self.assertEqual(resposta.content, b'')
+                self.assertIn('private', resposta['Cache-Control'])
+
+    def test_alteracao_invalida(self):
+        url = reverse('produtos_por_cliente', args=[self.cliente.pk])
+        etag = self.client.get(url)['ETag']
+        with transaction.atomic():
+            sincronizar_produtos(self.cliente, [{
+                'id': self.produto.id, 'nome_produto': 'Gel', 'codigo_barras': '789', 'numero_processo': 'P1',
+            }])
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+        url = reverse('detalhe_cliente', args=[self.cliente.pk])
+        etag = self.client.get(url)['ETag']
+        self.produto.delete()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_versao_do_pedido_em_uma_consulta(self):
+        url = reverse('detalhe_pedido', args=[self.pedido.pk])
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 304)
+        # Só a versão do pedido lê a tabela de pedidos antes do 304
+        pedidos = [sql for sql in consultas.captured_queries if 'clientes_pedido' in sql['sql']]
+        self.assertEqual(len(pedidos), 1)
+
+    def test_etag_do_pedido_nao_depende_do_relogio(self):
+        url = reverse('detalhe_pedido', args=[self.pedido.pk])
+        self.client.get(url)
+        resposta = self.client.get(url)
+        self.assertContains(resposta, 'data-desde=')
+        # Uma hora depois (na mesma semana, que define a janela do tempo por
+        # etapa) a página em cache continua válida; o tempo no status atual
+        # é recalculado no navegador
+        original = timezone.now
+        janela = inicio_janela()
+        agora = original() + timedelta(hours=1)
+        setattr(timezone, 'now', lambda: agora)
+        self.addCleanup(setattr, timezone, 'now', original)
+        if inicio_janela() != janela:
+            agora = original() - timedelta(hours=1)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': resposta['ETag']}).status_code, 304)
+
+        self.pedido.status = 'producao'
+        self.pedido.save()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': resposta['ETag']}).status_code, 200)
+
+    def test_etag_depende_do_usuario(self):
+        url = reverse('lista_clientes')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_superuser('outro', password='x'))
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class CatalogoProdutosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = semear(clientes=12, produtos_por_cliente=3, pedidos=2)
+        cls.admin = criar_usuario('admin', 'Administrador')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('catalogo_produtos')
+
+    def catalogo(self, clientes, **cabecalhos):
+        return self.client.get(self.url, {'clientes': ','.join(str(c.id) for c in clientes)}, headers=cabecalhos)
+
+    def test_varios_clientes_em_uma_resposta(self):
+        # A primeira requisição da sessão faz consultas a mais
+        self.catalogo(self.clientes[:1])
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.catalogo(self.clientes[:10])
+        self.assertEqual(resposta.status_code, 200)
+        catalogo = resposta.json()['clientes']
+        for cliente in self.clientes[:10]:
+            esperados = set(cliente.produtos.values_list('id', flat=True))
+            self.assertEqual({produto['id'] for produto in catalogo[str(cliente.id)]['produtos']}, esperados)
+        # Sessão, usuário, versões e produtos: não cresce com o número de clientes
+        self.assertLessEqual(len(consultas), 4 + CONSULTAS_VERSAO_GRUPOS)
+
+    def test_versao_igual_ao_etag_da_api_de_produtos(self):
+        cliente = self.clientes[0]
+        resposta = self.catalogo([cliente])
+        versao = resposta.json()['clientes'][str(cliente.id)]['versao']
+        self.assertEqual(resposta['ETag'], versao)
+        self.assertEqual(self.client.get(reverse('produtos_por_cliente', args=[cliente.id]))['ETag'], versao)
+        self.assertEqual(self.catalogo([cliente], **{'If-None-Match': versao}).status_code, 304)
+
+    def test_reenvia_so_catalogos_alterados(self):
+        primeiro, segundo = self.clientes[:2]
+        versoes = {
+            chave: dados['versao'] for chave, dados in self.catalogo([primeiro, segundo]).json()['clientes'].items()
+        }
+        produto = segundo.produtos.first()
+        produto.nome_produto = 'Renomeado'
+        produto.save()
+
+        resposta = self.catalogo([primeiro, segundo], **{'If-None-Match': ', '.join(versoes.values())})
+        catalogo = resposta.json()['clientes']
+        self.assertEqual(catalogo[str(primeiro.id)], {'versao': versoes[str(primeiro.id)], 'nao_modificado': True})
+        self.assertNotEqual(catalogo[str(segundo.id)]['versao'], versoes[str(segundo.id)])
+        self.assertIn({'id': produto.id, 'nome_produto': 'Renomeado'}, catalogo[str(segundo.id)]['produtos'])
+
+    def test_lista_invalida(self):
+        for valor in ('', 'a,b', ','.join(str(numero) for numero in range(1, 60))):
+            with self.subTest(clientes=valor[:20]):
+                self.assertEqual(self.client.get(self.url, {'clientes': valor}).status_code, 400)
+
+    def test_busca_de_clientes(self):
+        cliente = self.clientes[3]
+        resposta = self.client.get(reverse('buscar_clientes'), {'q': cliente.nome_marca})
+        # Os produtos também citam a marca no índice, mas só clientes são sugeridos
+        self.assertEqual(resposta.json()[0], {'id': cliente.id, 'nome_marca': cliente.nome_marca})
+        self.assertTrue(all(Cliente.objects.filter(pk=item['id']).exists() for item in resposta.json()))
+        self.assertEqual(self.client.get(reverse('buscar_clientes'), {'q': ''}).json(), [])
+
+    def test_formulario_nao_lista_clientes(self):
+        resposta = self.client.get(reverse('criar_pedido'))
+        self.assertNotContains(resposta, self.clientes[5].nome_marca)
+        pedido = Pedido.objects.select_related('cliente').first()
+        outro = Cliente.objects.exclude(pk=pedido.cliente_id).first()
+        resposta = self.client.get(reverse('editar_pedido', args=[pedido.id]))
+        self.assertContains(resposta, f'value="{pedido.cliente.nome_marca}"')
+        self.assertNotContains(resposta, outro.nome_marca)
+
+
+class FabricasTests(TestCase):
+
+    def test_historico_coincide_com_os_pedidos(self):
+        semear(clientes=3, produtos_por_cliente=2, pedidos=30)
+        ultimos = {}
+        for pedido_id, status, data in PedidoStatusEvento.objects.order_by('id').values_list(
+            'pedido_id', 'status', 'data'
+        ):
+            ultimos[pedido_id] = (status, data)
+        pedidos = {pedido.id: (pedido.status, pedido.data_status) for pedido in Pedido.objects.all()}
+        self.assertEqual(ultimos, pedidos)
+        self.assertTrue(PedidoStatusEvento.objects.exclude(status_anterior='').exists())
+        # O status final não volta para o início
+        self.assertFalse(PedidoStatusEvento.objects.filter(status_anterior='entregue').exists())
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        semear(clientes=30, produtos_por_cliente=2, pedidos=40)
+        cls.supervisor = criar_usuario('supervisor', 'Supervisão')
+
+    def setUp(self):
+        self.client.force_login(self.supervisor)
+
+    def pagina(self, nome, **parametros):
+        resposta = self.client.get(reverse(nome), parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.content if not resposta.streaming else '')
+        return json.loads(consumir(resposta))
+
+    def percorrer(self, nome, **parametros):
+        registros, paginas = [], 0
+        while True:
+            pagina = self.pagina(nome, **parametros)
+            registros += pagina['results']
+            paginas += 1
+            if not pagina['has_more']:
+                self.assertIsNone(pagina['next_cursor'])
+                return registros, paginas
+            parametros['cursor'] = pagina['next_cursor']
+
+    def test_cursor_percorre_todos_uma_vez(self):
+        # Datas iguais forçam o desempate pelo id
+        Cliente.objects.filter(id__lte=Cliente.objects.order_by('id')[10].id).update(
+            data_atualizacao=timezone.now()
+        )
+        for nome, modelo in (('api_clientes', Cliente), ('api_produtos', Produto),
+                             ('api_pedidos', Pedido), ('api_itens_pedido', ItemPedido)):
+            with self.subTest(nome=nome):
+                registros, paginas = self.percorrer(nome, limit=7, fields='id')
+                ids = [registro['id'] for registro in registros]
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(set(ids), set(modelo.objects.values_list('id', flat=True)))
+                self.assertGreater(paginas, 1)
+
+    def test_campos_e_itens_aninhados(self):
+        pedido = self.pagina('api_pedidos', fields='id,status,itens', limit=1)['results'][0]
+        self.assertEqual(set(pedido), {'id', 'status', 'itens'})
+        esperados = list(
+            ItemPedido.objects.filter(pedido_id=pedido['id']).order_by('id')
+            .values('id', 'produto_id', 'quantidade')
+        )
+        self.assertEqual(pedido['itens'], esperados)
+
+    def test_updated_since(self):
+        corte = timezone.now() + timedelta(seconds=1)
+        cliente = Cliente.objects.order_by('id').first()
+        Cliente.objects.filter(pk=cliente.pk).update(data_atualizacao=corte + timedelta(minutes=1))
+        resultados = self.pagina('api_clientes', updated_since=corte.isoformat(), fields='id')['results']
+        self.assertEqual(resultados, [{'id': cliente.id}])
+
+    def test_consultas_nao_dependem_do_tamanho_da_pagina(self):
+        # A primeira requisição da sessão faz consultas a mais
+        self.pagina('api_pedidos', limit=1)
+        contagens = []
+        for limite in (1, 40):
+            with CaptureQueriesContext(connection) as consultas:
+                self.pagina('api_pedidos', limit=limite)
+            contagens.append(len(consultas))
+        self.assertEqual(contagens[0], contagens[1])
+
+    def test_parametros_invalidos(self):
+        from .api import codificar_cursor
+
+        for parametros in ({'fields': 'id,senha'}, {'cursor': 'nao-e-cursor'}, {'limit': '0'},
+                           {'updated_since': 'ontem'}, {'cliente': 'x'}, {'cliente': '²'},
+                           # Formato certo, data impossível ou de outro tipo
+                           {'cursor': codificar_cursor(['2024-13-01T00:00:00+00:00', 1])},
+                           {'cursor': codificar_cursor([20240101, 1])},
+                           {'cursor': codificar_cursor(['2024-01-01T00:00:00+00:00', True])}):
+            with self.subTest(parametros=parametros):
+                resposta = self.client.get(reverse('api_produtos'), parametros)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('message', resposta.json())
+
+    @override_settings(API_TOKENS=['segredo'])
+    def test_autenticacao(self):
+        self.client.logout()
+        url = reverse('api_clientes')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer errado'}).status_code, 401)
+        resposta = self.client.get(url, headers={'Authorization': 'Bearer segredo'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['API-Version'], '1')
+
+
+class OrcamentoRotasClientesTests(OrcamentoRotasMixin, TestCase):
+    urlconf = clientes_urls
+
+    @classmethod
+    def setUpTestData(cls):
+        clientes = semear(clientes=2000, produtos_por_cliente=5, pedidos=3000)
+        cls.cliente = clientes[0]
+        cls.clientes_ids = [cliente.id for cliente in clientes]
+        cls.produtos = list(cls.cliente.produtos.order_by('id'))
+        cls.pedido = Pedido.objects.filter(cliente=cls.cliente).order_by('id').first()
+        cls.pedidos_ids = list(Pedido.objects.order_by('id').values_list('id', flat=True)[:1000])
+        cls.admin = criar_usuario('admin', 'Administrador')
+        cls.supervisor = criar_usuario('supervisor', 'Supervisão')
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        # Fluxo SSE com duração zero: envia o que houver e encerra
+        configuracao = override_settings(PDF_CACHE_DIR=diretorio.name, EVENTOS_PEDIDOS_DURACAO=0)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.cache_pdf = diretorio.name
+        arquivo = os.path.join(diretorio.name, 'exportacao.zip')
+        with open(arquivo, 'wb') as destino:
+            destino.write(b'PK')
+        self.exportacoes = {
+            papel: ExportacaoPedidos.objects.create(
+                usuario=usuario, pedidos_ids=self.pedidos_ids[:10], total=10, concluidos=10,
+                status='concluida', arquivo=arquivo,
+            )
+            for papel, usuario in (('admin', self.admin), ('supervisor', self.supervisor))
+        }
+
+    def ampliar_dados(self):
+        semear(clientes=1000, produtos_por_cliente=5, pedidos=1500)
+
+    def preparar_passada(self):
+        # PDFs gerados na passada anterior sairiam do cache, com menos consultas
+        for nome in os.listdir(self.cache_pdf):
+            caminho = os.path.join(self.cache_pdf, nome)
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho)
+            elif nome != 'exportacao.zip':
+                os.remove(caminho)
+
+    def dados_cliente(self, marca):
+        dados = {'nome': 'Contato', 'telefone': '1', 'endereco': 'Rua', 'nome_marca': marca}
+        for indice, produto in enumerate(self.produtos):
+            dados.update({
+                f'produto-{indice}-id': produto.id,
+                f'produto-{indice}-nome_produto': produto.nome_produto,
+                f'produto-{indice}-codigo_barras': produto.codigo_barras,
+                f'produto-{indice}-numero_processo': produto.numero_processo,
+            })
+        return dados
+
+    def dados_pedido(self):
+        dados = {'cliente': self.cliente.id}
+        for indice, produto in enumerate(self.produtos):
+            dados.update({f'produto-{indice}-id': produto.id, f'produto-{indice}-quantidade': 2})
+        return dados
+
+    def rotas(self, papel):
+        cliente, pedido, exportacao = self.cliente.pk, self.pedido.pk, self.exportacoes[papel].pk
+        ultimo_evento = PedidoStatusEvento.objects.latest('id').id
+        csv = 'nome_marca,produto,codigo_barras\nMarca Nova,Creme,111\nMarca Nova,Gel,222\n'
+        return [
+            # Contadores lidos da tabela ContadorDashboard; aqui ainda com a recontagem inicial,
+            # que trava os contadores num savepoint (SAVEPOINT, SELECT ... FOR UPDATE, RELEASE)
+            {'nome': 'dashboard', 'consultas': 14, 'admin': 200, 'supervisor': 200},
+            {'nome': 'buscar', 'dados': {'q': 'marca 0001'}, 'consultas': 4, 'admin': 200, 'supervisor': 200},
+            {'nome': 'lista_clientes', 'consultas': 4, 'admin': 200, 'supervisor': 200},
+            {'nome': 'criar_cliente', 'consultas': 3, 'admin': 200, 'supervisor': 302},
+            {'nome': 'criar_cliente', 'metodo': 'post', 'dados': self.dados_cliente('Marca Criada'),
+             'consultas': 12, 'admin': 302, 'supervisor': 302},
+            {'nome': 'detalhe_cliente', 'args': [cliente], 'consultas': 6, 'admin': 200, 'supervisor': 200},
+            {'nome': 'editar_cliente', 'args': [cliente], 'consultas': 5, 'admin': 200, 'supervisor': 302},
+            {'nome': 'editar_cliente', 'args': [cliente], 'metodo': 'post',
+             'dados': self.dados_cliente('Marca Editada'), 'consultas': 13, 'admin': 302, 'supervisor': 302},
+            {'nome': 'excluir_cliente', 'args': [cliente], 'consultas': 4, 'admin': 200, 'supervisor': 302},
+            {'nome': 'importar_clientes', 'consultas': 3, 'admin': 200, 'supervisor': 302},
+            {'nome': 'importar_clientes', 'metodo': 'post',
+             'dados': {'arquivo': SimpleUploadedFile('clientes.csv', csv.encode())},
+             'consultas': 13, 'admin': 200, 'supervisor': 302},
+            # Exportações percorrem o banco em lotes de planilhas.TAMANHO_LOTE registros:
+            # uma consulta a mais por lote, por isso ficam fora da comparação entre escalas
+            {'nome': 'exportar_clientes', 'args': ['csv'], 'consultas': 8, 'segundos': 5, 'por_bloco': True,
+             'admin': 200, 'supervisor': 200},
+            # importar_clientes (bulk_create) invalida os contadores: esta leitura reconta
+            {'nome': 'lista_pedidos', 'consultas': 10, 'admin': 200, 'supervisor': 200},
+            {'nome': 'lista_pedidos', 'dados': {'status': 'envio', 'cliente': cliente},
+             'consultas': 6, 'admin': 200, 'supervisor': 200},
+            {'nome': 'criar_pedido', 'consultas': 2, 'admin': 200, 'supervisor': 302},
+            {'nome': 'criar_pedido', 'metodo': 'post', 'dados': self.dados_pedido(),
+             'consultas': 12, 'admin': 302, 'supervisor': 302},
+            {'nome': 'detalhe_pedido', 'args': [pedido], 'consultas': 7, 'admin': 200, 'supervisor': 200},
+            {'nome': 'editar_pedido', 'args': [pedido], 'consultas': 4, 'admin': 200, 'supervisor': 302},
+            {'nome': 'editar_pedido', 'args': [pedido], 'metodo': 'post', 'dados': self.dados_pedido(),
+             'consultas': 12, 'admin': 302, 'supervisor': 302},
+            {'nome': 'excluir_pedido', 'args': [pedido], 'consultas': 4, 'admin': 200, 'supervisor': 302},
+            {'nome': 'exportar_pedidos', 'args': ['xlsx'], 'consultas': 9, 'segundos': 5, 'por_bloco': True,
+             'admin': 200, 'supervisor': 200},
+            {'nome': 'produtos_por_cliente', 'args': [cliente], 'consultas': 5, 'admin': 200, 'supervisor': 200},
+            {'nome': 'catalogo_produtos', 'dados': {'clientes': ','.join(map(str, self.clientes_ids[:50]))},
+             'consultas': 4, 'admin': 200, 'supervisor': 200},
+            {'nome': 'buscar_clientes', 'dados': {'q': 'marca 0001'}, 'consultas': 3, 'admin': 200, 'supervisor': 200},
+            # Sob WSGI o fluxo não é servido (ver clientes/eventos.py)
+            {'nome': 'eventos_pedidos', 'consultas': 2, 'admin': 204, 'supervisor': 204},
+            {'nome': 'eventos_pedidos', 'asgi': True, 'consultas': 4, 'admin': 200, 'supervisor': 200},
+            # Cliente que perdeu 1000 eventos: dois lotes de eventos_pedidos.LIMITE_LOTE
+            {'nome': 'eventos_pedidos', 'asgi': True, 'dados': {'desde': ultimo_evento - 1000}, 'consultas': 5,
+             'admin': 200, 'supervisor': 200},
+            {'nome': 'api_clientes', 'consultas': 3, 'admin': 200, 'supervisor': 200},
+            {'nome': 'api_produtos', 'dados': {'limit': 5000}, 'consultas': 3, 'admin': 200, 'supervisor': 200},
+            # Itens aninhados: uma consulta a cada api.TAMANHO_BLOCO pedidos
+            {'nome': 'api_pedidos', 'dados': {'limit': 2000}, 'consultas': 7, 'admin': 200, 'supervisor': 200},
+            {'nome': 'api_itens_pedido', 'dados': {'limit': 5000}, 'consultas': 3, 'admin': 200, 'supervisor': 200},
+            {'nome': 'atualizar_status_pedido', 'args': [pedido], 'metodo': 'post',
+             'dados': {'status': 'envio', 'numero_rastreio': 'BR1', 'nome_transportadora': 'T'},
+             # data_status vai no mesmo UPDATE do status (ver clientes/signals.py); o
+             # histórico semeado já tem linhas de tempo por etapa: um UPDATE e um INSERT
+             'consultas': 12, 'admin': 200, 'supervisor': 302},
+            {'nome': 'atualizar_status_pedidos_lote', 'metodo': 'post',
+             'dados': {'ids': self.pedidos_ids, 'status': 'entregue'},
+             'consultas': 19, 'admin': 200, 'supervisor': 302},
+            {'nome': 'exportar_pedido_pdf', 'args': [pedido], 'consultas': 10, 'segundos': 10,
+             'weasyprint': True, 'admin': 200, 'supervisor': 200},
+            {'nome': 'exportar_pedidos_lote', 'metodo': 'post', 'dados': {'formato': 'zip', 'cliente': cliente},
+             'consultas': 5, 'admin': 202, 'supervisor': 202},
+            {'nome': 'status_exportacao_lote', 'args': [exportacao], 'consultas': 3,
+             'admin': 200, 'supervisor': 200},
+            {'nome': 'baixar_exportacao_lote', 'args': [exportacao], 'consultas': 3,
+             'admin': 200, 'supervisor': 200},
+        ]
+
+    def test_admin(self):
+        self.verificar_rotas('admin', self.admin)
+
+    def test_supervisor(self):
+        self.verificar_rotas('supervisor', self.supervisor)
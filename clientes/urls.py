@@ -1,18 +1,23 @@
 # clientes/urls.py
 
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Dashboard
     path('', views.dashboard, name='dashboard'),
 
+    # Busca
+    path('busca/', views.buscar, name='buscar'),
+
     # Clientes
     path('clientes/', views.lista_clientes, name='lista_clientes'),
     path('clientes/novo/', views.criar_cliente, name='criar_cliente'),
     path('clientes/<int:pk>/', views.detalhe_cliente, name='detalhe_cliente'),
     path('clientes/<int:pk>/editar/', views.editar_cliente, name='editar_cliente'),
     path('clientes/<int:pk>/excluir/', views.excluir_cliente, name='excluir_cliente'),
+    path('clientes/importar/', views.importar_clientes, name='importar_clientes'),
+    path('clientes/exportar/<str:formato>/', views.exportar_clientes, name='exportar_clientes'),
 
     # Pedidos
     path('pedidos/', views.lista_pedidos, name='lista_pedidos'),
@@ -20,13 +25,31 @@ urlpatterns = [
     path('pedidos/<int:pk>/', views.detalhe_pedido, name='detalhe_pedido'),
     path('pedidos/<int:pk>/editar/', views.editar_pedido, name='editar_pedido'),
     path('pedidos/<int:pk>/excluir/', views.excluir_pedido, name='excluir_pedido'),
+    path('pedidos/exportar/<str:formato>/', views.exportar_pedidos, name='exportar_pedidos'),
+
+    # API de leitura para integrações (ver clientes/api.py)
+    path('api/v1/clientes/', api.listar, {'nome': 'clientes'}, name='api_clientes'),
+    path('api/v1/produtos/', api.listar, {'nome': 'produtos'}, name='api_produtos'),
+    path('api/v1/pedidos/', api.listar, {'nome': 'pedidos'}, name='api_pedidos'),
+    path('api/v1/itens-pedido/', api.listar, {'nome': 'itens-pedido'}, name='api_itens_pedido'),
 
     # API para produtos por cliente
     path('api/clientes/<int:pk>/produtos/', views.produtos_por_cliente, name='produtos_por_cliente'),
+    path('api/clientes/buscar/', views.buscar_clientes, name='buscar_clientes'),
+    path('api/catalogo/', views.catalogo_produtos, name='catalogo_produtos'),
 
     # Atualização de status de pedido
     path('pedidos/atualizar-status/<int:pk>/', views.atualizar_status_pedido, name='atualizar_status_pedido'),
+    path('pedidos/atualizar-status/lote/', views.atualizar_status_pedidos_lote, name='atualizar_status_pedidos_lote'),
+
+    # Mudanças de status em tempo real (Server-Sent Events)
+    path('pedidos/eventos/', views.eventos_pedidos, name='eventos_pedidos'),
 
     # Exportar pedido em PDF
     path('pedidos/exportar-pdf/<int:pk>/', views.exportar_pedido_pdf, name='exportar_pedido_pdf'),
+
+    # Exportação de pedidos em lote (PDF único ou ZIP)
+    path('pedidos/exportar-lote/', views.exportar_pedidos_lote, name='exportar_pedidos_lote'),
+    path('pedidos/exportar-lote/<int:pk>/', views.status_exportacao_lote, name='status_exportacao_lote'),
+    path('pedidos/exportar-lote/<int:pk>/download/', views.baixar_exportacao_lote, name='baixar_exportacao_lote'),
 ]
@@ -1,96 +1,109 @@
-import os
-from django.shortcuts import render, redirect, get_object_or_404
-from usuarios.views import is_admin_or_supervisor, is_admin
-from .models import Cliente, Pedido, Produto, ItemPedido
-from django.db.models import Count
-from .forms import ClienteForm, PedidoForm, PedidoUpdateForm
-from django.http import JsonResponse, HttpResponse
+import codecs
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from usuarios.views import is_admin_or_supervisor, is_admin, is_admin_async, is_admin_or_supervisor_async
+from .models import Cliente, Pedido, Produto, ItemPedido, ExportacaoPedidos
+from .forms import ClienteForm, PedidoForm, PedidoUpdateForm, PedidoFiltroForm, PedidoStatusLoteForm
+from .paginacao import paginar_por_id
+from .contadores import obter_contadores
+from .pdf import abrir_pdf, chave_pdf
+from .tarefas import criar_exportacao
+from .importacao import ErroImportacao, importar_csv
+from .busca import buscar as buscar_textos, buscar_clientes as buscar_clientes_texto
+from .condicional import (
+    aversao_produtos, aversoes_catalogo, calcular_etag, com_validadores, pagina_condicional,
+    resposta_nao_modificada, versao_cliente, versao_lista_clientes, versao_pedido,
+)
+from .eventos import cursor_atual as cursor_eventos, cursor_inicial, fluxo as fluxo_eventos, fluxo_disponivel
+from .historico import SEMANAS_PADRAO, linha_do_tempo, tempos_por_etapa
+from .planilhas import (
+    CABECALHO_CLIENTES, CABECALHO_PEDIDOS, linhas_clientes, linhas_pedidos, resposta_planilha,
+)
+from .servicos import (
+    itens_do_post, produtos_do_post, salvar_itens_pedido, sincronizar_produtos, transicionar_status,
+    validar_itens,
+)
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import (
+    JsonResponse, FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_POST
-from weasyprint import HTML
-from django.template.loader import render_to_string
-from django.contrib.staticfiles.finders import find
 from django.contrib.auth.decorators import login_required, user_passes_test
 
-# Dashboard
-@login_required
-def dashboard(request):
-    total_pedidos = Pedido.objects.count()
-    total_clientes = Cliente.objects.count()
+# Quantidade de pedidos por página na listagem
+PEDIDOS_POR_PAGINA = 50
 
-    pedidos_por_status = Pedido.objects.values('status').annotate(count=Count('status'))
-    pedidos_formatados = []
-    for item in pedidos_por_status:
-        item['status_display'] = item['status'].replace('_', ' ').title()
-        pedidos_formatados.append(item)
+# Máximo de pedidos por atualização de status em lote
+MAX_PEDIDOS_STATUS_LOTE = 1000
 
-    context = {
-        'total_pedidos': total_pedidos,
-        'total_clientes': total_clientes,
-        'pedidos_por_status': pedidos_formatados,
-    }
+# Máximo de clientes por requisição ao catálogo de produtos
+MAX_CLIENTES_CATALOGO = 50
+
+# Sugestões do seletor de clientes do formulário de pedido
+LIMITE_BUSCA_CLIENTES = 10
 
+# Dashboard
+@login_required
+def dashboard(request):
+    context = obter_contadores()
+    context['tempos_por_etapa'] = tempos_por_etapa()
+    context['semanas_tempos'] = SEMANAS_PADRAO
     return render(request, 'clientes/dashboard.html', context)
 
 # Lista clientes
 @login_required
 @user_passes_test(is_admin_or_supervisor)
+@pagina_condicional(versao_lista_clientes)
 def lista_clientes(request):
     clientes = Cliente.objects.all()
     return render(request, 'clientes/lista_clientes.html', {
         'clientes': clientes,
-        'is_admin': request.user.groups.filter(name='Administrador').exists() or request.user.is_superuser
+        'is_admin': is_admin(request.user)
     })
 
 # Criar cliente
 @login_required
 @user_passes_test(is_admin)
 def criar_cliente(request):
+    erro = None
     if request.method == 'POST':
         form = ClienteForm(request.POST)
         if form.is_valid():
-            cliente = form.save()
-            for key, value in request.POST.items():
-                if key.startswith('produto-') and key.endswith('-nome_produto'):
-                    index = key.split('-')[1]
-                    nome_produto = value
-                    codigo_barras = request.POST.get(f'produto-{index}-codigo_barras')
-                    numero_processo = request.POST.get(f'produto-{index}-numero_processo')
-                    Produto.objects.create(
-                        cliente=cliente,
-                        nome_produto=nome_produto,
-                        codigo_barras=codigo_barras,
-                        numero_processo=numero_processo
-                    )
-            return redirect('lista_clientes')
+            try:
+                with transaction.atomic():
+                    cliente = form.save()
+                    sincronizar_produtos(cliente, produtos_do_post(request.POST))
+            except ValidationError as e:
+                erro = e.messages[0]
+            else:
+                return redirect('lista_clientes')
     else:
         form = ClienteForm()
     
-    return render(request, 'clientes/form_cliente.html', {'form': form, 'titulo': 'Novo Cliente'})
+    return render(request, 'clientes/form_cliente.html', {'form': form, 'titulo': 'Novo Cliente', 'erro': erro})
 
 # Editar cliente
 @login_required
 @user_passes_test(is_admin)
 def editar_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
+    erro = None
     if request.method == 'POST':
         form = ClienteForm(request.POST, instance=cliente)
         if form.is_valid():
-            cliente = form.save()
-            cliente.produtos.all().delete()
-            for key, value in request.POST.items():
-                if key.startswith('produto-') and key.endswith('-nome_produto'):
-                    index = key.split('-')[1]
-                    nome_produto = value
-                    codigo_barras = request.POST.get(f'produto-{index}-codigo_barras')
-                    numero_processo = request.POST.get(f'produto-{index}-numero_processo')
-                    if nome_produto and codigo_barras and numero_processo:
-                        Produto.objects.create(
-                            cliente=cliente,
-                            nome_produto=nome_produto,
-                            codigo_barras=codigo_barras,
-                            numero_processo=numero_processo
-                        )
-            return redirect('lista_clientes')
+            try:
+                with transaction.atomic():
+                    cliente = form.save()
+                    sincronizar_produtos(cliente, produtos_do_post(request.POST))
+            except ValidationError as e:
+                erro = e.messages[0]
+            else:
+                return redirect('lista_clientes')
     else:
         form = ClienteForm(instance=cliente)
 
@@ -100,8 +113,28 @@ def editar_cliente(request, pk):
         'titulo': 'Editar Cliente',
         'cliente': cliente,
         'produtos_cliente': produtos_cliente,
+        'erro': erro,
     })
 
+# Importar clientes e produtos de CSV
+@login_required
+@user_passes_test(is_admin)
+def importar_clientes(request):
+    relatorio = None
+    erro = None
+    if request.method == 'POST':
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            erro = 'Selecione um arquivo CSV.'
+        else:
+            try:
+                linhas = codecs.iterdecode(arquivo, 'utf-8-sig')
+                relatorio = importar_csv(linhas, dry_run=bool(request.POST.get('dry_run')))
+            except (UnicodeDecodeError, ErroImportacao) as e:
+                erro = str(e) if isinstance(e, ErroImportacao) else 'O arquivo precisa estar em UTF-8.'
+
+    return render(request, 'clientes/importar_clientes.html', {'relatorio': relatorio, 'erro': erro})
+
 # Excluir cliente
 @login_required
 @user_passes_test(is_admin)
@@ -115,26 +148,59 @@ def excluir_cliente(request, pk):
 # Detalhe cliente
 @login_required
 @user_passes_test(is_admin_or_supervisor)
+@pagina_condicional(versao_cliente)
 def detalhe_cliente(request, pk):
-    cliente = get_object_or_404(Cliente, pk=pk)
+    produtos = Produto.objects.only(
+        'cliente', 'nome_produto', 'codigo_barras', 'numero_processo'
+    ).order_by('id')
+    cliente = get_object_or_404(
+        Cliente.objects.only('nome', 'telefone', 'endereco', 'nome_marca')
+        .prefetch_related(Prefetch('produtos', queryset=produtos)),
+        pk=pk,
+    )
     return render(request, 'clientes/detalhe_cliente.html', {'cliente': cliente})
 
+# Busca textual em clientes, produtos e pedidos
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+def buscar(request):
+    consulta = request.GET.get('q', '').strip()
+    resultados = buscar_textos(consulta) if consulta else []
+    return render(request, 'clientes/busca.html', {'consulta': consulta, 'resultados': resultados})
+
 # Lista pedidos
 @login_required
 @user_passes_test(is_admin_or_supervisor)
 def lista_pedidos(request):
-    pedidos = Pedido.objects.all().order_by('-id')
-    pedidos_por_status = Pedido.objects.values('status').annotate(count=Count('status'))
-    pedidos_formatados = []
-    for item in pedidos_por_status:
-        item['status_display'] = item['status'].replace('_', ' ').title()
-        pedidos_formatados.append(item)
-    
+    # Lido antes dos pedidos: o que mudar durante a renderização chega pelo fluxo SSE
+    eventos_ao_vivo = fluxo_disponivel(request)
+    cursor_evento = cursor_eventos() if eventos_ao_vivo else None
+    filtro_form = PedidoFiltroForm(request.GET or None)
+    pedidos = filtro_form.filtrar(Pedido.objects.select_related('cliente'))
+    pagina = paginar_por_id(
+        pedidos,
+        apos=request.GET.get('apos'),
+        antes=request.GET.get('antes'),
+        tamanho=PEDIDOS_POR_PAGINA,
+        campo=filtro_form.campo_ordem,
+    )
+
+    # Mantém os filtros nos links de paginação
+    filtros = request.GET.copy()
+    filtros.pop('apos', None)
+    filtros.pop('antes', None)
+
     context = {
-        'pedidos': pedidos,
-        'pedidos_por_status': pedidos_formatados,
+        'pedidos': pagina['itens'],
+        'proximo_cursor': pagina['proximo_cursor'],
+        'anterior_cursor': pagina['anterior_cursor'],
+        'filtro_form': filtro_form,
+        'filtros_query': filtros.urlencode(),
+        'pedidos_por_status': obter_contadores()['pedidos_por_status'],
         'form': PedidoUpdateForm(),
-        'is_admin': is_admin(request.user)
+        'is_admin': is_admin(request.user),
+        'eventos_ao_vivo': eventos_ao_vivo,
+        'cursor_eventos': cursor_evento.codificar() if cursor_evento else '',
     }
     return render(request, 'clientes/lista_pedidos.html', context)
 
@@ -142,69 +208,72 @@ def lista_pedidos(request):
 @login_required
 @user_passes_test(is_admin)
 def criar_pedido(request):
+    erro = None
+    cliente = None
     if request.method == 'POST':
         cliente_id = request.POST.get('cliente')
-        produtos_dados = []
-        for key, value in request.POST.items():
-            if key.startswith('produto-') and key.endswith('-id'):
-                index = key.split('-')[1]
-                produto_id = value
-                quantidade = request.POST.get(f'produto-{index}-quantidade')
-                produtos_dados.append({'produto_id': produto_id, 'quantidade': quantidade})
-
-        if cliente_id and produtos_dados:
+        itens = itens_do_post(request.POST)
+
+        if cliente_id and itens:
             cliente = get_object_or_404(Cliente, pk=cliente_id)
-            pedido = Pedido.objects.create(cliente=cliente, status='entrada')
-            for item in produtos_dados:
-                produto = get_object_or_404(Produto, pk=item['produto_id'])
-                ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=item['quantidade'])
-            return redirect('lista_pedidos')
-    
-    clientes = Cliente.objects.all()
-    return render(request, 'clientes/form_pedido.html', {'clientes': clientes, 'titulo': 'Novo Pedido'})
+            try:
+                quantidades = validar_itens(cliente, itens)
+            except ValidationError as e:
+                erro = e.messages[0]
+            else:
+                with transaction.atomic():
+                    pedido = Pedido.objects.create(cliente=cliente, status='entrada')
+                    salvar_itens_pedido(pedido, quantidades, novo=True)
+                return redirect('lista_pedidos')
+
+    # O cliente é escolhido pela busca (buscar_clientes), sem carregar todos no formulário
+    return render(request, 'clientes/form_pedido.html', {'cliente': cliente, 'titulo': 'Novo Pedido', 'erro': erro})
 
 # Editar pedido
 @login_required
 @user_passes_test(is_admin)
 def editar_pedido(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(Pedido.objects.select_related('cliente'), pk=pk)
+    cliente = pedido.cliente
+    erro = None
     if request.method == 'POST':
         cliente_id = request.POST.get('cliente')
-        produtos_dados = []
-        for key, value in request.POST.items():
-            if key.startswith('produto-') and key.endswith('-id'):
-                index = key.split('-')[1]
-                produto_id = value
-                quantidade = request.POST.get(f'produto-{index}-quantidade')
-                produtos_dados.append({'produto_id': produto_id, 'quantidade': quantidade})
-
-        if cliente_id:
-            pedido.cliente = get_object_or_404(Cliente, pk=cliente_id)
-            pedido.save()
-
-        pedido.itempedido_set.all().delete()
-        for item in produtos_dados:
-            produto = get_object_or_404(Produto, pk=item['produto_id'])
-            ItemPedido.objects.create(pedido=pedido, produto=produto, quantidade=item['quantidade'])
-
-        return redirect('lista_pedidos')
+        cliente = get_object_or_404(Cliente, pk=cliente_id) if cliente_id else pedido.cliente
+        try:
+            quantidades = validar_itens(cliente, itens_do_post(request.POST))
+        except ValidationError as e:
+            erro = e.messages[0]
+        else:
+            with transaction.atomic():
+                # Salva sempre para atualizar data_atualizacao junto com os itens
+                pedido.cliente = cliente
+                pedido.save(update_fields=['cliente', 'data_atualizacao'])
+                salvar_itens_pedido(pedido, quantidades)
+            return redirect('lista_pedidos')
 
-    clientes = Cliente.objects.all()
-    itens_pedido = pedido.itempedido_set.all()
+    itens_pedido = pedido.itempedido_set.select_related('produto').order_by('id')
     return render(request, 'clientes/form_pedido.html', {
         'titulo': 'Editar Pedido',
-        'clientes': clientes,
+        'cliente': cliente,
         'pedido': pedido,
         'itens_pedido': itens_pedido,
+        'erro': erro,
     })
 
 # Detalhe pedido
 @login_required
 @user_passes_test(is_admin_or_supervisor)
+@pagina_condicional(versao_pedido)
 def detalhe_pedido(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(Pedido.objects.com_itens(), pk=pk)
     form = PedidoUpdateForm(instance=pedido)
-    return render(request, 'clientes/detalhe_pedido.html', {'pedido': pedido, 'form': form})
+    return render(request, 'clientes/detalhe_pedido.html', {
+        'pedido': pedido,
+        'form': form,
+        'linha_do_tempo': linha_do_tempo(pedido),
+        'tempos_cliente': tempos_por_etapa(cliente=pedido.cliente),
+        'semanas_tempos': SEMANAS_PADRAO,
+    })
 
 # Excluir pedido
 @login_required
@@ -216,36 +285,240 @@ def excluir_pedido(request, pk):
         return redirect('lista_pedidos')
     return render(request, 'clientes/confirmar_exclusao.html', {'objeto': pedido, 'tipo': 'Pedido'})
 
-# Atualizar status do pedido
+# Atualizar status do pedido (async: não ocupa uma thread sob ASGI)
 @login_required
-@user_passes_test(is_admin)
+@user_passes_test(is_admin_async)
 @require_POST
-def atualizar_status_pedido(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
+async def atualizar_status_pedido(request, pk):
+    pedido = await aget_object_or_404(Pedido, pk=pk)
     form = PedidoUpdateForm(request.POST, instance=pedido)
     if form.is_valid():
-        form.save()
+        form.instance._usuario_alteracao = await request.auser()
+        await form.instance.asave(
+            update_fields=['status', 'numero_rastreio', 'nome_transportadora', 'data_atualizacao', 'data_status']
+        )
         return JsonResponse({'success': True, 'message': 'Status atualizado com sucesso!'})
     return JsonResponse({'success': False, 'message': 'Erro ao atualizar o status.'}, status=400)
 
-# Produtos de um cliente (API)
+# Fluxo de mudanças de status para a lista de pedidos (SSE, ver clientes/eventos.py)
+@login_required
+@user_passes_test(is_admin_or_supervisor_async)
+async def eventos_pedidos(request):
+    if not fluxo_disponivel(request):
+        # Sob WSGI o fluxo prenderia uma thread sem entregar nada (ver clientes/eventos.py)
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(
+        fluxo_eventos(await cursor_inicial(request)), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evita que o nginx acumule os eventos em buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Atualizar status de vários pedidos de uma vez
+@login_required
+@user_passes_test(is_admin)
+@require_POST
+def atualizar_status_pedidos_lote(request):
+    form = PedidoStatusLoteForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'message': 'Status ou dados de envio inválidos.'}, status=400)
+    try:
+        ids = list(dict.fromkeys(int(pedido_id) for pedido_id in request.POST.getlist('ids')))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Lista de pedidos inválida.'}, status=400)
+    if not ids:
+        return JsonResponse({'success': False, 'message': 'Selecione ao menos um pedido.'}, status=400)
+    if len(ids) > MAX_PEDIDOS_STATUS_LOTE:
+        return JsonResponse({
+            'success': False,
+            'message': f'Selecione no máximo {MAX_PEDIDOS_STATUS_LOTE} pedidos por vez.',
+        }, status=400)
+
+    resultados = transicionar_status(ids, usuario=request.user, **form.cleaned_data)
+    atualizados = sum(1 for resultado in resultados.values() if resultado['success'])
+    return JsonResponse({
+        'success': atualizados > 0,
+        'message': f'{atualizados} de {len(ids)} pedidos atualizados.',
+        'status': form.cleaned_data['status'],
+        'resultados': [{'id': pedido_id, **resultado} for pedido_id, resultado in resultados.items()],
+    })
+
+# Produtos de um cliente (API, async)
+@login_required
+@user_passes_test(is_admin_or_supervisor_async)
+async def produtos_por_cliente(request, pk):
+    if not await Cliente.objects.filter(pk=pk).aexists():
+        raise Http404('Cliente não encontrado.')
+
+    # O navegador revalida a lista guardada e recebe 304 se nada mudou
+    ultima_modificacao, etag = await aversao_produtos(pk)
+    nao_modificado = resposta_nao_modificada(request, etag, ultima_modificacao)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    produtos = [
+        produto async for produto in Produto.objects.filter(cliente_id=pk).values('id', 'nome_produto')
+    ]
+    return com_validadores(JsonResponse(produtos, safe=False), etag, ultima_modificacao)
+
+# Catálogo de produtos de vários clientes (API, async)
+@login_required
+@user_passes_test(is_admin_or_supervisor_async)
+async def catalogo_produtos(request):
+    # ?clientes=1,2,3; o formulário de pedido guarda cada catálogo no localStorage
+    # com a versão recebida e revalida enviando as versões em If-None-Match
+    try:
+        clientes_ids = list(dict.fromkeys(
+            int(valor) for valor in request.GET.get('clientes', '').split(',') if valor.strip()
+        ))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Lista de clientes inválida.'}, status=400)
+    if not clientes_ids or len(clientes_ids) > MAX_CLIENTES_CATALOGO:
+        return JsonResponse({
+            'success': False, 'message': f'Informe de 1 a {MAX_CLIENTES_CATALOGO} clientes.',
+        }, status=400)
+
+    versoes = await aversoes_catalogo(clientes_ids)
+    # Com um cliente o ETag é a própria versão, o que permite 304 a partir da cópia guardada
+    etag = versoes[clientes_ids[0]] if len(clientes_ids) == 1 else calcular_etag(*versoes.values())
+    nao_modificado = resposta_nao_modificada(request, etag)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    # Catálogos cuja versão o navegador já tem vão sem os produtos
+    conhecidas = set(parse_etags(request.headers.get('If-None-Match', '')))
+    catalogo = {
+        cliente_id: {'versao': versao, 'nao_modificado': True} if versao in conhecidas
+        else {'versao': versao, 'produtos': []}
+        for cliente_id, versao in versoes.items()
+    }
+    alterados = [cliente_id for cliente_id, dados in catalogo.items() if 'produtos' in dados]
+    if alterados:
+        async for produto in Produto.objects.filter(cliente_id__in=alterados).values(
+            'id', 'cliente_id', 'nome_produto'
+        ):
+            catalogo[produto.pop('cliente_id')]['produtos'].append(produto)
+    return com_validadores(JsonResponse({'clientes': catalogo}), etag)
+
+# Busca de clientes para os seletores do formulário e do filtro de pedidos (API)
 @login_required
 @user_passes_test(is_admin_or_supervisor)
-def produtos_por_cliente(request, pk):
-    cliente = get_object_or_404(Cliente, pk=pk)
-    produtos = cliente.produtos.values('id', 'nome_produto')
-    return JsonResponse(list(produtos), safe=False)
+def buscar_clientes(request):
+    consulta = request.GET.get('q', '').strip()
+    clientes = buscar_clientes_texto(consulta, LIMITE_BUSCA_CLIENTES) if consulta else []
+    return JsonResponse([{'id': pk, 'nome_marca': nome} for pk, nome in clientes], safe=False)
 
 # Exportar pedido PDF
 @login_required
 @user_passes_test(is_admin_or_supervisor)
 def exportar_pedido_pdf(request, pk):
-    pedido = get_object_or_404(Pedido, pk=pk)
-    logo_path = find('images/logo.png')
-    logo_url = 'file:///' + os.path.normpath(logo_path)
-    contexto = {'pedido': pedido, 'logo_url': logo_url}
-    html_string = render_to_string('clientes/pedido_pdf.html', contexto)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="pedido_{pedido.id}.pdf"'
-    HTML(string=html_string).write_pdf(response)
+    pedido = get_object_or_404(Pedido.objects.com_itens(), pk=pk)
+    chave = chave_pdf(pedido)
+    etag = f'"{chave}"'
+
+    # Navegador já tem esta versão do PDF
+    nao_modificado = get_conditional_response(request, etag=etag)
+    if nao_modificado is not None:
+        nao_modificado['ETag'] = etag
+        return nao_modificado
+
+    response = FileResponse(
+        abrir_pdf(pedido, chave),
+        as_attachment=True,
+        filename=f'pedido_{pedido.id}.pdf',
+        content_type='application/pdf',
+    )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
+
+# Exportar pedidos em lote (processado em segundo plano)
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+@require_POST
+def exportar_pedidos_lote(request):
+    formato = request.POST.get('formato', 'zip')
+    if formato not in dict(ExportacaoPedidos.FORMATO_CHOICES):
+        return JsonResponse({'success': False, 'message': 'Formato inválido.'}, status=400)
+
+    limite = settings.EXPORTACAO_MAX_PEDIDOS
+    ids = request.POST.getlist('ids')
+    if ids:
+        try:
+            ids = [int(pedido_id) for pedido_id in ids]
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Lista de pedidos inválida.'}, status=400)
+        pedidos = Pedido.objects.filter(id__in=ids)
+    else:
+        filtro_form = PedidoFiltroForm(request.POST)
+        if not filtro_form.is_valid():
+            return JsonResponse({'success': False, 'message': 'Filtros inválidos.'}, status=400)
+        pedidos = filtro_form.filtrar(Pedido.objects.all())
+
+    ids = list(pedidos.order_by('-id').values_list('id', flat=True)[:limite + 1])
+    if not ids:
+        return JsonResponse({'success': False, 'message': 'Nenhum pedido encontrado para exportar.'}, status=400)
+    if len(ids) > limite:
+        return JsonResponse({
+            'success': False,
+            'message': f'Selecione no máximo {limite} pedidos por exportação.',
+        }, status=400)
+
+    exportacao = criar_exportacao(request.user, ids, formato)
+    return JsonResponse({
+        'success': True,
+        'message': f'Exportação de {exportacao.total} pedidos iniciada.',
+        'id': exportacao.pk,
+        'url_status': reverse('status_exportacao_lote', args=[exportacao.pk]),
+    }, status=202)
+
+# Progresso de uma exportação em lote
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+def status_exportacao_lote(request, pk):
+    exportacao = get_object_or_404(ExportacaoPedidos, pk=pk, usuario=request.user)
+    dados = {
+        'id': exportacao.pk,
+        'status': exportacao.status,
+        'status_display': exportacao.get_status_display(),
+        'total': exportacao.total,
+        'concluidos': exportacao.concluidos,
+        'erro': exportacao.erro,
+    }
+    if exportacao.status == 'concluida':
+        dados['url_download'] = reverse('baixar_exportacao_lote', args=[exportacao.pk])
+    return JsonResponse(dados)
+
+# Download do arquivo de uma exportação em lote
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+def baixar_exportacao_lote(request, pk):
+    exportacao = get_object_or_404(ExportacaoPedidos, pk=pk, usuario=request.user, status='concluida')
+    try:
+        arquivo = open(exportacao.arquivo, 'rb')
+    except FileNotFoundError:
+        raise Http404('Arquivo da exportação não encontrado.')
+    content_type = 'application/pdf' if exportacao.formato == 'pdf' else 'application/zip'
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=f'pedidos_{exportacao.pk}.{exportacao.formato}',
+        content_type=content_type,
+    )
+
+# Exportar pedidos em planilha (CSV/XLSX), respeitando os filtros da listagem
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+def exportar_pedidos(request, formato):
+    filtro_form = PedidoFiltroForm(request.GET or None)
+    if filtro_form.is_bound and not filtro_form.is_valid():
+        return HttpResponseBadRequest('Filtros inválidos.')
+    pedidos = filtro_form.filtrar(Pedido.objects.all())
+    return resposta_planilha(request, formato, 'pedidos', CABECALHO_PEDIDOS, linhas_pedidos(pedidos))
+
+# Exportar clientes e produtos em planilha (CSV/XLSX)
+@login_required
+@user_passes_test(is_admin_or_supervisor)
+def exportar_clientes(request, formato):
+    return resposta_planilha(request, formato, 'clientes', CABECALHO_CLIENTES, linhas_clientes(Cliente.objects.all()))
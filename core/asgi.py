@@ -3,6 +3,38 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Modo ASGI (uvicorn)
+-------------------
+As views JSON mais acessadas (``atualizar_status_pedido`` e
+``produtos_por_cliente``) são assíncronas, assim como o middleware de
+grupos. Sob ASGI elas esperam o banco sem ocupar uma thread; as demais
+views continuam síncronas e o Django as executa em threads. O fluxo de
+mudanças de status da lista de pedidos (``eventos_pedidos``, Server-Sent
+Events) mantém uma conexão aberta por aba; sob ASGI ela não ocupa thread
+enquanto espera. Para servir com uvicorn::
+
+    pip install uvicorn
+    python manage.py collectstatic --noinput
+    DB_CONN_MAX_AGE=0 uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+Respostas em streaming com iterador síncrono são lidas inteiras pelo Django
+antes do envio sob uvicorn (com o aviso "StreamingHttpResponse must consume
+synchronous iterators"). As exportações CSV/XLSX detectam o ASGI e entregam
+um iterador assíncrono (``clientes/planilhas.py``), então seguem em blocos.
+Continuam em memória antes do envio: as listagens da API
+(``clientes/api.py``, limitadas a ``API_LIMITE_MAXIMO`` registros por
+página) e os downloads de arquivo (``FileResponse`` do PDF de pedido e das
+exportações em lote).
+
+Conexões persistentes não devem ser usadas sob ASGI (cada requisição
+síncrona pode rodar em uma thread diferente), por isso ``DB_CONN_MAX_AGE=0``.
+Com PostgreSQL (``DB_ENGINE=postgresql``) o pool de conexões já cumpre esse
+papel. Os arquivos estáticos precisam ser servidos pelo proxy (nginx etc.).
+
+O WeasyPrint é carregado na primeira exportação de PDF. Com ``PDF_AQUECER=1``
+cada worker o carrega ao subir (ver ``clientes/pdf.py``); o comando
+``manage.py benchmark_inicializacao`` mede o tempo e a memória de cada opção.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +46,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PDF_AQUECER:
+    from clientes.pdf import aquecer
+    aquecer()
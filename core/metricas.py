@@ -0,0 +1,270 @@
+# core/metricas.py
+
+# Métricas Prometheus por view.
+#
+# O MetricasMiddleware mede, para cada requisição, a latência, o número e o
+# tempo das consultas SQL e o tamanho da resposta, rotulados pelo nome da
+# URL (resolver_match.view_name). As consultas são contadas por um
+# execute_wrapper instalado em toda conexão nova (sinal connection_created)
+# que soma no objeto guardado em um ContextVar: assim as consultas feitas
+# em threads de sync_to_async pelas views assíncronas também entram na
+# conta da requisição. O tempo de renderização do WeasyPrint é medido por
+# medir_pdf() em clientes/pdf.py.
+#
+# Em respostas em streaming (exportações, API, SSE) o corpo é gerado depois
+# que a view retorna: o middleware acompanha o envio e só registra latência,
+# consultas e tamanho quando o corpo termina (ou o cliente desconecta).
+# Respostas com Content-Length (FileResponse) são registradas na hora, para
+# não perder o envio direto do arquivo pelo servidor, assim como os fluxos
+# SSE (text/event-stream): ficam abertos indefinidamente e só a abertura é
+# medida, sem o tamanho do corpo.
+#
+# Requisições acima de METRICAS_ORCAMENTO_CONSULTAS consultas ou de
+# METRICAS_ORCAMENTO_SEGUNDOS segundos geram um aviso no log.
+#
+# As métricas são expostas em /metrics. Em produção (DEBUG desligado) o
+# acesso exige METRICAS_TOKEN no cabeçalho "Authorization: Bearer <token>":
+# atrás de um proxy local toda requisição chega de 127.0.0.1, então o IP não
+# serve de autorização. Só com DEBUG ligado e sem token os IPs de
+# METRICAS_IPS_PERMITIDOS são aceitos. Com vários processos (ex.:
+# uvicorn --workers) defina PROMETHEUS_MULTIPROC_DIR para agregar os valores.
+
+import hmac
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+BALDES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BALDES_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+LATENCIA = Histogram(
+    'cct_requisicao_duracao_segundos', 'Latência das requisições por view.', ['view', 'metodo', 'status']
+)
+CONSULTAS = Histogram(
+    'cct_requisicao_consultas_sql', 'Consultas SQL por requisição.', ['view'], buckets=BALDES_CONSULTAS
+)
+TEMPO_SQL = Histogram(
+    'cct_requisicao_sql_segundos', 'Tempo gasto em consultas SQL por requisição.', ['view']
+)
+TAMANHO_RESPOSTA = Histogram(
+    'cct_resposta_bytes', 'Tamanho do corpo das respostas por view.', ['view'], buckets=BALDES_BYTES
+)
+TEMPO_PDF = Histogram(
+    'cct_pdf_renderizacao_segundos', 'Tempo de renderização do WeasyPrint por etapa (layout ou escrita).',
+    ['view', 'etapa'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+ACIMA_DO_ORCAMENTO = Counter(
+    'cct_requisicoes_acima_do_orcamento', 'Requisições acima do orçamento de consultas ou latência.',
+    ['view', 'motivo'],
+)
+
+SEM_VIEW = '<sem_view>'
+_FIM = object()
+
+
+class _Medicao:
+    __slots__ = ('consultas', 'segundos_sql', 'view')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.view = SEM_VIEW
+
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.consultas += 1
+        medicao.segundos_sql += time.perf_counter() - inicio
+
+
+def _instalar_wrapper(sender, connection, **kwargs):
+    if _contar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar_consulta)
+
+
+connection_created.connect(_instalar_wrapper, dispatch_uid='core.metricas.contar_consultas')
+
+# Conexões já abertas antes deste módulo ser carregado (ex.: nos testes)
+for _conexao in connections.all(initialized_only=True):
+    _instalar_wrapper(None, _conexao)
+
+
+def _rotulo_view(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else SEM_VIEW
+
+
+@contextmanager
+def medir_pdf(etapa):
+    """Mede uma etapa da renderização de PDF, rotulada pela view da requisição atual."""
+    medicao = _medicao_atual.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        view = medicao.view if medicao else SEM_VIEW
+        TEMPO_PDF.labels(view, etapa).observe(time.perf_counter() - inicio)
+
+
+class MetricasMiddleware:
+    """Registra latência, consultas SQL e tamanho da resposta de cada requisição.
+
+    Deve ficar no início de MIDDLEWARE para que o tempo dos demais
+    middlewares também seja contado.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        self._registrar(request, response, medicao, inicio)
+        return response
+
+    async def __acall__(self, request):
+        medicao = _Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        self._registrar(request, response, medicao, inicio)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Já resolvida a URL, o rótulo fica disponível para medir_pdf()
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            medicao.view = _rotulo_view(request)
+
+    def _registrar(self, request, response, medicao, inicio):
+        if not response.streaming:
+            self._finalizar(request, response, medicao, inicio, len(response.content))
+        elif response.has_header('Content-Length'):
+            self._finalizar(request, response, medicao, inicio, int(response['Content-Length']))
+        elif response.get('Content-Type', '').startswith('text/event-stream'):
+            self._finalizar(request, response, medicao, inicio, None)
+        elif response.is_async:
+            response.streaming_content = self._aacompanhar(
+                request, response, medicao, inicio, aiter(response.streaming_content)
+            )
+        else:
+            response.streaming_content = self._acompanhar(
+                request, response, medicao, inicio, iter(response.streaming_content)
+            )
+
+    def _acompanhar(self, request, response, medicao, inicio, conteudo):
+        # As consultas feitas ao gerar cada bloco entram na medição da requisição
+        total = 0
+        try:
+            while True:
+                token = _medicao_atual.set(medicao)
+                try:
+                    parte = next(conteudo, _FIM)
+                finally:
+                    _medicao_atual.reset(token)
+                if parte is _FIM:
+                    break
+                total += len(parte)
+                yield parte
+        finally:
+            self._finalizar(request, response, medicao, inicio, total)
+
+    async def _aacompanhar(self, request, response, medicao, inicio, conteudo):
+        total = 0
+        try:
+            while True:
+                token = _medicao_atual.set(medicao)
+                try:
+                    parte = await anext(conteudo, _FIM)
+                finally:
+                    _medicao_atual.reset(token)
+                if parte is _FIM:
+                    break
+                total += len(parte)
+                yield parte
+        finally:
+            self._finalizar(request, response, medicao, inicio, total)
+
+    def _finalizar(self, request, response, medicao, inicio, tamanho):
+        duracao = time.perf_counter() - inicio
+        view = _rotulo_view(request)
+        LATENCIA.labels(view, request.method, response.status_code).observe(duracao)
+        CONSULTAS.labels(view).observe(medicao.consultas)
+        TEMPO_SQL.labels(view).observe(medicao.segundos_sql)
+        if tamanho is not None:
+            TAMANHO_RESPOSTA.labels(view).observe(tamanho)
+
+        orcamento_consultas = getattr(settings, 'METRICAS_ORCAMENTO_CONSULTAS', None)
+        orcamento_segundos = getattr(settings, 'METRICAS_ORCAMENTO_SEGUNDOS', None)
+        if orcamento_consultas is not None and medicao.consultas > orcamento_consultas:
+            ACIMA_DO_ORCAMENTO.labels(view, 'consultas').inc()
+            logger.warning(
+                '%s %s (%s) fez %d consultas SQL (%.0f ms); orçamento: %d',
+                request.method, request.path, view, medicao.consultas, medicao.segundos_sql * 1000,
+                orcamento_consultas,
+            )
+        if orcamento_segundos is not None and duracao > orcamento_segundos:
+            ACIMA_DO_ORCAMENTO.labels(view, 'latencia').inc()
+            logger.warning(
+                '%s %s (%s) levou %.0f ms (%.0f ms em %d consultas SQL); orçamento: %.0f ms',
+                request.method, request.path, view, duracao * 1000, medicao.segundos_sql * 1000,
+                medicao.consultas, orcamento_segundos * 1000,
+            )
+
+
+def _autorizado(request):
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if token:
+        cabecalho = request.headers.get('Authorization', '')
+        return hmac.compare_digest(cabecalho.encode(), f'Bearer {token}'.encode())
+    return settings.DEBUG and request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICAS_IPS_PERMITIDOS', ())
+
+
+# Endpoint lido pelo Prometheus
+def metricas(request):
+    if not _autorizado(request):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return HttpResponse(generate_latest(registro), content_type=CONTENT_TYPE_LATEST)
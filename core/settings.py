@@ -43,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'usuarios.middleware.GruposUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,12 +77,55 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Por padrão usa SQLite ajustado para acessos concorrentes: WAL (leitores não
+# bloqueiam o escritor), synchronous=NORMAL, cache de páginas e mmap maiores,
+# espera de até DB_TIMEOUT segundos por locks e transações IMMEDIATE, que
+# reservam o lock de escrita no BEGIN em vez de falhar ao promover uma
+# leitura para escrita ("database is locked").
+#
+# Com DB_ENGINE=postgresql usa PostgreSQL com pool de conexões do psycopg 3.
+
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'cct'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # O pool já reaproveita as conexões; CONN_MAX_AGE precisa ficar em 0
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': int(os.environ.get('DB_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-32000;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -133,4 +178,74 @@ LOGIN_URL = '/conta/login/'
 
 # Para onde o usuário vai após o login
 LOGIN_REDIRECT_URL = '/dashboard/'  # ajuste se seu dashboard tiver outra URL
-LOGOUT_REDIRECT_URL = '/conta/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/conta/login/'
+
+# Cache compartilhado por todos os workers. Guarda a versão dos grupos de
+# cada usuário (usuarios/grupos.py), que precisa ser a mesma em todos os
+# processos: com o LocMemCache padrão, cada worker teria a sua cópia e um
+# perfil removido continuaria valendo nos demais. Com REDIS_URL usa o
+# Redis; senão, uma tabela no próprio banco. A tabela não faz parte das
+# migrações: no deploy, rode "python manage.py createcachetable" junto com
+# o migrate (o banco de testes já a cria sozinho). Ver também
+# usuarios/checks.py.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cct_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+# Intervalo (em segundos) para recontagem completa dos contadores do dashboard.
+# Entre recontagens, os valores são ajustados pelos sinais de Pedido/Cliente.
+CONTADORES_RECONCILIACAO_SEGUNDOS = 300
+
+# Cache em disco dos PDFs de pedido (ver clientes/pdf.py)
+PDF_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'pdf')
+PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Carrega o WeasyPrint ao subir o worker em vez de na primeira requisição de PDF
+PDF_AQUECER = os.environ.get('PDF_AQUECER') == '1'
+
+# Fluxo SSE de mudanças de status (ver clientes/eventos.py): intervalo de
+# consulta por novos eventos e duração máxima de cada conexão, em segundos
+EVENTOS_PEDIDOS_INTERVALO = 5
+EVENTOS_PEDIDOS_DURACAO = 300
+# Ids abaixo do último enviado que ainda são esperados (commits fora de
+# ordem); maior que o lote de status (MAX_PEDIDOS_STATUS_LOTE)
+EVENTOS_PEDIDOS_JANELA_IDS = 2000
+
+# API de leitura para integrações (ver clientes/api.py). Tokens aceitos no
+# cabeçalho "Authorization: Bearer <token>", separados por vírgula no ambiente
+API_TOKENS = [token for token in os.environ.get('API_TOKENS', '').split(',') if token]
+API_LIMITE_PADRAO = 500
+API_LIMITE_MAXIMO = 5000
+
+# Arquivos gerados pelas exportações em lote (ver clientes/tarefas.py)
+EXPORTACOES_DIR = os.path.join(BASE_DIR, 'cache', 'exportacoes')
+EXPORTACAO_MAX_PEDIDOS = 500
+# Job sem progresso por este tempo volta para a fila (worker interrompido)
+EXPORTACAO_TEMPO_LIMITE_SEGUNDOS = 15 * 60
+EXPORTACAO_MAX_TENTATIVAS = 3
+# Arquivos e jobs encerrados são apagados depois deste prazo
+EXPORTACAO_VALIDADE_HORAS = 24
+
+# Os formulários de cliente e pedido enviam 3-4 campos por produto/item;
+# o limite padrão (1000) barraria clientes com algumas centenas de SKUs.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
+# Métricas Prometheus em /metrics (ver core/metricas.py). Requisições acima
+# dos orçamentos abaixo geram um aviso no log (None desativa o limite).
+METRICAS_ORCAMENTO_CONSULTAS = int(os.environ.get('METRICAS_ORCAMENTO_CONSULTAS', 50))
+METRICAS_ORCAMENTO_SEGUNDOS = float(os.environ.get('METRICAS_ORCAMENTO_SEGUNDOS', 1.0))
+# Com DEBUG desligado, /metrics só responde com o token; os IPs abaixo
+# valem apenas em desenvolvimento
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+METRICAS_IPS_PERMITIDOS = ['127.0.0.1', '::1']
@@ -0,0 +1,146 @@
+# core/testes.py
+
+# Utilitários compartilhados pelos testes dos apps: criação de usuários por
+# papel, leitura de respostas em streaming e o orçamento de consultas e
+# tempo por rota (OrcamentoRotasMixin).
+
+import os
+import time
+from functools import lru_cache
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from usuarios.grupos import versao_grupos
+
+# Tempo máximo por requisição nos testes de orçamento; máquinas lentas de CI
+# podem aumentar com a variável de ambiente ORCAMENTO_SEGUNDOS_TESTES
+ORCAMENTO_SEGUNDOS = float(os.environ.get('ORCAMENTO_SEGUNDOS_TESTES', 2.0))
+
+# Sem REDIS_URL, a versão dos grupos do usuário (usuarios/grupos.py) fica no
+# DatabaseCache: uma leitura a mais por requisição autenticada, que não entra
+# no orçamento de cada rota porque sai do banco quando o Redis é usado. A
+# criação da versão, feita uma vez após cada alteração de grupos, é paga
+# antes da medição.
+CONSULTAS_VERSAO_GRUPOS = 1
+
+
+def criar_usuario(username, grupo=None, senha='senha'):
+    """Cria um usuário no grupo informado ('Administrador', 'Supervisão')."""
+    usuario = User.objects.create_user(username=username, password=senha)
+    if grupo:
+        usuario.groups.add(Group.objects.get_or_create(name=grupo)[0])
+    return usuario
+
+
+def consumir(resposta):
+    """Lê o corpo de uma resposta em streaming, síncrona ou assíncrona."""
+    if resposta.is_async:
+        async def ler():
+            return b''.join([parte async for parte in resposta.streaming_content])
+        conteudo = async_to_sync(ler)()
+    else:
+        conteudo = b''.join(resposta.streaming_content)
+    resposta.close()
+    return conteudo
+
+
+@lru_cache(maxsize=None)
+def weasyprint_disponivel():
+    try:
+        from weasyprint import HTML
+        HTML(string='<p>teste</p>').write_pdf()
+    except Exception:
+        return False
+    return True
+
+
+class OrcamentoRotasMixin:
+    """Percorre uma tabela de rotas medindo consultas SQL e tempo de resposta.
+
+    Cada rota é um dicionário com nome, args, método, dados, o máximo de
+    consultas e o status esperado para cada papel ('admin' e 'supervisor').
+    As rotas são percorridas duas vezes, antes e depois de ampliar_dados:
+    o número de consultas de cada uma precisa ser o mesmo nas duas escalas,
+    o que pega um N+1 mesmo abaixo do limite. Rotas que leem os registros
+    em blocos (exportações) são marcadas com 'por_bloco' e ficam fora dessa
+    comparação. Rotas marcadas com 'asgi' são pedidas pelo AsyncClient e
+    rotas marcadas com 'weasyprint' são puladas quando o WeasyPrint não
+    consegue gerar PDFs no ambiente.
+    """
+
+    urlconf = None
+
+    def rotas(self, papel):
+        """Tabela de rotas medidas para o papel."""
+
+    def ampliar_dados(self):
+        """Acrescenta registros ao banco antes da segunda passada pelas rotas."""
+
+    def preparar_passada(self):
+        """Desfaz efeitos fora do banco (ex.: arquivos em cache) entre as passadas."""
+
+    def medir(self, metodo, url, dados, asgi=False):
+        pedir = getattr(self.client, metodo)
+        if asgi:
+            # Mesma sessão do Client, com os grupos do usuário já carregados
+            self.async_client.cookies = self.client.cookies
+            pedir = async_to_sync(getattr(self.async_client, metodo))
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = pedir(url, dados)
+            if resposta.streaming:
+                # Exportações geram as linhas enquanto a resposta é enviada
+                consumir(resposta)
+        return resposta, consultas, time.perf_counter() - inicio
+
+    def percorrer_rotas(self, papel, usuario, escala):
+        """Mede as rotas e retorna o número de consultas de cada uma."""
+        self.preparar_passada()
+        contagens = {}
+        for indice, rota in enumerate(self.rotas(papel)):
+            metodo = rota.get('metodo', 'get')
+            with self.subTest(rota=rota['nome'], metodo=metodo, papel=papel, escala=escala):
+                if rota.get('weasyprint') and not weasyprint_disponivel():
+                    self.skipTest('WeasyPrint indisponível neste ambiente')
+                self.client.force_login(usuario)
+                versao_grupos(usuario.pk)
+                url = reverse(rota['nome'], args=rota.get('args', ()))
+                resposta, consultas, segundos = self.medir(
+                    metodo, url, rota.get('dados', {}), asgi=rota.get('asgi', False)
+                )
+                contagens[indice] = [consulta['sql'] for consulta in consultas.captured_queries]
+                self.assertEqual(resposta.status_code, rota[papel])
+                self.assertLessEqual(
+                    len(consultas), rota['consultas'] + CONSULTAS_VERSAO_GRUPOS, '\n'.join(contagens[indice])
+                )
+                self.assertLess(segundos, rota.get('segundos', ORCAMENTO_SEGUNDOS))
+        return contagens
+
+    def verificar_rotas(self, papel, usuario):
+        # Cada passada roda numa transação desfeita ao final, para que as
+        # duas partam do mesmo estado (rotas POST criam e excluem registros)
+        with transaction.atomic():
+            antes = self.percorrer_rotas(papel, usuario, 'base')
+            transaction.set_rollback(True)
+        with transaction.atomic():
+            self.ampliar_dados()
+            depois = self.percorrer_rotas(papel, usuario, 'ampliada')
+            transaction.set_rollback(True)
+
+        for indice, rota in enumerate(self.rotas(papel)):
+            if indice in antes and indice in depois and not rota.get('por_bloco'):
+                with self.subTest(rota=rota['nome'], metodo=rota.get('metodo', 'get'), papel=papel):
+                    self.assertEqual(
+                        len(depois[indice]), len(antes[indice]),
+                        'Consultas mudaram com o volume de dados:\n' + '\n'.join(depois[indice]),
+                    )
+
+    def test_todas_as_rotas_no_orcamento(self):
+        nomes = {
+            padrao.name for padrao in get_resolver(self.urlconf).url_patterns if padrao.name
+        }
+        self.assertEqual(nomes - {rota['nome'] for rota in self.rotas('admin')}, set())
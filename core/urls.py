@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 
+from core.metricas import metricas
+
 # Redireciona a raiz para a página de login
 def redirect_to_login(request):
     return redirect('login')  # 'login' deve estar definido em usuarios/urls.py
@@ -11,4 +13,5 @@ urlpatterns = [
     path('', redirect_to_login),  # Acesso à raiz vai para login
     path('conta/', include('usuarios.urls')),  # Rotas do app usuários
     path('clientes/', include('clientes.urls')),  # Rotas do app clientes
+    path('metrics', metricas, name='metricas'),  # Coletado pelo Prometheus
 ]
@@ -0,0 +1,134 @@
+// static/js/seletor_clientes.js
+
+// Seletor de clientes com sugestões pela busca (view buscar_clientes): um
+// campo de texto para digitar e um campo oculto com o id escolhido. Nenhuma
+// página carrega a lista completa de clientes.
+//
+// opcoes:
+//   campoId, campoBusca, lista  elementos do campo oculto, do texto e da lista
+//   url                         endereço de buscar_clientes
+//   classeItem, classeAtiva     classes das sugestões (normal e marcada)
+//   permitirVazio               apagar o texto limpa a escolha (filtros)
+//   aoSelecionar(id, nome)      chamada quando a escolha muda
+//   aoMostrar(clientes)         chamada a cada lista de sugestões exibida
+function seletorClientes(opcoes) {
+    const {campoId, campoBusca, lista, url} = opcoes;
+    const classeItem = opcoes.classeItem || 'hover:bg-gray-50';
+    const classeAtiva = opcoes.classeAtiva || 'bg-gray-100';
+    const sugestoesPorTermo = new Map();
+    let nomeSelecionado = campoBusca.value;
+    let buscaEmAndamento = null;
+    let esperaDigitacao = null;
+    let sugestaoAtiva = -1;
+
+    function fechar() {
+        lista.classList.add('hidden');
+        campoBusca.setAttribute('aria-expanded', 'false');
+        sugestaoAtiva = -1;
+    }
+
+    function selecionar(id, nome) {
+        const mudou = campoId.value !== String(id);
+        campoId.value = id;
+        campoBusca.value = nomeSelecionado = nome;
+        fechar();
+        if (mudou && opcoes.aoSelecionar) opcoes.aoSelecionar(String(id), nome);
+    }
+
+    function marcar(indice) {
+        const itens = lista.querySelectorAll('[data-id]');
+        if (!itens.length) return;
+        sugestaoAtiva = (indice + itens.length) % itens.length;
+        itens.forEach((item, i) => item.classList.toggle(classeAtiva, i === sugestaoAtiva));
+        itens[sugestaoAtiva].scrollIntoView({block: 'nearest'});
+    }
+
+    function mostrar(clientes) {
+        lista.innerHTML = '';
+        sugestaoAtiva = -1;
+        if (!clientes.length) {
+            const li = document.createElement('li');
+            li.className = 'px-3 py-2 text-gray-500';
+            li.textContent = 'Nenhum cliente encontrado.';
+            lista.appendChild(li);
+        }
+        clientes.forEach(cliente => {
+            const li = document.createElement('li');
+            li.className = `px-3 py-2 cursor-pointer ${classeItem}`;
+            li.setAttribute('role', 'option');
+            li.dataset.id = cliente.id;
+            li.textContent = cliente.nome_marca;
+            lista.appendChild(li);
+        });
+        lista.classList.remove('hidden');
+        campoBusca.setAttribute('aria-expanded', 'true');
+        if (opcoes.aoMostrar) opcoes.aoMostrar(clientes);
+    }
+
+    function buscar(termo) {
+        if (buscaEmAndamento) buscaEmAndamento.abort();
+        if (sugestoesPorTermo.has(termo)) {
+            mostrar(sugestoesPorTermo.get(termo));
+            return;
+        }
+        buscaEmAndamento = new AbortController();
+        fetch(`${url}?q=${encodeURIComponent(termo)}`, {signal: buscaEmAndamento.signal})
+            .then(response => response.json())
+            .then(clientes => {
+                sugestoesPorTermo.set(termo, clientes);
+                if (campoBusca.value.trim() === termo) mostrar(clientes);
+            })
+            .catch(erro => {
+                if (erro.name !== 'AbortError') fechar();
+            });
+    }
+
+    campoBusca.addEventListener('input', function() {
+        clearTimeout(esperaDigitacao);
+        const termo = this.value.trim();
+        if (termo.length < 2) {
+            fechar();
+            return;
+        }
+        esperaDigitacao = setTimeout(() => buscar(termo), 200);
+    });
+
+    campoBusca.addEventListener('keydown', function(e) {
+        const aberta = !lista.classList.contains('hidden');
+        if (e.key === 'ArrowDown' && aberta) {
+            e.preventDefault();
+            marcar(sugestaoAtiva + 1);
+        } else if (e.key === 'ArrowUp' && aberta) {
+            e.preventDefault();
+            marcar(sugestaoAtiva - 1);
+        } else if (e.key === 'Enter' && aberta) {
+            // Enter escolhe a sugestão em vez de enviar o formulário
+            e.preventDefault();
+            const item = lista.querySelectorAll('[data-id]')[Math.max(sugestaoAtiva, 0)];
+            if (item) selecionar(item.dataset.id, item.textContent);
+        } else if (e.key === 'Enter' && !opcoes.permitirVazio) {
+            e.preventDefault();
+        } else if (e.key === 'Escape') {
+            fechar();
+        }
+    });
+
+    // mousedown em vez de click: acontece antes do blur do campo de busca
+    lista.addEventListener('mousedown', function(e) {
+        const item = e.target.closest('[data-id]');
+        if (item) {
+            e.preventDefault();
+            selecionar(item.dataset.id, item.textContent);
+        }
+    });
+
+    // Sem escolher uma sugestão, o campo volta para o cliente selecionado
+    campoBusca.addEventListener('blur', function() {
+        fechar();
+        if (opcoes.permitirVazio && !this.value.trim()) {
+            selecionar('', '');
+        } else {
+            this.value = nomeSelecionado;
+        }
+    });
+}
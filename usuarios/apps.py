@@ -5,4 +5,5 @@ class UsuariosConfig(AppConfig):
     name = 'usuarios'
 
     def ready(self):
+        import usuarios.checks
         import usuarios.signals
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+# A versão dos grupos (usuarios/grupos.py) só funciona com vários workers
+# se o cache for compartilhado entre eles.
+@register()
+def cache_compartilhado(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if settings.DEBUG or not backend.endswith(('LocMemCache', 'DummyCache')):
+        return []
+    return [Warning(
+        'O cache padrão não é compartilhado entre os processos.',
+        hint='Use REDIS_URL ou o DatabaseCache (core/settings.py): com um cache por processo, '
+             'grupos removidos continuam valendo nos outros workers.',
+        id='usuarios.W001',
+    )]
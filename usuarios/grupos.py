@@ -0,0 +1,118 @@
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Resolução dos grupos (perfis) do usuário.
+#
+# Os nomes dos grupos são consultados no máximo uma vez por requisição e
+# guardados na sessão. A entrada da sessão é descartada quando a versão
+# do usuário no cache muda (alteração de grupos) ou quando expira.
+#
+# A versão precisa estar em um cache compartilhado pelos workers (ver
+# CACHES em core/settings.py): com um cache por processo, só o worker que
+# fez a alteração veria a versão nova. Uma versão ausente (chave expulsa do
+# cache) é recriada com um valor novo, que nenhuma sessão conhece.
+
+CHAVE_SESSAO = '_usuario_grupos'
+PREFIXO_VERSAO = 'usuarios:grupos_versao:'
+VALIDADE_SEGUNDOS = 300
+
+
+def grupos_do_usuario(user):
+    """Retorna os nomes dos grupos do usuário, consultando o banco só uma vez."""
+    if not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, '_grupos_cache', None)
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list('name', flat=True))
+        user._grupos_cache = grupos
+    return grupos
+
+
+async def agrupos_do_usuario(user):
+    """Versão assíncrona de grupos_do_usuario."""
+    if not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, '_grupos_cache', None)
+    if grupos is None:
+        grupos = frozenset([nome async for nome in user.groups.values_list('name', flat=True)])
+        user._grupos_cache = grupos
+    return grupos
+
+
+def _sessao_valida(dados, user, versao):
+    return (
+        dados
+        and dados.get('usuario') == user.pk
+        and dados.get('versao') == versao
+        and time.time() - dados.get('carregado_em', 0) < VALIDADE_SEGUNDOS
+    )
+
+
+def _dados_sessao(user, versao, grupos):
+    return {
+        'usuario': user.pk,
+        'versao': versao,
+        'carregado_em': time.time(),
+        'grupos': sorted(grupos),
+    }
+
+
+def versao_grupos(user_pk):
+    """Versão atual dos grupos do usuário, criada se estiver ausente."""
+    chave = PREFIXO_VERSAO + str(user_pk)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, uuid.uuid4().hex, None)
+        versao = cache.get(chave)
+    return versao
+
+
+async def aversao_grupos(user_pk):
+    """Versão assíncrona de versao_grupos."""
+    chave = PREFIXO_VERSAO + str(user_pk)
+    versao = await cache.aget(chave)
+    if versao is None:
+        await cache.aadd(chave, uuid.uuid4().hex, None)
+        versao = await cache.aget(chave)
+    return versao
+
+
+def carregar_grupos(request, user):
+    """Preenche os grupos do usuário da requisição a partir da sessão."""
+    if not user.is_authenticated:
+        return user
+
+    versao = versao_grupos(user.pk)
+    dados = request.session.get(CHAVE_SESSAO)
+    if _sessao_valida(dados, user, versao):
+        user._grupos_cache = frozenset(dados['grupos'])
+        return user
+
+    request.session[CHAVE_SESSAO] = _dados_sessao(user, versao, grupos_do_usuario(user))
+    return user
+
+
+async def acarregar_grupos(request, user):
+    """Versão assíncrona de carregar_grupos."""
+    if not user.is_authenticated:
+        return user
+
+    versao = await aversao_grupos(user.pk)
+    dados = await request.session.aget(CHAVE_SESSAO)
+    if _sessao_valida(dados, user, versao):
+        user._grupos_cache = frozenset(dados['grupos'])
+        return user
+
+    await request.session.aset(CHAVE_SESSAO, _dados_sessao(user, versao, await agrupos_do_usuario(user)))
+    return user
+
+
+def invalidar_grupos(*usuarios_ids):
+    """Força a releitura dos grupos na próxima requisição dos usuários.
+
+    Basta apagar a versão: a próxima requisição cria uma nova, que nenhuma
+    sessão conhece. Com o DatabaseCache é um único DELETE.
+    """
+    cache.delete_many([PREFIXO_VERSAO + str(pk) for pk in usuarios_ids])
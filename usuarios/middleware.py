@@ -0,0 +1,30 @@
+from functools import partial
+
+from django.contrib import auth
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .grupos import acarregar_grupos, carregar_grupos
+
+
+# Como em django.contrib.auth.middleware, o usuário só é lido quando usado.
+# request.user e request.auser() guardam o mesmo objeto, com os grupos já
+# carregados, para views síncronas e assíncronas.
+def get_user(request):
+    if not hasattr(request, '_usuario_com_grupos'):
+        request._usuario_com_grupos = carregar_grupos(request, auth.get_user(request))
+    return request._usuario_com_grupos
+
+
+async def auser(request):
+    if not hasattr(request, '_usuario_com_grupos'):
+        request._usuario_com_grupos = await acarregar_grupos(request, await auth.aget_user(request))
+    return request._usuario_com_grupos
+
+
+class GruposUsuarioMiddleware(MiddlewareMixin):
+    """Carrega os grupos do usuário uma vez por requisição (ver usuarios/grupos.py)."""
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
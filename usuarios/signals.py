@@ -1,7 +1,9 @@
-from django.db.models.signals import post_migrate
-from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_migrate, pre_delete
+from django.contrib.auth.models import Group, Permission, User
 from django.dispatch import receiver
 
+from .grupos import invalidar_grupos
+
 @receiver(post_migrate)
 def criar_grupos(sender, **kwargs):
     if sender.name == "usuarios":  # garante que roda só quando esse app é migrado
@@ -19,4 +21,21 @@ def criar_grupos(sender, **kwargs):
 @receiver(post_migrate)
 def create_user_groups(sender, **kwargs):
     Group.objects.get_or_create(name='Administrador')
-    Group.objects.get_or_create(name='Supervisor')
\ No newline at end of file
+    Group.objects.get_or_create(name='Supervisor')
+
+
+# Invalida os grupos guardados na sessão quando a associação muda
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidar_grupos(instance.pk)
+    elif action == 'pre_clear':
+        invalidar_grupos(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidar_grupos(*pk_set)
+
+@receiver(pre_delete, sender=Group)
+def grupo_excluido(sender, instance, **kwargs):
+    invalidar_grupos(*instance.user_set.values_list('pk', flat=True))
@@ -1,8 +1,10 @@
 from django import template
 
+from usuarios.grupos import grupos_do_usuario
+
 register = template.Library()
 
 @register.filter(name='has_group')
 def has_group(user, group_name):
     """Verifica se o usuário pertence a um grupo específico"""
-    return user.groups.filter(name=group_name).exists()
+    return group_name in grupos_do_usuario(user)
@@ -1,3 +1,102 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.testes import OrcamentoRotasMixin, criar_usuario
+
+from . import urls as usuarios_urls
+from .grupos import PREFIXO_VERSAO
+
+
+class OrcamentoRotasUsuariosTests(OrcamentoRotasMixin, TestCase):
+    urlconf = usuarios_urls
+
+    @staticmethod
+    def criar_usuarios(quantidade, inicio=0):
+        grupos = [Group.objects.get_or_create(name=nome)[0] for nome in ('Administrador', 'Supervisão')]
+        usuarios = User.objects.bulk_create([
+            User(username=f'usuario{numero:04d}') for numero in range(inicio, inicio + quantidade)
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=usuario.id, group_id=grupos[numero % 2].id)
+            for numero, usuario in enumerate(usuarios)
+        ])
+        return usuarios
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editado = cls.criar_usuarios(2000)[0]
+        cls.admin = criar_usuario('admin', 'Administrador')
+        cls.supervisor = criar_usuario('supervisor', 'Supervisão')
+
+    def ampliar_dados(self):
+        self.criar_usuarios(2000, inicio=2000)
+
+    def rotas(self, papel):
+        # Cada papel exclui um usuário diferente (excluir_usuario age no GET)
+        excluido = User.objects.get(username='usuario0001' if papel == 'admin' else 'usuario0002')
+        return [
+            {'nome': 'login', 'consultas': 7, 'admin': 200, 'supervisor': 200},
+            {'nome': 'login', 'metodo': 'post', 'dados': {'username': papel, 'password': 'senha'},
+             'consultas': 8, 'admin': 302, 'supervisor': 302},
+            {'nome': 'logout', 'consultas': 5, 'admin': 302, 'supervisor': 302},
+            {'nome': 'lista_usuarios', 'consultas': 9, 'admin': 200, 'supervisor': 302},
+            {'nome': 'criar_usuario', 'consultas': 4, 'admin': 200, 'supervisor': 302},
+            {'nome': 'criar_usuario', 'metodo': 'post',
+             'dados': {'username': f'novo_{papel}', 'password': 'x', 'grupo': 'Supervisão'},
+             'consultas': 8, 'admin': 302, 'supervisor': 302},
+            {'nome': 'editar_usuario', 'args': [self.editado.pk], 'consultas': 11,
+             'admin': 200, 'supervisor': 302},
+            {'nome': 'editar_usuario', 'args': [self.editado.pk], 'metodo': 'post',
+             'dados': {'username': self.editado.username, 'email': 'a@a.com', 'grupo': 'Administrador'},
+             # clear() e add() dos grupos apagam a versão do usuário editado
+             'consultas': 10, 'admin': 302, 'supervisor': 302},
+            {'nome': 'excluir_usuario', 'args': [excluido.pk], 'consultas': 10,
+             'admin': 302, 'supervisor': 302},
+        ]
+
+    def test_admin(self):
+        self.verificar_rotas('admin', self.admin)
+
+    def test_supervisor(self):
+        self.verificar_rotas('supervisor', self.supervisor)
+
+
+class GruposUsuarioTests(TestCase):
+
+    def setUp(self):
+        self.usuario = criar_usuario('admin', 'Administrador')
+        self.grupo = Group.objects.get(name='Administrador')
+        self.client.force_login(self.usuario)
+        self.url = reverse('lista_usuarios')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_remocao_de_grupo_vale_na_proxima_requisicao(self):
+        self.usuario.groups.remove(self.grupo)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        self.usuario.groups.add(self.grupo)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_versao_ausente_nao_reaproveita_a_sessao(self):
+        # Chave expulsa do cache e grupo removido sem sinal (ex.: outro sistema no banco)
+        cache.delete(PREFIXO_VERSAO + str(self.usuario.pk))
+        User.groups.through.objects.filter(user=self.usuario).delete()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_mesmo_usuario_em_request_user_e_auser(self):
+        resposta = self.client.get(self.url)
+        request = resposta.wsgi_request
+        auser = async_to_sync(request.auser)()
+        self.assertIs(auser, request.user._wrapped)
+        self.assertEqual(auser._grupos_cache, frozenset({'Administrador'}))
+
+    def test_aviso_de_cache_por_processo(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, DEBUG=False):
+            self.assertIn('usuarios.W001', [aviso.id for aviso in run_checks()])
+        with override_settings(DEBUG=False):
+            self.assertNotIn('usuarios.W001', [aviso.id for aviso in run_checks()])
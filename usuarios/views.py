@@ -4,18 +4,26 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User, Group
 from django.contrib import messages
 from .forms import LoginForm
+from .grupos import agrupos_do_usuario, grupos_do_usuario
 
 
 # Verifica se é administrador
 def is_admin(user):
-    return user.groups.filter(name="Administrador").exists() or user.is_superuser
+    return user.is_superuser or "Administrador" in grupos_do_usuario(user)
 
 def is_supervisor(user):
-    return user.groups.filter(name="Supervisão").exists()
+    return "Supervisão" in grupos_do_usuario(user)
 
 # Verifica se o usuário é Administrador ou Supervisor
 def is_admin_or_supervisor(user):
-    return user.groups.filter(name__in=["Administrador", "Supervisão"]).exists() or user.is_superuser
+    return user.is_superuser or not grupos_do_usuario(user).isdisjoint({"Administrador", "Supervisão"})
+
+# Versões assíncronas, para user_passes_test em views async (sem sync_to_async)
+async def is_admin_async(user):
+    return user.is_superuser or "Administrador" in await agrupos_do_usuario(user)
+
+async def is_admin_or_supervisor_async(user):
+    return user.is_superuser or not (await agrupos_do_usuario(user)).isdisjoint({"Administrador", "Supervisão"})
 
 # Login
 def login_view(request):
@@ -45,7 +53,7 @@ def logout_view(request):
 @login_required
 @user_passes_test(is_admin)
 def lista_usuarios(request):
-    usuarios = User.objects.all().order_by("username")
+    usuarios = User.objects.prefetch_related("groups").order_by("username")
     return render(request, "usuarios/lista_usuarios.html", {"usuarios": usuarios})
 
 